@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of processed annotation records for Blackthorn Manor
+Stores processed annotations and their derived indexes in SQLite, keyed by the
+source file hash and the processor version.
+"""
+
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+class AnnotationCache:
+    """SQLite-backed store of processed annotation records"""
+
+    def __init__(self, path: Path, version: str):
+        self.path = Path(path)
+        self.version = str(version)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path))
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS records (
+                position INTEGER PRIMARY KEY,
+                record_key TEXT NOT NULL,
+                processed TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS records_key ON records (record_key);
+            CREATE TABLE IF NOT EXISTS indexes (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+
+    def close(self):
+        self.connection.close()
+
+    def record_key(self, raw_record: Dict, position: int) -> str:
+        """Key a raw record by its content; records without an id also depend on their position"""
+        payload = json.dumps(raw_record, sort_keys=True, ensure_ascii=False)
+        if 'id' not in raw_record:
+            payload += f"#{position}"
+        return hashlib.sha1(f"{self.version}:{payload}".encode('utf-8')).hexdigest()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, source_hash: str) -> Optional[Tuple[List[Dict], Dict[str, Any]]]:
+        """Return cached records and indexes when the source file and processor version are unchanged"""
+        if self._get_meta('source_hash') != source_hash or self._get_meta('version') != self.version:
+            return None
+
+        records = [json.loads(row[0]) for row in
+                   self.connection.execute("SELECT processed FROM records ORDER BY position")]
+        indexes = {name: json.loads(value) for name, value in
+                   self.connection.execute("SELECT name, value FROM indexes")}
+        return records, indexes
+
+    def lookup(self, record_keys: List[str]) -> Dict[str, str]:
+        """Return the JSON of previously processed records for the given keys
+
+        Identical raw records share a key, so callers decode one copy per record.
+        """
+        if self._get_meta('version') != self.version:
+            return {}
+
+        found = {}
+        # Stay below SQLite's bound parameter limit
+        for i in range(0, len(record_keys), 500):
+            batch = record_keys[i:i + 500]
+            placeholders = ','.join('?' * len(batch))
+            for key, processed in self.connection.execute(
+                    f"SELECT record_key, processed FROM records WHERE record_key IN ({placeholders})", batch):
+                found[key] = processed
+        return found
+
+    def store(self, source_hash: str, keyed_records: List[Tuple[str, Dict]], indexes: Dict[str, Any]):
+        """Replace the cache contents with the records of the current source file"""
+        with self.connection:
+            self.connection.execute("DELETE FROM records")
+            self.connection.execute("DELETE FROM indexes")
+            self.connection.executemany(
+                "INSERT INTO records (position, record_key, processed) VALUES (?, ?, ?)",
+                [(position, key, json.dumps(record, ensure_ascii=False))
+                 for position, (key, record) in enumerate(keyed_records)]
+            )
+            self.connection.executemany(
+                "INSERT INTO indexes (name, value) VALUES (?, ?)",
+                [(name, json.dumps(value, ensure_ascii=False)) for name, value in indexes.items()]
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [('source_hash', source_hash), ('version', self.version)]
+            )
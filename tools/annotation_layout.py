@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Build-time annotation layout for Blackthorn Manor pages
+Packs each page's annotations into their zones without overlap. Free space is
+tracked as interval lists per zone, and a uniform spatial grid checks candidate
+rectangles against everything already placed on the page. Notes that do not
+fit on a full page are spread over extra overflow layers instead of stacked.
+"""
+
+import math
+from typing import Dict, List, Iterator, Optional, Tuple
+
+Rect = Tuple[float, float, float, float]  # x0, y0, x1, y1 in page-relative units
+
+# Zone rectangles in page-relative coordinates
+ZONE_BOUNDS = {
+    'leftMargin': (0.0, 0.08, 0.14, 0.92),
+    'rightMargin': (0.85, 0.08, 0.99, 0.92),
+    'topMargin': (0.15, 0.0, 0.85, 0.12),
+    'bottomMargin': (0.15, 0.84, 0.85, 0.98),
+    'content': (0.2, 0.15, 0.8, 0.84)
+}
+
+MARGIN_ZONES = ['leftMargin', 'rightMargin', 'topMargin', 'bottomMargin']
+
+NOTE_WIDTHS = {
+    'leftMargin': 0.13,
+    'rightMargin': 0.13,
+    'topMargin': 0.22,
+    'bottomMargin': 0.22,
+    'content': 0.22
+}
+
+CHARS_PER_PAGE_WIDTH = 220  # Annotation font characters across the full page width
+LINE_HEIGHT = 0.018
+NOTE_PADDING = 0.01
+NOTE_GAP = 0.005
+MAX_LINES = 8
+SCAN_STEP = 0.01
+
+class SpatialGrid:
+    """Uniform grid over the page that buckets placed rectangles by the cells they cover"""
+
+    def __init__(self, cell_size: float = 0.05):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def _cells(self, rect: Rect) -> Iterator[Tuple[int, int]]:
+        x0, y0, x1, y1 = rect
+        for cx in range(int(x0 // self.cell_size), int(x1 // self.cell_size) + 1):
+            for cy in range(int(y0 // self.cell_size), int(y1 // self.cell_size) + 1):
+                yield cx, cy
+
+    def collides(self, rect: Rect) -> bool:
+        x0, y0, x1, y1 = rect
+        for cell in self._cells(rect):
+            for ox0, oy0, ox1, oy1 in self.cells.get(cell, ()):
+                if x0 < ox1 + NOTE_GAP and ox0 < x1 + NOTE_GAP and y0 < oy1 + NOTE_GAP and oy0 < y1 + NOTE_GAP:
+                    return True
+        return False
+
+    def insert(self, rect: Rect):
+        for cell in self._cells(rect):
+            self.cells.setdefault(cell, []).append(rect)
+
+def estimate_note_size(text: str, zone: str) -> Tuple[float, float]:
+    """Estimate the rendered width and height of a note in a zone"""
+    x0, y0, x1, y1 = ZONE_BOUNDS[zone]
+    width = min(NOTE_WIDTHS[zone], x1 - x0)
+    chars_per_line = max(1, int(width * CHARS_PER_PAGE_WIDTH))
+    lines = min(MAX_LINES, max(1, math.ceil(len(text) / chars_per_line)))
+    height = min(lines * LINE_HEIGHT + NOTE_PADDING, y1 - y0)
+    return width, height
+
+def _footprint(width: float, height: float) -> float:
+    return (width + NOTE_GAP) * (height + NOTE_GAP)
+
+def _zone_area(zone: str) -> float:
+    x0, y0, x1, y1 = ZONE_BOUNDS[zone]
+    return (x1 - x0 + NOTE_GAP) * (y1 - y0 + NOTE_GAP)
+
+def _offsets(start: float, low: float, high: float) -> Iterator[float]:
+    """Candidate coordinates in [low, high], nearest to start first"""
+    start = min(max(start, low), high)
+    yield start
+    steps = int((high - low) / SCAN_STEP) + 1
+    for i in range(1, steps + 1):
+        for candidate in (start + i * SCAN_STEP, start - i * SCAN_STEP):
+            if low <= candidate <= high:
+                yield candidate
+
+def _free_starts(intervals: List[Tuple[float, float]], low: float, high: float,
+                 size: float, preferred: float) -> List[float]:
+    """Start coordinates of every free gap along an axis that fits size, nearest to preferred first"""
+    starts = []
+    cursor = low
+    for start, end in sorted(intervals):
+        if start - NOTE_GAP - cursor >= size:
+            starts.append(min(max(preferred, cursor), start - NOTE_GAP - size))
+        cursor = max(cursor, end + NOTE_GAP)
+    if high - cursor >= size:
+        starts.append(min(max(preferred, cursor), high - size))
+    return sorted(starts, key=lambda start: abs(start - preferred))
+
+def _place_in_zone(grid: SpatialGrid, occupied: List, zone: str,
+                   width: float, height: float, preferred_x: float, preferred_y: float) -> Optional[Rect]:
+    x0, y0, x1, y1 = ZONE_BOUNDS[zone]
+    max_x, max_y = x1 - width, y1 - height
+    if max_x < x0 or max_y < y0:
+        return None
+
+    # Margins hold a single column or row of notes, so their free space is an interval
+    # list along the long axis; the content zone is scanned row by row, with each row's
+    # free spans taken from the notes that overlap it vertically
+    if zone in ('leftMargin', 'rightMargin'):
+        x = min(max(preferred_x, x0), max_x)
+        candidates = ((x, y) for y in _free_starts(occupied, y0, y1, height, preferred_y))
+    elif zone in ('topMargin', 'bottomMargin'):
+        y = min(max(preferred_y, y0), max_y)
+        candidates = ((x, y) for x in _free_starts(occupied, x0, x1, width, preferred_x))
+    else:
+        candidates = (
+            (x, y)
+            for y in _offsets(preferred_y, y0, max_y)
+            for x in _free_starts([(ox0, ox1) for ox0, oy0, ox1, oy1 in occupied
+                                   if oy0 < y + height + NOTE_GAP and y < oy1 + NOTE_GAP],
+                                  x0, x1, width, preferred_x)
+        )
+
+    # The grid stays the ground truth for notes that meet across zone corners
+    for x, y in candidates:
+        rect = (x, y, x + width, y + height)
+        if not grid.collides(rect):
+            return rect
+    return None
+
+# Height of a one-line note; a zone where even that failed to fit is full
+MIN_NOTE_HEIGHT = LINE_HEIGHT + NOTE_PADDING
+
+def _candidate_sizes(annotation: Dict, position: Dict,
+                     character_zones: Dict[str, List[str]]) -> List[Tuple[str, float, float]]:
+    """Zones an annotation may go to in order of preference, with its size in each"""
+    year = annotation.get('year')
+    allowed = list(ZONE_BOUNDS) if year and year >= 2000 else MARGIN_ZONES
+
+    zones = [position.get('zone')] + list(character_zones.get(annotation.get('character'), [])) + allowed
+    candidates = []
+    for zone in zones:
+        if zone in allowed and zone not in candidates:
+            candidates.append(zone)
+    text = annotation.get('text', '')
+    return [(zone,) + estimate_note_size(text, zone) for zone in candidates]
+
+def _layout_layer(entries: List[Tuple], layer: int) -> List[Tuple]:
+    """Place (annotation, position, candidate sizes) entries on one empty layer; returns those that did not fit"""
+    grid = SpatialGrid()
+    overflow = []
+    # Smallest note height that already failed to fit per zone; taller notes cannot fit either
+    failed_heights = {}
+    # Area already used per zone, so full zones are skipped without scanning them
+    used_area = {}
+    # Occupied spans along the long axis of each margin zone, occupied rects in the content zone
+    occupied = {zone: [] for zone in ZONE_BOUNDS}
+
+    for i, (annotation, position, candidates) in enumerate(entries):
+        placed = None
+        for zone, width, height in candidates:
+            if height >= failed_heights.get(zone, math.inf):
+                continue
+            if used_area.get(zone, 0.0) + _footprint(width, height) > _zone_area(zone):
+                continue
+            rect = _place_in_zone(grid, occupied[zone], zone, width, height,
+                                  position.get('x', 0.0), position.get('y', 0.0))
+            if rect:
+                placed = zone, rect
+                used_area[zone] = used_area.get(zone, 0.0) + _footprint(width, height)
+                if zone in ('leftMargin', 'rightMargin'):
+                    occupied[zone].append((rect[1], rect[3]))
+                elif zone in ('topMargin', 'bottomMargin'):
+                    occupied[zone].append((rect[0], rect[2]))
+                else:
+                    occupied[zone].append(rect)
+                break
+            failed_heights[zone] = height
+
+        if not placed:
+            overflow.append(entries[i])
+            if all(failed_heights.get(zone, math.inf) <= MIN_NOTE_HEIGHT for zone in ZONE_BOUNDS):
+                # Every zone is full, so nothing else fits on this layer
+                overflow.extend(entries[i + 1:])
+                break
+            continue
+
+        zone, rect = placed
+        grid.insert(rect)
+        position.update({
+            'zone': zone,
+            'x': round(rect[0], 4),
+            'y': round(rect[1], 4),
+            'width': round(rect[2] - rect[0], 4),
+            'height': round(rect[3] - rect[1], 4),
+            'layer': layer
+        })
+        annotation['position'] = position
+
+    return overflow
+
+def layout_page_annotations(annotations: List[Dict], character_zones: Dict[str, List[str]]) -> Tuple[int, int]:
+    """Assign non-overlapping positions and sizes to a page's annotations in place
+
+    Each annotation keeps the zone and coordinates it was generated with when they
+    are free, otherwise it moves to the nearest free spot in that zone, then in the
+    character's other preferred zones, then in any zone allowed for its year.
+    Annotations that do not fit go to overflow layers (position['layer'] 1, 2, ...),
+    each laid out the same way on an empty page, which the client shows one at a
+    time. No two annotations on the same layer overlap.
+    Returns how many annotations went to overflow layers and how many layers were added.
+    """
+    entries = []
+    for annotation in annotations:
+        position = dict(annotation.get('position') or {})
+        entries.append((annotation, position, _candidate_sizes(annotation, position, character_zones)))
+
+    # The first note always fits on an empty layer, so every layer places at least one
+    remaining = _layout_layer(entries, 0)
+    overflowed = len(remaining)
+    layers = 0
+    while remaining:
+        layers += 1
+        remaining = _layout_layer(remaining, layers)
+    return overflowed, layers
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Copy-on-write user annotation overlays for Blackthorn Manor
+Readers' own annotations live in the server's annotations table, keyed by
+user_id and page_index. Instead of building a book per reader, the built
+book is loaded once and shared. Each reader only holds their own annotation
+deltas. A page view is merged at read time: pages a reader has not annotated
+are the shared base page itself, and annotated pages are shallow copies
+with a new annotation list. Base pages are never modified.
+"""
+
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Hashable, Iterable, Optional, Sequence
+
+MAX_LOADED_USERS = 1024
+
+# Columns of the server's annotations table (server/database/migrations/002_create_annotations_table.js)
+USER_ANNOTATION_COLUMNS = [
+    'id', 'user_id', 'page_index', 'content_type', 'content', 'selected_text', 'position', 'styling',
+    'character_initials', 'annotation_type', 'revelation_level', 'is_public', 'is_collaborative', 'metadata',
+    'parent_id', 'thread_id', 'created_at', 'updated_at'
+]
+
+def _json_column(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+def user_annotation(row: Dict[str, Any]) -> Dict[str, Any]:
+    """A server annotations row in the book's annotation format"""
+    return {
+        'id': f"user_{row['id']}",
+        'character': row.get('character_initials') or 'USER',
+        'text': row.get('content', ''),
+        'type': row.get('content_type', 'note'),
+        'pageIndex': row['page_index'],
+        'position': _json_column(row.get('position')) or {},
+        'styling': _json_column(row.get('styling')) or {},
+        'selectedText': row.get('selected_text'),
+        'isDraggable': row.get('annotation_type', 'draggable') != 'fixed',
+        'revealLevel': row.get('revelation_level') or 1,
+        'isPublic': bool(row.get('is_public')),
+        'isCollaborative': bool(row.get('is_collaborative')),
+        'metadata': _json_column(row.get('metadata')) or {},
+        'parentId': row.get('parent_id'),
+        'threadId': row.get('thread_id'),
+        'createdAt': row.get('created_at'),
+        'updatedAt': row.get('updated_at'),
+        'userId': row.get('user_id'),
+        'isUserAnnotation': True
+    }
+
+def overlay_page(page: Dict, annotations: Sequence[Dict], level: Optional[int] = None) -> Dict:
+    """Page with extra annotations and an optional reveal level applied
+
+    Returns page itself when nothing changes, otherwise a shallow copy with a
+    new annotation list; page is never modified.
+    """
+    base = page.get('annotations', [])
+    if level is not None:
+        visible = [a for a in base if a.get('revealLevel', 1) <= level]
+        extra = [a for a in annotations if a.get('revealLevel', 1) <= level]
+    else:
+        visible, extra = base, list(annotations)
+    if not extra and len(visible) == len(base):
+        return page
+
+    view = dict(page)
+    view['annotations'] = visible + extra
+    if 'annotationCount' in page:
+        view['annotationCount'] = len(view['annotations'])
+    if level is not None and 'revealLevels' in page:
+        view['revealLevels'] = [l for l in page['revealLevels'] if l <= level]
+    return view
+
+class UserOverlay:
+    """One reader's annotations by page, with their merged page views memoized"""
+
+    def __init__(self, user_id: Hashable, rows: Iterable[Dict[str, Any]] = ()):
+        self.user_id = user_id
+        self.pages = {}  # page index -> {annotation id: annotation}
+        self.views = {}  # (page index, level) -> merged page
+        for row in rows:
+            self.put(row)
+
+    def put(self, row: Dict[str, Any]):
+        """Add or replace one annotation from a server row"""
+        annotation = user_annotation(row)
+        self.remove(annotation['id'])
+        self.pages.setdefault(annotation['pageIndex'], {})[annotation['id']] = annotation
+        self._invalidate(annotation['pageIndex'])
+
+    def remove(self, annotation_id: str):
+        for page_index, annotations in list(self.pages.items()):
+            if annotations.pop(annotation_id, None) is not None:
+                if not annotations:
+                    del self.pages[page_index]
+                self._invalidate(page_index)
+                return
+
+    def _invalidate(self, page_index: int):
+        for key in [key for key in self.views if key[0] == page_index]:
+            del self.views[key]
+
+    def annotations(self, page_index: int) -> List[Dict]:
+        return list(self.pages.get(page_index, {}).values())
+
+class _PendingLoad:
+    """A reader's overlay while its rows are being loaded, and the changes that arrived meanwhile"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.changes = []  # callables applied to the overlay once it is loaded
+        self.overlay = None
+
+class OverlayStore:
+    """Shared base pages plus lazily loaded per-reader deltas
+
+    base_pages are addressed by page_index in reading order, as in the SQLite
+    export; they may be left empty when only annotations() is used, as by
+    book_server.py. load_rows(user_id) returns a reader's server rows and is
+    called the first time the reader is seen, once even when several requests
+    for the reader arrive together. Up to max_users overlays are kept, and the
+    least recently used ones are dropped and reloaded on demand.
+    """
+
+    def __init__(self, base_pages: Sequence[Dict] = (),
+                 load_rows: Optional[Callable[[Hashable], Iterable[Dict[str, Any]]]] = None,
+                 max_users: int = MAX_LOADED_USERS):
+        self.base_pages = base_pages
+        self.load_rows = load_rows
+        self.max_users = max_users
+        self.overlays = OrderedDict()
+        self.loading = {}  # user id -> _PendingLoad of readers whose rows are being read
+        self.level_views = {}  # (page index, level) -> base page filtered to a level, shared by all readers
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_book(cls, enhanced_book: Dict, load_rows=None, max_users: int = MAX_LOADED_USERS) -> 'OverlayStore':
+        from sqlite_export import iter_book_pages
+        return cls([page for _, _, page in iter_book_pages(enhanced_book)], load_rows, max_users)
+
+    def overlay(self, user_id: Hashable) -> UserOverlay:
+        """A reader's overlay, loading their rows if needed
+
+        Rows are read outside the lock. Puts and removes for the reader that
+        arrive meanwhile are queued and replayed on the loaded overlay, so a
+        change is never lost whether or not the read already saw it.
+        """
+        with self.lock:
+            overlay = self.overlays.get(user_id)
+            if overlay is not None:
+                self.overlays.move_to_end(user_id)
+                return overlay
+            pending = self.loading.get(user_id)
+            loader = pending is None
+            if loader:
+                pending = self.loading[user_id] = _PendingLoad()
+
+        if not loader:
+            # Another request is loading this reader; retry if it failed
+            pending.done.wait()
+            return pending.overlay if pending.overlay is not None else self.overlay(user_id)
+
+        try:
+            overlay = UserOverlay(user_id, self.load_rows(user_id) if self.load_rows else ())
+            with self.lock:
+                for change in pending.changes:
+                    change(overlay)
+                self.overlays[user_id] = pending.overlay = overlay
+                if len(self.overlays) > self.max_users:
+                    self.overlays.popitem(last=False)
+        finally:
+            with self.lock:
+                del self.loading[user_id]
+            pending.done.set()
+        return overlay
+
+    def annotations(self, user_id: Hashable, page_index: int) -> List[Dict]:
+        """A reader's own annotations on one page"""
+        overlay = self.overlay(user_id)
+        with self.lock:
+            return overlay.annotations(page_index)
+
+    def page(self, user_id: Optional[Hashable], page_index: int, level: Optional[int] = None) -> Dict:
+        """A reader's view of one page; treat it as read-only, it may be shared"""
+        base = self.base_pages[page_index]
+        overlay = self.overlay(user_id) if user_id is not None else None
+        key = (page_index, level)
+        # Overlays and level views are written under the lock by other threads, so read them under it too
+        with self.lock:
+            if overlay is None or page_index not in overlay.pages:
+                if level is None:
+                    return base
+                view = self.level_views.get(key)
+                if view is None:
+                    view = self.level_views[key] = overlay_page(base, (), level)
+                return view
+
+            view = overlay.views.get(key)
+            if view is None:
+                view = overlay.views[key] = overlay_page(base, overlay.annotations(page_index), level)
+        return view
+
+    def _apply(self, user_id: Hashable, change: Callable[[UserOverlay], None]):
+        with self.lock:
+            overlay = self.overlays.get(user_id)
+            if overlay is not None:
+                change(overlay)
+            elif user_id in self.loading:
+                self.loading[user_id].changes.append(change)
+
+    def put(self, row: Dict[str, Any]):
+        """Apply a created or updated server row to its reader's overlay, if loaded or loading"""
+        self._apply(row['user_id'], lambda overlay: overlay.put(row))
+
+    def remove(self, user_id: Hashable, annotation_id: str):
+        self._apply(user_id, lambda overlay: overlay.remove(annotation_id))
+
+def server_rows_loader(database: Path) -> Callable[[Hashable], List[Dict[str, Any]]]:
+    """load_rows for OverlayStore reading the server's SQLite annotations table"""
+    connection = sqlite3.connect(f"file:{Path(database)}?mode=ro", uri=True, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    lock = threading.Lock()
+
+    def load_rows(user_id: Hashable) -> List[Dict[str, Any]]:
+        with lock:
+            rows = connection.execute(
+                f"SELECT {', '.join(USER_ANNOTATION_COLUMNS)} FROM annotations WHERE user_id = ? ORDER BY id",
+                (user_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    return load_rows
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Content-addressed web assets for Blackthorn Manor
+Writes every page, chapter shard and character file under a content-hash
+filename, plus a small entry manifest and a service-worker precache list.
+Unchanged assets keep their URLs across builds.
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Any
+
+MANIFEST_VERSION = 1
+
+def _slug(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', str(name).lower()).strip('-') or 'item'
+
+def _encode(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+class AssetWriter:
+    """Writes immutable assets named by a hash of their content"""
+
+    def __init__(self, assets_dir: Path, url_prefix: str = "assets"):
+        self.assets_dir = Path(assets_dir)
+        self.url_prefix = url_prefix
+        self.urls = []
+        self.written = 0
+
+    def write(self, kind: str, name: str, data: Any) -> str:
+        """Store one asset and return its URL relative to the manifest"""
+        payload = _encode(data)
+        digest = hashlib.sha256(payload).hexdigest()[:12]
+        relative = f"{kind}/{_slug(name)}.{digest}.json"
+        target = self.assets_dir / relative
+        # Same name means same bytes, so an existing file is already correct
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(payload)
+            self.written += 1
+        url = f"{self.url_prefix}/{relative}"
+        self.urls.append(url)
+        return url
+
+    def prune(self) -> int:
+        """Remove assets that the current build no longer references"""
+        referenced = {self.assets_dir / url[len(self.url_prefix) + 1:] for url in self.urls}
+        removed = 0
+        for path in self.assets_dir.rglob('*.json'):
+            if path not in referenced:
+                path.unlink()
+                removed += 1
+        return removed
+
+def write_content_addressed_assets(web_book_data: Dict, output_dir: Path) -> Dict:
+    """Split web book data into hashed assets and write manifest.json and precache-manifest.json"""
+    output_dir = Path(output_dir)
+    writer = AssetWriter(output_dir / "assets")
+
+    def page_urls(section: str, pages: List[Dict]) -> List[str]:
+        return [writer.write('pages', f"{section}-{page.get('pageNumber', i + 1)}", page)
+                for i, page in enumerate(pages)]
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'title': web_book_data.get('title'),
+        'subtitle': web_book_data.get('subtitle'),
+        'author': web_book_data.get('author'),
+        'frontMatter': {},
+        'backMatter': {},
+        'chapters': [],
+        'characters': {},
+        'revealLevels': web_book_data.get('revealLevels', {})
+    }
+
+    front_matter = web_book_data.get('frontMatter') or {}
+    if front_matter:
+        manifest['frontMatter'] = {**front_matter, 'pages': page_urls('front', front_matter.get('pages', []))}
+
+    back_matter = web_book_data.get('backMatter') or {}
+    if back_matter:
+        manifest['backMatter'] = {**back_matter, 'pages': page_urls('back', back_matter.get('pages', []))}
+
+    for chapter in web_book_data.get('chapters', []):
+        shard = {**chapter, 'pages': page_urls('chapter', chapter.get('pages', []))}
+        manifest['chapters'].append({
+            'name': chapter.get('name'),
+            'pageCount': len(chapter.get('pages', [])),
+            'shard': writer.write('chapters', chapter.get('name', 'chapter'), shard)
+        })
+
+    for character, data in (web_book_data.get('characters') or {}).items():
+        manifest['characters'][character] = writer.write('characters', character, data)
+
+    removed = writer.prune()
+
+    manifest_payload = json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8')
+    with open(output_dir / "manifest.json", 'wb') as f:
+        f.write(manifest_payload)
+
+    # Hashed URLs never change content, so only the fixed-name manifest needs a revision
+    precache = [{'url': 'manifest.json', 'revision': hashlib.sha256(manifest_payload).hexdigest()[:12]}]
+    precache += [{'url': url, 'revision': None} for url in dict.fromkeys(writer.urls)]
+    with open(output_dir / "precache-manifest.json", 'w', encoding='utf-8') as f:
+        json.dump(precache, f, indent=2)
+
+    return {
+        'manifest': manifest,
+        'assets': len(set(writer.urls)),
+        'written': writer.written,
+        'removed': removed
+    }
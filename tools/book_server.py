@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Read-only query service for the Blackthorn Manor book
+Serves a SQLite export (see sqlite_export.py) over a small asyncio HTTP/1.1
+server, as a local stand-in for per-page delivery:
+
+    GET /pages/{n}?level=k                    page n in reading order, filtered to reveal level k
+    GET /pages/{n}?level=k&user=id            the same page with reader id's own annotations merged in
+    GET /chapters/{name}                      a chapter's page list
+    GET /annotations?character=MB&year=1980..1990&level=k&limit=50&offset=0
+    GET /search?q=text&level=k                pages and annotations containing the text
+    GET /metrics                              cache and concurrency counters
+
+Serialized page responses are kept in a bounded LRU cache keyed by page and
+reveal level. Every response carries an ETag and If-None-Match is honoured.
+Readers' annotations come from the app server's SQLite database through an
+annotation_overlay.OverlayStore; pages a reader has not annotated are served
+from the shared cache.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from annotation_overlay import OverlayStore, overlay_page, server_rows_loader
+
+MAX_LEVEL = 5
+PAGE_CACHE_SIZE = 256
+SEARCH_LIMIT = 50
+ANNOTATIONS_LIMIT = 50
+MAX_ANNOTATIONS_LIMIT = 500
+KEEP_ALIVE_TIMEOUT = 15
+USER_DATABASE = Path("server/database/blackthorn_manor.sqlite")
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error'}
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class BookStore:
+    """Queries against a SQLite book export; safe to call from worker threads"""
+
+    def __init__(self, database: Path):
+        self.database = Path(database)
+        if not self.database.exists():
+            raise FileNotFoundError(f"Book database not found: {self.database}")
+        self.connection = sqlite3.connect(f"file:{self.database}?mode=ro", uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.page_count = self._query("SELECT COUNT(*) FROM pages")[0][0]
+
+    def _query(self, sql: str, parameters: Tuple = ()) -> List[Tuple]:
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+    def page(self, page_index: int, level: int) -> Optional[Dict[str, Any]]:
+        """One page with the annotations and revealed text visible at a reveal level"""
+        rows = self._query(
+            "SELECT section, chapter_name, page_number, content, word_count, reveal_levels FROM pages "
+            "WHERE page_index = ?", (page_index,))
+        if not rows:
+            return None
+        section, chapter_name, page_number, content, word_count, reveal_levels = rows[0]
+
+        annotations = [{**json.loads(data), **json.loads(placement)} for data, placement in self._query(
+            "SELECT a.data, p.placement FROM annotation_placements p JOIN annotations a ON a.id = p.annotation "
+            "WHERE p.page_index = ? AND p.revelation_level <= ? ORDER BY p.id", (page_index, level))]
+        redactions = []
+        for start, end, hidden, revealed, redaction_level in self._query(
+                "SELECT start, end, hidden_text, revealed_text, revelation_level FROM redactions "
+                "WHERE page_index = ? ORDER BY start", (page_index,)):
+            redaction = {'start': start, 'end': end, 'hiddenText': hidden, 'revealLevel': redaction_level}
+            if redaction_level <= level:
+                redaction['revealedText'] = revealed
+            redactions.append(redaction)
+
+        if level < MAX_LEVEL:
+            # Injected redaction markup carries the revealed text too
+            content = re.sub(r' data-reveal="[^"]*"', '', content)
+
+        return {
+            'pageIndex': page_index,
+            'section': section,
+            'chapterName': chapter_name,
+            'pageNumber': page_number,
+            'revealLevel': level,
+            'content': content,
+            'wordCount': word_count,
+            'annotations': annotations,
+            'redactedSections': redactions,
+            'revealLevels': [l for l in json.loads(reveal_levels) if l <= level]
+        }
+
+    def chapter(self, name: str) -> Optional[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT page_index, page_number, word_count FROM pages WHERE chapter_name = ? ORDER BY page_number",
+            (name,))
+        if not rows:
+            return None
+        return {
+            'name': name,
+            'pageCount': len(rows),
+            'wordCount': sum(row[2] for row in rows),
+            'pages': [{'pageIndex': index, 'pageNumber': number, 'wordCount': words} for index, number, words in rows]
+        }
+
+    def annotations(self, character: Optional[str], years: Optional[Tuple[Optional[int], Optional[int]]],
+                    level: int, limit: int = ANNOTATIONS_LIMIT, offset: int = 0) -> Tuple[int, List[Dict]]:
+        """Total matching notes and one page of them, each with the pages it is placed on"""
+        clauses = ['revelation_level <= ?']
+        parameters = [level]
+        if character:
+            clauses.append('character_initials = ?')
+            parameters.append(character)
+        if years:
+            low, high = years
+            if low is not None:
+                clauses.append('year >= ?')
+                parameters.append(low)
+            if high is not None:
+                clauses.append('year <= ?')
+                parameters.append(high)
+        where = ' AND '.join(clauses)
+        total = self._query(f"SELECT COUNT(*) FROM annotations WHERE {where}", tuple(parameters))[0][0]
+        rows = self._query(
+            f"SELECT id, data FROM annotations WHERE {where} ORDER BY year, id LIMIT ? OFFSET ?",
+            tuple(parameters) + (limit, offset))
+
+        page_indexes = {}
+        if rows:
+            ids = [row_id for row_id, _ in rows]
+            for row_id, page_index in self._query(
+                    "SELECT annotation, page_index FROM annotation_placements "
+                    f"WHERE annotation IN ({', '.join('?' * len(ids))}) ORDER BY annotation, page_index", tuple(ids)):
+                page_indexes.setdefault(row_id, []).append(page_index)
+        return total, [{**json.loads(data), 'pageIndexes': page_indexes.get(row_id, [])} for row_id, data in rows]
+
+    def search(self, query: str, level: int) -> Dict[str, List[Dict]]:
+        pattern = '%' + re.sub(r'([%_\\])', r'\\\1', query) + '%'
+        pages = self._query(
+            "SELECT page_index, section, chapter_name, page_number, content FROM pages "
+            "WHERE content LIKE ? ESCAPE '\\' ORDER BY page_index LIMIT ?", (pattern, SEARCH_LIMIT))
+        annotations = self._query(
+            "SELECT (SELECT MIN(page_index) FROM annotation_placements WHERE annotation = a.id), "
+            "annotation_id, character_initials, year, text FROM annotations a "
+            "WHERE revelation_level <= ? AND text LIKE ? ESCAPE '\\' ORDER BY id LIMIT ?",
+            (level, pattern, SEARCH_LIMIT))
+        return {
+            'query': query,
+            'pages': [
+                {'pageIndex': index, 'section': section, 'chapterName': chapter, 'pageNumber': number,
+                 'snippet': _snippet(content, query)}
+                for index, section, chapter, number, content in pages
+            ],
+            'annotations': [
+                {'pageIndex': index, 'id': annotation_id, 'character': character, 'year': year,
+                 'snippet': _snippet(text, query)}
+                for index, annotation_id, character, year, text in annotations
+            ]
+        }
+
+def _snippet(text: str, query: str, context: int = 60) -> str:
+    position = text.lower().find(query.lower())
+    if position < 0:
+        return text[:context * 2]
+    start = max(0, position - context)
+    return text[start:position + len(query) + context]
+
+def _is_number(value: str) -> bool:
+    """Only ASCII digits; str.isdigit() also accepts characters like '²' that int() rejects"""
+    return value.isascii() and value.isdigit()
+
+def _parse_level(params: Dict[str, List[str]]) -> int:
+    value = params.get('level', ['1'])[0]
+    if not _is_number(value) or not 1 <= int(value) <= MAX_LEVEL:
+        raise HTTPError(400, f"level must be an integer from 1 to {MAX_LEVEL}")
+    return int(value)
+
+def _parse_count(params: Dict[str, List[str]], name: str, default: int, low: int, high: Optional[int]) -> int:
+    value = params.get(name, [str(default)])[0]
+    if not _is_number(value) or int(value) < low or (high is not None and int(value) > high):
+        bounds = f"from {low} to {high}" if high is not None else f"of at least {low}"
+        raise HTTPError(400, f"{name} must be an integer {bounds}")
+    return int(value)
+
+def _parse_years(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """'1980..1990', '1980..', '..1990' or a single year"""
+    match = re.fullmatch(r'(\d{4})?(?:\.\.(\d{4})?)?', value)
+    if not value or not match:
+        raise HTTPError(400, "year must look like 1980, 1980..1990, 1980.. or ..1990")
+    low = int(match.group(1)) if match.group(1) else None
+    if '..' not in value:
+        return low, low
+    return low, int(match.group(2)) if match.group(2) else None
+
+class PageCache:
+    """Serialized page responses and their ETags, least recently used evicted first"""
+
+    def __init__(self, capacity: int = PAGE_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[int, int]) -> Optional[Tuple[bytes, str]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Tuple[int, int], entry: Tuple[bytes, str]):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+class Metrics:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = Counter()
+        self.statuses = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = 0
+        self.total_latency = 0.0
+
+    def begin(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end(self, route: str, status: int, elapsed: float):
+        self.in_flight -= 1
+        self.requests[route] += 1
+        self.statuses[status] += 1
+        self.total_latency += elapsed
+
+def _encode(payload: Any) -> Tuple[bytes, str]:
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+class BookServer:
+    """asyncio HTTP front end for a BookStore, with readers' annotations from an optional OverlayStore"""
+
+    def __init__(self, store: BookStore, cache_size: int = PAGE_CACHE_SIZE, overlays: Optional[OverlayStore] = None):
+        self.store = store
+        self.cache = PageCache(cache_size)
+        self.metrics = Metrics()
+        self.overlays = overlays
+
+    async def route(self, path: str, params: Dict[str, List[str]]) -> Tuple[str, bytes, str]:
+        """Route name, body and ETag for a GET request"""
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+
+        if parts[0] == 'pages' and len(parts) == 2:
+            if not _is_number(parts[1]):
+                raise HTTPError(400, "page must be a non-negative integer")
+            key = (int(parts[1]), _parse_level(params))
+            if key[0] >= self.store.page_count:
+                raise HTTPError(404, f"No page {key[0]} (book has {self.store.page_count})")
+            if 'user' in params:
+                if self.overlays is None:
+                    raise HTTPError(400, "user needs the server started with an annotations database")
+                user_id = _parse_count(params, 'user', 0, 1, None)
+                annotations = await asyncio.to_thread(self.overlays.annotations, user_id, key[0])
+                if annotations:
+                    # Merged into a fresh copy of the page; only shared base pages are cached
+                    page = await asyncio.to_thread(self.store.page, *key)
+                    return ('pages',) + _encode(overlay_page(page, annotations, key[1]))
+            entry = self.cache.get(key)
+            if entry is None:
+                page = await asyncio.to_thread(self.store.page, *key)
+                if page is None:
+                    raise HTTPError(404, f"No page {key[0]} (book has {self.store.page_count})")
+                entry = _encode(page)
+                self.cache.put(key, entry)
+            return 'pages', entry[0], entry[1]
+
+        if parts[0] == 'chapters' and len(parts) == 2:
+            chapter = await asyncio.to_thread(self.store.chapter, parts[1])
+            if chapter is None:
+                raise HTTPError(404, f"No chapter named {parts[1]!r}")
+            return ('chapters',) + _encode(chapter)
+
+        if parts == ['annotations']:
+            years = _parse_years(params['year'][0]) if 'year' in params else None
+            character = params.get('character', [None])[0]
+            limit = _parse_count(params, 'limit', ANNOTATIONS_LIMIT, 1, MAX_ANNOTATIONS_LIMIT)
+            offset = _parse_count(params, 'offset', 0, 0, None)
+            total, annotations = await asyncio.to_thread(
+                self.store.annotations, character, years, _parse_level(params), limit, offset)
+            return ('annotations',) + _encode({'total': total, 'offset': offset, 'limit': limit,
+                                               'count': len(annotations), 'annotations': annotations})
+
+        if parts == ['search']:
+            query = params.get('q', [''])[0].strip()
+            if not query:
+                raise HTTPError(400, "q must not be empty")
+            return ('search',) + _encode(await asyncio.to_thread(self.store.search, query, _parse_level(params)))
+
+        if parts == ['metrics']:
+            return ('metrics',) + _encode(self.metrics_snapshot())
+
+        raise HTTPError(404, f"No route for {path}")
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        served = sum(self.metrics.requests.values())
+        return {
+            'uptimeSeconds': round(time.monotonic() - self.metrics.started, 1),
+            'requests': dict(self.metrics.requests),
+            'statuses': {str(status): count for status, count in self.metrics.statuses.items()},
+            'connections': self.metrics.connections,
+            'inFlight': self.metrics.in_flight,
+            'maxInFlight': self.metrics.max_in_flight,
+            'averageLatencyMs': round(1000 * self.metrics.total_latency / served, 3) if served else 0,
+            'pageCache': {
+                'size': len(self.cache.entries),
+                'capacity': self.cache.capacity,
+                'hits': self.cache.hits,
+                'misses': self.cache.misses,
+                'evictions': self.cache.evictions
+            }
+        }
+
+    async def handle(self, method: str, target: str, headers: Dict[str, str]) -> Tuple[int, bytes, Optional[str]]:
+        started = time.perf_counter()
+        self.metrics.begin()
+        route, status, body, etag = 'unknown', 200, b'', None
+        try:
+            if method not in ('GET', 'HEAD'):
+                raise HTTPError(405, f"{method} is not supported")
+            url = urlsplit(target)
+            route, body, etag = await self.route(url.path, parse_qs(url.query))
+            if etag in (tag.strip() for tag in headers.get('if-none-match', '').split(',')):
+                status, body = 304, b''
+        except HTTPError as e:
+            status, body = e.status, json.dumps({'error': str(e)}).encode('utf-8')
+            etag = None
+        except Exception as e:
+            print(f"❌ {method} {target} failed: {e!r}", file=sys.stderr)
+            status, body = 500, json.dumps({'error': 'internal server error'}).encode('utf-8')
+            etag = None
+        finally:
+            self.metrics.end(route, status, time.perf_counter() - started)
+        return status, body, etag
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.metrics.connections += 1
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                status, body, etag = await self.handle(method, target, headers)
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+
+                head = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}",
+                        "Content-Type: application/json; charset=utf-8",
+                        f"Content-Length: {len(body)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if etag:
+                    head += [f"ETag: {etag}", "Cache-Control: no-cache"]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765):
+        server = await asyncio.start_server(self.serve_connection, host, port)
+        print(f"🛰️  Serving {self.store.database} ({self.store.page_count} pages) on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+def main():
+    """Serve a SQLite book export, building it first if it does not exist
+
+    Usage: book_server.py [book.sqlite] [port] [annotations.sqlite]; readers'
+    annotations are read from the app server's database when it exists.
+    """
+    database = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("web_app/data/book.sqlite")
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    user_database = Path(sys.argv[3]) if len(sys.argv) > 3 else USER_DATABASE
+    try:
+        if not database.exists():
+            from enhanced_content_processor import build
+            from sqlite_export import export_sqlite
+            export_sqlite(build(Path(".")), database)
+            print(f"🗄️  Exported book to {database}")
+        store = BookStore(database)
+        overlays = OverlayStore(load_rows=server_rows_loader(user_database)) if user_database.exists() else None
+        asyncio.run(BookServer(store, overlays=overlays).serve(port=port))
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Shared source representation for Blackthorn Manor
+Reads the chapter files and front/back matter once, and parses each text into
+markdown blocks once, so every output target paginates from the same parsed
+intermediate. Annotation records are streamed from the file instead of held.
+"""
+
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional
+
+from json_stream import iter_json_array
+from markdown_blocks import Document, parse_markdown
+
+def roman_to_int(roman: str) -> int:
+    """Convert Roman numerals to integers"""
+    roman_numerals = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
+    total = 0
+    for i in range(len(roman)):
+        current = roman_numerals.get(roman[i], 0)
+        next_val = roman_numerals.get(roman[i + 1], 0) if i + 1 < len(roman) else 0
+        if current < next_val:
+            total -= current
+        else:
+            total += current
+    return total
+
+def hash_file(file_path: Path) -> str:
+    """SHA-256 of a file's raw bytes, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def chapter_number(filename: str) -> int:
+    """Extract the chapter number from a CHAPTER_<roman>_... filename"""
+    match = re.search(r'CHAPTER_([IVX]+)', filename)
+    if match:
+        return roman_to_int(match.group(1))
+    return 999  # Put unmatched files at the end
+
+class SourceChapter:
+    """One chapter source file"""
+
+    def __init__(self, path: Path, content: str, document: Optional[Document] = None):
+        self.path = path
+        self.name = path.stem
+        self.filename = path.name
+        self.number = chapter_number(path.name)
+        self.content = content
+        self._document = document
+
+    @property
+    def document(self) -> Document:
+        """Markdown block AST of the chapter text, parsed once; treat as read-only"""
+        if self._document is None:
+            self._document = parse_markdown(self.content)
+        return self._document
+
+class BookSource:
+    """Book source files read once and shared by every processor"""
+
+    def __init__(self, base_dir: Path):
+        self.base_dir = Path(base_dir)
+        self.chapters_dir = self.base_dir / "content/chapters"
+        self.annotations_file = self.base_dir / "content/data/annotations.json"
+        self.front_matter_file = self.base_dir / "front_matter.md"
+        self.back_matter_file = self.base_dir / "back_matter.md"
+
+        self._texts = {}
+        self._documents = {}
+        self._chapters = None
+        self._annotations_hash = None
+
+    def read_text(self, file_path: Path) -> Optional[str]:
+        """Return a file's text, reading it from disk only the first time; None if it does not exist"""
+        key = Path(file_path).resolve()
+        if key not in self._texts:
+            if not key.exists():
+                self._texts[key] = None
+            else:
+                with open(key, 'r', encoding='utf-8') as f:
+                    self._texts[key] = f.read()
+        return self._texts[key]
+
+    def document(self, file_path: Path) -> Optional[Document]:
+        """Markdown block AST of a file, parsed only the first time; None if it does not exist"""
+        key = Path(file_path).resolve()
+        if key not in self._documents:
+            text = self.read_text(key)
+            self._documents[key] = parse_markdown(text) if text is not None else None
+        return self._documents[key]
+
+    @property
+    def chapters(self) -> List[SourceChapter]:
+        """Chapter sources ordered by chapter number"""
+        if self._chapters is None:
+            if not self.chapters_dir.exists():
+                raise FileNotFoundError(f"Chapters directory not found: {self.chapters_dir}")
+            paths = sorted(self.chapters_dir.glob("*.md"), key=lambda p: (chapter_number(p.name), p.name))
+            self._chapters = [SourceChapter(path, self.read_text(path), self.document(path)) for path in paths]
+        return self._chapters
+
+    @property
+    def front_matter(self) -> Optional[str]:
+        return self.read_text(self.front_matter_file)
+
+    @property
+    def back_matter(self) -> Optional[str]:
+        return self.read_text(self.back_matter_file)
+
+    @property
+    def front_matter_document(self) -> Optional[Document]:
+        return self.document(self.front_matter_file)
+
+    @property
+    def back_matter_document(self) -> Optional[Document]:
+        return self.document(self.back_matter_file)
+
+    def _require_annotations_file(self):
+        if not self.annotations_file.exists():
+            raise FileNotFoundError(f"Annotations file not found: {self.annotations_file}")
+
+    @property
+    def annotations_hash(self) -> str:
+        """SHA-256 of the raw annotations file"""
+        if self._annotations_hash is None:
+            self._require_annotations_file()
+            self._annotations_hash = hash_file(self.annotations_file)
+        return self._annotations_hash
+
+    def iter_annotations(self) -> Iterator[Dict[str, Any]]:
+        """Raw annotation records one at a time, streamed from the file on every call
+
+        The records are never held as one list; each processor folds them into
+        its own per-record results as they arrive.
+        """
+        self._require_annotations_file()
+        return iter_json_array(self.annotations_file)
+
+def parse_sources(book_dir: Path = Path(".")) -> BookSource:
+    """Read every source file of a book into a shared BookSource
+
+    Annotations are only hashed here; they are streamed by each processor.
+    """
+    source = BookSource(book_dir)
+    # Touch each lazy property so every file is read and parsed now
+    source.chapters, source.front_matter_document, source.back_matter_document, source.annotations_hash
+    return source
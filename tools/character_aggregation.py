@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Single-pass character aggregation for Blackthorn Manor timelines
+Each annotation is scanned once and folded into its character's running
+totals, which can also be updated incrementally when one annotation changes.
+"""
+
+from collections import Counter
+from typing import Dict, Any, Optional
+
+THEME_KEYWORDS = {
+    'supernatural': ['entity', 'manifestation', 'supernatural', 'otherworld', 'dimension'],
+    'architecture': ['building', 'structure', 'foundation', 'room', 'chamber'],
+    'investigation': ['research', 'study', 'investigate', 'analyze', 'evidence'],
+    'danger': ['danger', 'warning', 'threat', 'disappear', 'missing'],
+    'family_secrets': ['family', 'secret', 'tradition', 'ritual', 'guardian']
+}
+SEVERITY_KEYWORDS = ['dangerous', 'entity', 'disappear', 'warning', 'threat', 'supernatural']
+KNOWLEDGE_KEYWORDS = ['know', 'understand', 'explain', 'theory', 'cause', 'reason']
+DISAPPEARANCE_KEYWORDS = ['disappear', 'missing', 'vanish', 'gone', 'last entry', 'final']
+
+DISAPPEARANCE_RISK_CHARACTERS = ['JR', 'SW']
+
+def annotation_features(text: str) -> Dict[str, Any]:
+    """Keyword features of one annotation, computed from a single lower-cased copy of its text"""
+    text_lower = text.lower()
+    return {
+        'themes': [theme for theme, keywords in THEME_KEYWORDS.items()
+                   if any(keyword in text_lower for keyword in keywords)],
+        'severity': sum(1 for keyword in SEVERITY_KEYWORDS if keyword in text_lower),
+        'knowledge': sum(1 for keyword in KNOWLEDGE_KEYWORDS if keyword in text_lower),
+        'mentionsDisappearance': 'disappear' in text_lower,
+        'isClue': any(keyword in text_lower for keyword in DISAPPEARANCE_KEYWORDS)
+    }
+
+def severity_label(score: int) -> str:
+    if score >= 5:
+        return 'extreme'
+    elif score >= 3:
+        return 'high'
+    elif score >= 1:
+        return 'medium'
+    return 'low'
+
+def knowledge_label(score: int) -> str:
+    if score >= 3:
+        return 'high'
+    elif score >= 1:
+        return 'medium'
+    return 'low'
+
+def involvement_label(count: int) -> str:
+    return 'high' if count > 5 else 'medium' if count > 2 else 'low'
+
+class CharacterAccumulator:
+    """Running totals for one character's annotations"""
+
+    def __init__(self, character: str, full_name: str, role: str):
+        self.character = character
+        self.full_name = full_name
+        self.role = role
+        self.entries = {}  # annotation id -> (annotation, features), in arrival order
+        self.years = Counter()
+        self.theme_hits = Counter()
+        self.severity = 0
+        self.knowledge = 0
+        self.disappearance_mentions = 0
+
+    def _apply(self, features: Dict[str, Any], year: Optional[int], sign: int):
+        if year:
+            self.years[year] += sign
+            if self.years[year] <= 0:
+                del self.years[year]
+        for theme in features['themes']:
+            self.theme_hits[theme] += sign
+            if self.theme_hits[theme] <= 0:
+                del self.theme_hits[theme]
+        self.severity += sign * features['severity']
+        self.knowledge += sign * features['knowledge']
+        self.disappearance_mentions += sign * features['mentionsDisappearance']
+
+    def add(self, annotation: Dict, features: Optional[Dict[str, Any]] = None):
+        """Fold one annotation into the totals, replacing any earlier version with the same id"""
+        if annotation['id'] in self.entries:
+            previous, previous_features = self.entries[annotation['id']]
+            self._apply(previous_features, previous.get('year'), -1)
+        features = features or annotation_features(annotation['text'])
+        # Reassigning an existing id keeps its place, so timeline ties stay in source order
+        self.entries[annotation['id']] = (annotation, features)
+        self._apply(features, annotation.get('year'), 1)
+
+    def remove(self, annotation_id: str):
+        """Take one annotation back out of the totals"""
+        annotation, features = self.entries.pop(annotation_id)
+        self._apply(features, annotation.get('year'), -1)
+
+    def timeline(self) -> Dict[str, Any]:
+        """Character timeline in the enhanced book format"""
+        entries = sorted(self.entries.values(), key=lambda entry: entry[0].get('year') or 1967)
+        annotations = [annotation for annotation, _ in entries]
+        count = len(annotations)
+
+        if self.years:
+            time_span = f"{min(self.years)}-{max(self.years)}"
+        else:
+            time_span = "Unknown"
+
+        clues = []
+        for annotation, features in entries:
+            if features['isClue']:
+                text = annotation['text']
+                clues.append(text[:100] + '...' if len(text) > 100 else text)
+
+        return {
+            'character': self.character,
+            'fullName': self.full_name,
+            'role': self.role,
+            'timeline': annotations,
+            'storyArc': {
+                'character': self.character,
+                'totalAnnotations': count,
+                'timeSpan': time_span,
+                'keyThemes': [theme for theme in THEME_KEYWORDS if self.theme_hits.get(theme)],
+                'mysterySeverity': severity_label(self.severity)
+            },
+            'mysteryInvolvement': {
+                'involvementLevel': involvement_label(count),
+                'disappearanceRisk': self.character in DISAPPEARANCE_RISK_CHARACTERS and self.disappearance_mentions > 0,
+                'knowledgeLevel': knowledge_label(self.knowledge),
+                'lastActivity': max(self.years) if self.years else 1967
+            },
+            'disappearanceClues': clues
+        }
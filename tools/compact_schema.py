@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Compact wire schema for Blackthorn Manor web book data
+Encodes web_book_data.json with every key and repeated string value moved into
+a string table, objects reduced to a shape id plus their values, positions
+quantized to per-mille integers, and false, null and empty-list values
+omitted. Object keys are stringified as json.dump would, so decode() restores
+the structure json.load reads from the plain file.
+
+Encoded layout:
+    {"schema": "blackthorn-compact", "version": 1,
+     "strings": [...],                       # keys and dictionary-encoded values
+     "shapes": [[[key ids], "codecs"], ...], # one codec character per key
+     "data": ...}                            # objects are {"<shape id>": [values]}
+
+Codecs: '.' plain value, 's' string table index, 'm' per-mille integer,
+'f' omitted false, 'n' omitted null, 'l' omitted empty list.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+COMPACT_SCHEMA = 'blackthorn-compact'
+COMPACT_SCHEMA_VERSION = 1
+
+# Keys whose string values repeat across pages and annotations
+DICTIONARY_KEYS = {
+    'character', 'characterStyle', 'style', 'chapterName', 'chapter', 'type',
+    'section', 'zone', 'characterArc', 'name', 'role', 'fullName', 'file'
+}
+
+# Page-relative coordinates and angles stored as integers
+QUANTIZED_KEYS = {'x', 'y', 'rotation', 'width', 'height'}
+QUANTIZE_SCALE = 1000
+
+_OMITTED = {'f': False, 'n': None}
+
+class _Encoder:
+    def __init__(self):
+        self.strings = []
+        self.string_ids = {}
+        self.shapes = []
+        self.shape_ids = {}
+
+    def string(self, value: str) -> int:
+        if value not in self.string_ids:
+            self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return self.string_ids[value]
+
+    def value(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return self.object(value)
+        if isinstance(value, list):
+            return [self.value(item) for item in value]
+        return value
+
+    def object(self, obj: Dict) -> Dict[str, List]:
+        keys, codecs, values = [], [], []
+        for key, value in obj.items():
+            if not isinstance(key, str):
+                # Same text json.dumps writes for a non-string key: 1 -> "1", True -> "true"
+                key = json.dumps(key)
+            keys.append(self.string(key))
+            if value is False:
+                codecs.append('f')
+            elif value is None:
+                codecs.append('n')
+            elif isinstance(value, list) and not value:
+                codecs.append('l')
+            elif key in DICTIONARY_KEYS and isinstance(value, str):
+                codecs.append('s')
+                values.append(self.string(value))
+            elif key in QUANTIZED_KEYS and isinstance(value, float):
+                codecs.append('m')
+                values.append(round(value * QUANTIZE_SCALE))
+            else:
+                codecs.append('.')
+                values.append(self.value(value))
+
+        shape = (tuple(keys), ''.join(codecs))
+        if shape not in self.shape_ids:
+            self.shape_ids[shape] = len(self.shapes)
+            self.shapes.append([list(shape[0]), shape[1]])
+        return {str(self.shape_ids[shape]): values}
+
+def encode(data: Any) -> Dict[str, Any]:
+    """Encode web book data into the compact schema"""
+    encoder = _Encoder()
+    encoded = encoder.value(data)
+    return {
+        'schema': COMPACT_SCHEMA,
+        'version': COMPACT_SCHEMA_VERSION,
+        'strings': encoder.strings,
+        'shapes': encoder.shapes,
+        'data': encoded
+    }
+
+def decode(payload: Dict[str, Any]) -> Any:
+    """Reference decoder: rebuild web book data from the compact schema
+
+    Quantized coordinates come back rounded to 1/1000.
+    """
+    if payload.get('schema') != COMPACT_SCHEMA:
+        raise ValueError(f"Not a compact book file: schema {payload.get('schema')!r}")
+    if payload.get('version') != COMPACT_SCHEMA_VERSION:
+        raise ValueError(f"Unsupported compact schema version {payload.get('version')} "
+                         f"(expected {COMPACT_SCHEMA_VERSION})")
+
+    strings = payload['strings']
+    shapes = [([strings[key] for key in keys], codecs) for keys, codecs in payload['shapes']]
+
+    def value(encoded: Any) -> Any:
+        if isinstance(encoded, dict):
+            (shape_id, values), = encoded.items()
+            keys, codecs = shapes[int(shape_id)]
+            remaining = iter(values)
+            obj = {}
+            for key, codec in zip(keys, codecs):
+                if codec in _OMITTED:
+                    obj[key] = _OMITTED[codec]
+                elif codec == 'l':
+                    obj[key] = []
+                elif codec == 's':
+                    obj[key] = strings[next(remaining)]
+                elif codec == 'm':
+                    obj[key] = next(remaining) / QUANTIZE_SCALE
+                else:
+                    obj[key] = value(next(remaining))
+            return obj
+        if isinstance(encoded, list):
+            return [value(item) for item in encoded]
+        return encoded
+
+    return value(payload['data'])
+
+def write_compact(data: Any, output_file: Path) -> Tuple[int, int, int]:
+    """Write the compact encoding of data; returns (pretty-printed JSON, minified JSON, compact) sizes in bytes"""
+    pretty_size = len(json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'))
+    minified_size = len(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    payload = json.dumps(encode(data), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    with open(output_file, 'wb') as f:
+        f.write(payload)
+    return pretty_size, minified_size, len(payload)
+
+def _saved(before: int, after: int) -> float:
+    return 100 * (1 - after / before) if before else 0
+
+def format_sizes(pretty_size: int, minified_size: int, compact_size: int) -> str:
+    return (f"{compact_size / 1024:,.0f} KB, {_saved(minified_size, compact_size):.0f}% smaller than minified JSON "
+            f"({minified_size / 1024:,.0f} KB) and {_saved(pretty_size, compact_size):.0f}% smaller than "
+            f"the indented file ({pretty_size / 1024:,.0f} KB)")
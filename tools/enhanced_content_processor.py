@@ -6,15 +6,59 @@ Includes front matter and back matter processing.
 """
 
 import json
+import multiprocessing
 import os
 import re
 import sys
+import threading
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Callable, Iterator, Optional, Tuple
 import random
+import zlib
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
 from enum import Enum
 from datetime import datetime
 
+from annotation_cache import AnnotationCache
+from annotation_layout import layout_page_annotations
+from asset_emitter import write_content_addressed_assets
+from book_source import BookSource, chapter_number, hash_file, roman_to_int
+from compact_schema import write_compact, format_sizes
+from character_aggregation import CharacterAccumulator
+from json_stream import iter_json_array
+from keyword_features import KeywordMatrix, REVEAL_KEYWORDS
+from level_variants import write_reveal_level_variants
+from near_duplicates import NearDuplicateIndex
+from markdown_blocks import (
+    SECTION_START, Block, Document, Repagination, parse_markdown, paginate, repaginate, join_blocks, iter_section_headings
+)
+from page_renderer import FragmentCache, render_pages
+from reveal_index import attach_reveal_index
+from source_map import (
+    SourceText, attach_source_maps, attach_annotation_sources, build_source_index, write_source_index
+)
+from stage_scheduler import Stage, StageScheduler
+
+# Bump whenever process_single_annotation() output changes so cached records are discarded
+ANNOTATION_PROCESSOR_VERSION = 1
+
+# Streamed annotation records looked up in the cache per batch
+ANNOTATION_BATCH_SIZE = 500
+
+# Words per page in chapters and in the back matter
+CHAPTER_PAGE_WORDS = 250
+BACK_MATTER_PAGE_WORDS = 300
+
+# Derived annotation fields, in the order they appear in serialized annotations.
+# They are only computed for annotations on pages an output target emits.
+DERIVED_ANNOTATION_FIELDS = ['characterArc', 'relatedAnnotations']
+
+# Output targets of run(): enhanced_*.json and front/back matter files, and
+# web_book_data(.compact).json with its level variants and assets
+TARGETS = ['flutter', 'web']
+
 class AnnotationType(Enum):
     MARGINALIA = "marginalia"
     POST_IT = "postIt"
@@ -36,24 +80,80 @@ class RevealLevel(Enum):
     MODERN_MYSTERY = 4    # Current investigation
     COMPLETE_TRUTH = 5    # Full supernatural revelation
 
+class BookModel:
+    """In-memory result of a processing run, independent of any output files"""
+    def __init__(self, enhanced_book: Dict, characters: Dict, character_timelines: Dict,
+                 revelation_system: Dict, web_book_data: Dict):
+        self.enhanced_book = enhanced_book
+        self.characters = characters
+        self.character_timelines = character_timelines
+        self.revelation_system = revelation_system
+        self.web_book_data = web_book_data
+    
+    @property
+    def chapters(self) -> List[Dict]:
+        return self.enhanced_book['chapters']
+    
+    @property
+    def front_matter(self) -> Dict:
+        return self.enhanced_book['frontMatter']
+    
+    @property
+    def back_matter(self) -> Dict:
+        return self.enhanced_book['backMatter']
+
 class EnhancedContentProcessor:
-    def __init__(self):
-        self.chapters_dir = Path("content/chapters")
-        self.data_dir = Path("content/data")
-        self.output_dir = Path("flutter_app/assets/data")
-        self.web_output_dir = Path("web_app/data")
+    def __init__(self, base_dir: Optional[Path] = None, use_cache: bool = True,
+                 source: Optional[BookSource] = None, back_matter_workers: Optional[int] = 1):
+        if source is not None:
+            base_dir = source.base_dir
+        self.base_dir = Path(base_dir) if base_dir is not None else Path(".")
+        self.source = source
+        self.use_cache = use_cache
+        self.cache_dir = self.base_dir / ".cache"
+        self.chapters_dir = self.base_dir / "content/chapters"
+        self.data_dir = self.base_dir / "content/data"
+        self.output_dir = self.base_dir / "flutter_app/assets/data"
+        self.web_output_dir = self.base_dir / "web_app/data"
         
         # New: Front and back matter files
-        self.front_matter_file = Path("front_matter.md")
-        self.back_matter_file = Path("back_matter.md")
+        self.front_matter_file = self.base_dir / "front_matter.md"
+        self.back_matter_file = self.base_dir / "back_matter.md"
         
         self.annotations = []
+        self.annotations_by_chapter = {}
         self.chapters = []
         self.front_matter = {}
         self.back_matter = {}
         self.characters = {}
         self.redacted_content = []
         self.character_timeline = {}
+        self.character_aggregates = {}
+        self.keyword_matrix = None
+        self.model = None
+        
+        # Positioned annotations still missing derived fields: id(annotation) -> (annotation, source, related pool)
+        self.pending_fields = {}
+        self.pending_lock = threading.Lock()
+        self._keyword_sets = {}
+        
+        # annotations.json records that reappear as embedded notes: record id -> canonical embedded records
+        self.duplicate_index = None
+        self.duplicate_lock = threading.Lock()
+        self.merged_annotations = {}
+        
+        # Source files pages were built from, by file ID
+        self.source_texts = {}
+        
+        # Blocks on each page of each source file, by file ID, for incremental re-pagination
+        self.page_layouts = {}
+        
+        # Start a new page at every heading instead of only when a page is full
+        self.page_break_at_headings = False
+        
+        # Processes scanning back matter sections; None uses one per CPU. More than one starts a
+        # spawned process pool, which needs callers to guard their entry point with __main__
+        self.back_matter_workers = back_matter_workers
         
         # Enhanced character annotation patterns for back matter
         self.character_patterns = {
@@ -75,6 +175,16 @@ class EnhancedContentProcessor:
             "Dr. Chambers": r"\[Black fountain pen\](.*?)(?=Dr[.\s]+[A-Za-z]+\s+Chambers)"
         }
         
+        # Character positioning preferences
+        self.character_zones = {
+            'MB': [AnnotationZone.RIGHT_MARGIN, AnnotationZone.TOP_MARGIN],  # Margaret prefers right side
+            'JR': [AnnotationZone.LEFT_MARGIN, AnnotationZone.BOTTOM_MARGIN],  # James prefers left side
+            'EW': [AnnotationZone.RIGHT_MARGIN, AnnotationZone.CONTENT],  # Eliza uses precise positioning
+            'SW': [AnnotationZone.LEFT_MARGIN, AnnotationZone.CONTENT],  # Simon uses available space
+            'Detective Sharma': [AnnotationZone.TOP_MARGIN, AnnotationZone.BOTTOM_MARGIN],  # Official notes
+            'Dr. Chambers': [AnnotationZone.BOTTOM_MARGIN, AnnotationZone.RIGHT_MARGIN]  # Government style
+        }
+        
         # Redaction patterns
         self.redaction_patterns = [
             r"\[REDACTED\]",
@@ -85,37 +195,90 @@ class EnhancedContentProcessor:
             r"\[CONTENT WITHHELD\]"
         ]
     
-    def run(self):
-        """Enhanced processing pipeline with front/back matter"""
-        print("🏰 Enhanced Blackthorn Manor Content Processing with Front/Back Matter...")
+    def run(self, max_workers: int = 1, targets: Optional[List[str]] = None):
+        """Enhanced processing pipeline with front/back matter
         
-        # Process front and back matter first
-        self.process_front_matter()
-        self.process_back_matter()
-        
-        # Continue with existing pipeline
-        self.load_annotations()
-        self.process_all_chapters()
-        self.extract_embedded_annotations()
-        self.process_redacted_content()
-        self.create_character_timelines()
-        self.generate_progressive_revelation()
-        self.save_enhanced_data()
-        self.create_web_app_data()
-        self.generate_comprehensive_statistics()
+        targets limits the outputs written to a subset of TARGETS; derived fields
+        are only computed for the pages the written targets emit. Stages run one
+        at a time unless max_workers allows threads (see stage_scheduler).
+        """
+        print("🏰 Enhanced Blackthorn Manor Content Processing with Front/Back Matter...")
+        targets = list(TARGETS) if targets is None else targets
+        unknown = [target for target in targets if target not in TARGETS]
+        if unknown:
+            raise ValueError(f"Unknown output target(s): {', '.join(unknown)}")
+        
+        # Output sinks only need the assembled model, so they are independent of each other
+        sinks = [Stage('generate_comprehensive_statistics', self.generate_comprehensive_statistics, inputs=['model']),
+                 Stage('create_source_index', self.create_source_index, inputs=['model'])]
+        if 'flutter' in targets:
+            sinks.append(Stage('save_enhanced_data', lambda: self.save_enhanced_data(self.model), inputs=['model']))
+        if 'web' in targets:
+            sinks += [
+                Stage('create_web_app_data', lambda: self.create_web_app_data(self.model), inputs=['model']),
+                Stage('create_reveal_level_variants', lambda: self.create_reveal_level_variants(self.model),
+                      inputs=['model']),
+                Stage('create_content_addressed_assets', lambda: self.create_content_addressed_assets(self.model),
+                      inputs=['model'])
+            ]
+        scheduler = StageScheduler(self._build_stages() + sinks, max_workers)
+        scheduler.run()
+        scheduler.report()
         
         print("✅ Enhanced content processing completed successfully!")
     
+    def build(self, max_workers: int = 1) -> BookModel:
+        """Run all processing stages and return the book model without writing output files
+        
+        Every page's annotations get their derived fields. With use_cache the annotation and
+        page fragment caches under .cache are still read and updated.
+        """
+        scheduler = StageScheduler(self._build_stages(), max_workers)
+        scheduler.run()
+        self.materialize_fields(self._all_pages())
+        return self.model
+    
+    def _build_stages(self) -> List[Stage]:
+        """Processing stages with the state each one reads and writes"""
+        return [
+            Stage('process_front_matter', self.process_front_matter, outputs=['front_matter']),
+            Stage('load_annotations', self.load_annotations, outputs=['annotations']),
+            Stage('process_back_matter', self.process_back_matter, inputs=['annotations'], outputs=['back_matter']),
+            Stage('process_all_chapters', self.process_all_chapters, inputs=['annotations'], outputs=['chapters']),
+            Stage('merge_duplicate_annotations', self.merge_duplicate_annotations, inputs=['chapters', 'back_matter'],
+                  outputs=['merged_annotations']),
+            Stage('layout_annotations', self.layout_annotations, inputs=['chapters', 'back_matter'],
+                  outputs=['layout']),
+            Stage('extract_embedded_annotations', self.extract_embedded_annotations, inputs=['chapters']),
+            Stage('process_redacted_content', self.process_redacted_content, inputs=['chapters'],
+                  outputs=['redacted_content']),
+            Stage('create_character_timelines', self.create_character_timelines, inputs=['merged_annotations'],
+                  outputs=['character_timeline']),
+            Stage('generate_progressive_revelation', self.generate_progressive_revelation,
+                  outputs=['revelation_system']),
+            Stage('assemble_model', self._assemble_model,
+                  inputs=['front_matter', 'layout', 'redacted_content', 'character_timeline', 'revelation_system'],
+                  outputs=['model'])
+        ]
+    
+    def _assemble_model(self):
+        self.model = BookModel(
+            enhanced_book=self.get_enhanced_book_data(),
+            characters=self._generate_enhanced_character_data(),
+            character_timelines=self.character_timeline,
+            revelation_system=self.revelation_system,
+            web_book_data=self.get_web_app_data()
+        )
+    
     def process_front_matter(self):
         """Process front matter file"""
         print("📄 Processing front matter...")
         
-        if not self.front_matter_file.exists():
+        content = self._read_source_text(self.front_matter_file)
+        if content is None:
             print(f"   ⚠️  Front matter file not found: {self.front_matter_file}")
             return
-        
-        with open(self.front_matter_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        document = self._source_document(self.front_matter_file, content)
         
         # Extract title page information
         title_match = re.search(r'THE ARCHITECTURAL HISTORY OF\s*\n\s*BLACKTHORN MANOR:\s*\n\s*A Study in Victorian Design', content)
@@ -131,10 +294,11 @@ class EnhancedContentProcessor:
             'year': 1967,
             'content': content,
             'sections': self._parse_front_matter_sections(content),
-            'wordCount': len(content.split()),
+            'wordCount': document.word_count,
             'annotations': [],  # Front matter typically has no annotations
-            'pages': self._create_front_matter_pages(content)
+            'pages': self._create_front_matter_pages(document)
         }
+        attach_source_maps(self.front_matter['pages'], self._source_text(self.front_matter_file, content))
         
         print(f"   📄 Front matter processed: {len(self.front_matter['pages'])} pages")
     
@@ -142,34 +306,97 @@ class EnhancedContentProcessor:
         """Process back matter file with extensive embedded annotations"""
         print("📚 Processing back matter with embedded annotations...")
         
-        if not self.back_matter_file.exists():
+        content = self._read_source_text(self.back_matter_file)
+        if content is None:
             print(f"   ⚠️  Back matter file not found: {self.back_matter_file}")
             return
+        document = self._source_document(self.back_matter_file, content)
         
-        with open(self.back_matter_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Extract embedded annotations from back matter
-        embedded_annotations = self._extract_embedded_annotations(content, "back_matter")
+        # Sections never share a note, so they are scanned and paginated independently
+        sections = self._back_matter_sections(document)
+        with self._back_matter_executor(len(sections)) as executor:
+            scans = self._map_sections(executor, _scan_back_matter_section,
+                                       [(text, self.page_break_at_headings) for _, text in sections])
+            
+            # Embedded annotations from every section, numbered as if extracted from the whole text
+            matches = {}
+            for (offset, _), (section_matches, _, _, _) in zip(sections, scans):
+                for character, found in section_matches.items():
+                    matches.setdefault(character, []).extend(
+                        (start + offset, end + offset, *rest) for start, end, *rest in found)
+            embedded_annotations = self._embedded_annotations_from_matches(matches, "back_matter")
+            source = self._source_text(self.back_matter_file, content)
+            attach_annotation_sources(embedded_annotations, source)
+            
+            # Any page can hold a note from any section, so notes are matched once all are known
+            note_texts = [annotation['text'] for annotation in embedded_annotations]
+            belonging = self._map_sections(executor, _match_back_matter_notes,
+                                           [(page_texts, note_texts) for _, _, page_texts, _ in scans])
+        
+        content_with_redactions = ''.join(text for _, text, _, _ in scans)
+        blocks = parse_markdown(content_with_redactions).blocks
+        layout = []
+        position = 0
+        for _, _, page_texts, _ in scans:
+            for page_text in page_texts:
+                count = page_text.count('\n\n') + 1
+                layout.append(blocks[position:position + count])
+                position += count
+        self.page_layouts[source.file_id] = layout
         
-        # Process redacted content
-        content_with_redactions = self._process_text_redactions(content)
+        pages = []
+        for (_, _, _, section_redactions), section_belonging in zip(scans, belonging):
+            for redacted_sections, note_indexes in zip(section_redactions, section_belonging):
+                page_blocks = layout[len(pages)]
+                pages.append(self._back_matter_page(
+                    page_blocks, len(pages) + 1, [embedded_annotations[i] for i in note_indexes], redacted_sections))
         
         # Create back matter structure
         self.back_matter = {
             'type': 'back_matter',
             'title': 'Appendices and Historical Documentation',
             'content': content,
-            'sections': self._parse_back_matter_sections(content),
-            'wordCount': len(content.split()),
+            'sections': self._parse_back_matter_sections(document),
+            'wordCount': document.word_count,
             'embeddedAnnotations': embedded_annotations,
-            'pages': self._create_back_matter_pages(content_with_redactions, embedded_annotations),
+            'pages': pages,
             'hasRedactedContent': True,
             'characterCount': len(set(ann['character'] for ann in embedded_annotations))
         }
+        attach_source_maps(self.back_matter['pages'], source, content_with_redactions)
         
         print(f"   📚 Back matter processed: {len(self.back_matter['pages'])} pages, {len(embedded_annotations)} embedded annotations")
     
+    def _source_file_id(self, file_path: Path) -> str:
+        """A source file's path within the book"""
+        file_path = Path(file_path)
+        try:
+            return file_path.resolve().relative_to(self.base_dir.resolve()).as_posix()
+        except ValueError:
+            return file_path.as_posix()
+    
+    def _source_text(self, file_path: Path, content: str) -> SourceText:
+        """Register a source file for source maps"""
+        source = SourceText(self._source_file_id(file_path), content)
+        self.source_texts[source.file_id] = source
+        return source
+    
+    def _source_document(self, file_path: Path, content: str) -> Document:
+        """Markdown blocks of a source text, shared through the BookSource when it holds this text"""
+        document = self.source.document(file_path) if self.source is not None else None
+        if document is None or document.text != content:
+            document = parse_markdown(content)
+        return document
+    
+    def _read_source_text(self, file_path: Path) -> Optional[str]:
+        """Read a source file through the shared BookSource when one is attached"""
+        if self.source is not None:
+            return self.source.read_text(file_path)
+        if not file_path.exists():
+            return None
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    
     def _parse_front_matter_sections(self, content: str) -> List[Dict]:
         """Parse front matter sections"""
         sections = []
@@ -186,15 +413,15 @@ class EnhancedContentProcessor:
         
         return sections
     
-    def _parse_back_matter_sections(self, content: str) -> List[Dict]:
+    def _parse_back_matter_sections(self, document: Document) -> List[Dict]:
         """Parse back matter sections"""
         sections = []
+        blocks = document.blocks
         
         # Extract appendices
-        appendix_pattern = r'APPENDIX ([A-Z]):\s*([^\n]+)'
-        appendices = re.findall(appendix_pattern, content)
-        
-        for letter, title in appendices:
+        appendix_pattern = re.compile(r'APPENDIX ([A-Z]):\s*([^\n]+)')
+        for match in iter_section_headings(blocks, appendix_pattern):
+            letter, title = match.groups()
             sections.append({
                 'type': 'appendix',
                 'letter': letter,
@@ -203,129 +430,82 @@ class EnhancedContentProcessor:
             })
         
         # Extract chapters
-        chapter_pattern = r'CHAPTER ([IVX]+):\s*([^\n]+)'
-        chapters = re.findall(chapter_pattern, content)
-        
-        for roman, title in chapters:
+        chapter_pattern = re.compile(r'CHAPTER ([IVX]+):\s*([^\n]+)')
+        for match in iter_section_headings(blocks, chapter_pattern):
+            roman, title = match.groups()
             sections.append({
                 'type': 'chapter',
-                'number': self._roman_to_int(roman),
+                'number': roman_to_int(roman),
                 'title': title,
                 'fullTitle': f'Chapter {roman}: {title}'
             })
         
         return sections
     
-    def _create_front_matter_pages(self, content: str) -> List[Dict]:
-        """Create front matter pages"""
+    def _create_front_matter_pages(self, document: Document) -> List[Dict]:
+        """Create front matter pages, one per block"""
         pages = []
-        sections = content.split('\n\n')
-        
-        page_number = 1
-        for section in sections:
-            if section.strip():
-                pages.append({
-                    'pageNumber': page_number,
-                    'type': 'front_matter',
-                    'content': section.strip(),
-                    'wordCount': len(section.split()),
-                    'annotations': [],
-                    'annotationCount': 0,
-                    'redactedSections': [],
-                    'revealLevels': [RevealLevel.ACADEMIC.value]
-                })
-                page_number += 1
-        
-        return pages
-    
-    def _create_back_matter_pages(self, content: str, embedded_annotations: List[Dict]) -> List[Dict]:
-        """Create back matter pages with embedded annotations"""
-        pages = []
-        
-        # Split content into logical sections
-        sections = re.split(r'\n\n(?=CHAPTER|APPENDIX)', content)
-        
-        page_number = 1
-        for section in sections:
-            if not section.strip():
-                continue
-            
-            # Split large sections into multiple pages
-            section_pages = self._split_section_into_pages(section, page_number, embedded_annotations)
-            pages.extend(section_pages)
-            page_number += len(section_pages)
-        
-        return pages
-    
-    def _split_section_into_pages(self, section: str, start_page: int, embedded_annotations: List[Dict]) -> List[Dict]:
-        """Split a section into multiple pages"""
-        pages = []
-        paragraphs = [p.strip() for p in section.split('\n\n') if p.strip()]
-        
-        current_page_content = []
-        current_word_count = 0
-        page_number = start_page
-        
-        for paragraph in paragraphs:
-            paragraph_words = len(paragraph.split())
-            
-            # Check if adding this paragraph would exceed page limit
-            if current_word_count + paragraph_words > 300 and current_page_content:
-                # Create page
-                page_content = '\n\n'.join(current_page_content)
-                page_annotations = self._get_annotations_for_page(page_content, embedded_annotations)
-                
-                pages.append({
-                    'pageNumber': page_number,
-                    'type': 'back_matter',
-                    'content': page_content,
-                    'wordCount': current_word_count,
-                    'annotations': page_annotations,
-                    'annotationCount': len(page_annotations),
-                    'redactedSections': self._find_redacted_sections(page_content),
-                    'revealLevels': self._calculate_page_reveal_levels(page_annotations),
-                    'hasEmbeddedContent': len(page_annotations) > 0
-                })
-                
-                # Start new page
-                current_page_content = [paragraph]
-                current_word_count = paragraph_words
-                page_number += 1
-            else:
-                current_page_content.append(paragraph)
-                current_word_count += paragraph_words
         
-        # Create final page
-        if current_page_content:
-            page_content = '\n\n'.join(current_page_content)
-            page_annotations = self._get_annotations_for_page(page_content, embedded_annotations)
-            
+        for page_number, block in enumerate(document.blocks, 1):
             pages.append({
                 'pageNumber': page_number,
-                'type': 'back_matter',
-                'content': page_content,
-                'wordCount': current_word_count,
-                'annotations': page_annotations,
-                'annotationCount': len(page_annotations),
-                'redactedSections': self._find_redacted_sections(page_content),
-                'revealLevels': self._calculate_page_reveal_levels(page_annotations),
-                'hasEmbeddedContent': len(page_annotations) > 0
+                'type': 'front_matter',
+                'content': block.text,
+                'wordCount': block.words,
+                'annotations': [],
+                'annotationCount': 0,
+                'redactedSections': [],
+                'revealLevels': [RevealLevel.ACADEMIC.value]
             })
         
         return pages
     
-    def _get_annotations_for_page(self, page_content: str, embedded_annotations: List[Dict]) -> List[Dict]:
-        """Get annotations that belong to this page based on content proximity"""
-        page_annotations = []
-        
-        # Find annotations that appear in or near this page content
-        for annotation in embedded_annotations:
-            # Check if annotation text appears in this page or if it's contextually related
-            if self._annotation_belongs_to_page(annotation, page_content):
-                positioned_annotation = self._create_positioned_annotation(annotation, len(page_annotations), len(page_annotations))
-                page_annotations.append(positioned_annotation)
-        
-        return page_annotations
+    def _back_matter_sections(self, document: Document) -> List[Tuple[int, str]]:
+        """Offset and text of each CHAPTER or APPENDIX section; together they are the whole content"""
+        content = document.text
+        starts = [0] + [section[0].start for section in document.sections()][1:]
+        return [(start, content[start:end]) for start, end in zip(starts, starts[1:] + [len(content)])]
+    
+    def _back_matter_executor(self, sections: int) -> Executor:
+        """Process pool for back matter sections, or an inline executor when one process is enough"""
+        workers = min(self.back_matter_workers or os.cpu_count() or 1, sections)
+        if workers <= 1:
+            return _InlineExecutor()
+        # This stage runs on a scheduler thread, where forking is unsafe
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    
+    @staticmethod
+    def _map_sections(executor: Executor, worker: Callable, tasks: List[Tuple]) -> List:
+        return list(executor.map(worker, *zip(*tasks))) if tasks else []
+    
+    def _create_back_matter_page(self, page_blocks: List[Block], page_number: int,
+                                 embedded_annotations: List[Dict]) -> Dict:
+        """One back matter page with the embedded annotations found in its text"""
+        page_content = join_blocks(page_blocks)
+        notes = [annotation for annotation in embedded_annotations
+                 if self._annotation_belongs_to_page(annotation, page_content)]
+        return self._back_matter_page(page_blocks, page_number, notes, self._find_redacted_sections(page_content))
+    
+    def _back_matter_page(self, page_blocks: List[Block], page_number: int, notes: List[Dict],
+                          redacted_sections: List[Dict]) -> Dict:
+        page_annotations = self._get_annotations_for_page(notes)
+        return {
+            'pageNumber': page_number,
+            'type': 'back_matter',
+            'content': join_blocks(page_blocks),
+            'wordCount': sum(block.words for block in page_blocks),
+            'annotations': page_annotations,
+            'annotationCount': len(page_annotations),
+            'redactedSections': redacted_sections,
+            'revealLevels': self._calculate_page_reveal_levels(page_annotations),
+            'hasEmbeddedContent': len(page_annotations) > 0
+        }
+    
+    def _get_annotations_for_page(self, notes: List[Dict]) -> List[Dict]:
+        """Position the embedded annotations that belong to a back matter page"""
+        # Back matter is built independently of annotations.json, so it is not cross-referenced against it
+        return [self._create_positioned_annotation(annotation, i, i, related_pool=[])
+                for i, annotation in enumerate(notes)]
     
     def _annotation_belongs_to_page(self, annotation: Dict, page_content: str) -> bool:
         """Determine if an annotation belongs to a specific page"""
@@ -340,48 +520,152 @@ class EnhancedContentProcessor:
         
         return matches >= 2  # At least 2 key phrases match
     
-    def _extract_embedded_annotations(self, content: str, chapter_name: str) -> List[Dict]:
-        """Extract annotations embedded directly in the text - enhanced for back matter"""
-        embedded_annotations = []
+    def _extract_embedded_annotations(self, content: str, chapter_name: str, link_duplicates: bool = True) -> List[Dict]:
+        """Extract annotations embedded directly in the text - enhanced for back matter
+        
+        The single-line and multi-line patterns usually match the same inked note, so
+        every match keeps its source span and overlapping matches for one character
+        collapse into a single annotation, preferring the one with full attribution.
+        """
+        return self._embedded_annotations_from_matches(self._embedded_note_matches(content), chapter_name,
+                                                       link_duplicates)
+    
+    def _embedded_note_matches(self, content: str) -> Dict[str, List[Tuple]]:
+        """Each character's inked notes in content as (start, end, attributed, text, year) in source order"""
+        candidates = {character: [] for character in {**self.character_patterns, **self.multiline_character_patterns}}
         
         # Use both single-line and multi-line patterns
-        all_patterns = {**self.character_patterns, **self.multiline_character_patterns}
-        
-        for character, pattern in all_patterns.items():
-            matches = re.finditer(pattern, content, re.DOTALL | re.IGNORECASE)
-            for match in matches:
-                annotation_text = match.group(1).strip()
-                
-                # Extract year from various formats
-                year_str = None
-                if len(match.groups()) > 1:
-                    year_str = match.group(2)
-                else:
-                    # Try to find year in the annotation text
-                    year_match = re.search(r'\b(19|20)\d{2}\b', annotation_text)
-                    if year_match:
-                        year_str = year_match.group(0)
-                
-                year = self._parse_year(year_str) if year_str else None
-                
-                # Clean up annotation text
-                annotation_text = self._clean_annotation_text(annotation_text)
-                
-                if annotation_text:  # Only add non-empty annotations
-                    embedded_annotations.append({
-                        'id': f"emb_{len(embedded_annotations)}_{character}",
-                        'character': character,
-                        'text': annotation_text,
-                        'year': year,
-                        'chapter': chapter_name,
-                        'type': 'marginalia' if year and year < 2000 else 'postIt',
-                        'isEmbedded': True,
-                        'revealLevel': self._determine_reveal_level(character, year, annotation_text).value,
-                        'characterStyle': self._get_character_style(character)
-                    })
+        for patterns in (self.character_patterns, self.multiline_character_patterns):
+            for character, pattern in patterns.items():
+                matches = re.finditer(pattern, content, re.DOTALL | re.IGNORECASE)
+                for match in matches:
+                    annotation_text = match.group(1).strip()
+                    
+                    # Extract year from various formats
+                    year_str = None
+                    attributed = len(match.groups()) > 1
+                    if attributed:
+                        year_str = match.group(2)
+                    else:
+                        # Try to find year in the annotation text
+                        year_match = re.search(r'\b(19|20)\d{2}\b', annotation_text)
+                        if year_match:
+                            year_str = year_match.group(0)
+                    
+                    # Clean up annotation text
+                    annotation_text = self._clean_annotation_text(annotation_text)
+                    
+                    if annotation_text:  # Only add non-empty annotations
+                        candidates[character].append((match.start(), match.end(), attributed, annotation_text, year_str))
+        
+        return {character: self._resolve_overlapping_matches(matches) for character, matches in candidates.items()}
+    
+    def _embedded_annotations_from_matches(self, matches: Dict[str, List[Tuple]], chapter_name: str,
+                                           link_duplicates: bool = True) -> List[Dict]:
+        embedded_annotations = []
+        found = [(character, match) for character, character_matches in matches.items() for match in character_matches]
+        # Reveal keywords of every note as one matrix column instead of a scan per note
+        reveal_signals = KeywordMatrix((match[3] for _, match in found), REVEAL_KEYWORDS).any(REVEAL_KEYWORDS)
+        for (character, match), reveal_signal in zip(found, reveal_signals):
+            start, end, _, annotation_text, year_str = match
+            year = self._parse_year(year_str) if year_str else None
+            embedded_annotations.append({
+                'id': f"emb_{len(embedded_annotations)}_{character}",
+                'character': character,
+                'text': annotation_text,
+                'year': year,
+                'chapter': chapter_name,
+                'type': 'marginalia' if year and year < 2000 else 'postIt',
+                'isEmbedded': True,
+                'revealLevel': self._determine_reveal_level(character, year, reveal_signal).value,
+                'characterStyle': self._get_character_style(character),
+                'sourceSpan': [start, end]
+            })
         
+        if link_duplicates:
+            self._link_source_duplicates(embedded_annotations)
         return embedded_annotations
     
+    def _duplicate_text(self, text: str) -> str:
+        """Annotation text without the ink marker and signature, as both sources would share it"""
+        return self._clean_annotation_text(re.sub(r'^\s*\[[^\]]*\]', '', text))
+    
+    def _link_source_duplicates(self, embedded_annotations: List[Dict]):
+        """Make embedded notes that repeat an annotations.json record the canonical copy of it
+        
+        The embedded note keeps its text, attribution and location, gains a
+        provenance list naming both sources, and the annotations.json record is
+        dropped later by merge_duplicate_annotations().
+        """
+        with self.duplicate_lock:
+            if self.duplicate_index is None:
+                self.duplicate_index = NearDuplicateIndex(
+                    (annotation['id'], self._duplicate_text(annotation['text'])) for annotation in self.annotations)
+        
+        for embedded in embedded_annotations:
+            match = self.duplicate_index.query(embedded['text'])
+            if not match:
+                continue
+            record_id, similarity = match
+            embedded['provenance'] = [
+                {'source': 'annotations.json', 'id': record_id, 'similarity': round(similarity, 3)},
+                {'source': embedded['chapter'], 'id': embedded['id'], 'sourceSpan': embedded['sourceSpan']}
+            ]
+            with self.duplicate_lock:
+                self.merged_annotations.setdefault(record_id, []).append(embedded)
+    
+    def merge_duplicate_annotations(self):
+        """Drop annotations.json records whose note is already an embedded annotation"""
+        print("🧬 Merging annotations duplicated between annotations.json and embedded notes...")
+        
+        before = len(self.annotations)
+        self._drop_merged_records()
+        
+        copies = sum(len(embedded) for embedded in self.merged_annotations.values())
+        print(f"   🧬 Merged {before - len(self.annotations)} annotations.json records into {copies} embedded notes")
+    
+    def _drop_merged_records(self):
+        kept = [i for i, a in enumerate(self.annotations) if a['id'] not in self.merged_annotations]
+        if self.keyword_matrix is not None:
+            self.keyword_matrix = self.keyword_matrix.take(kept)
+        self.annotations = [self.annotations[i] for i in kept]
+        self.annotations_by_chapter = {
+            chapter: [a for a in annotations if a['id'] not in self.merged_annotations]
+            for chapter, annotations in self.annotations_by_chapter.items()
+        }
+    
+    def _relink_source_duplicates(self, previous: List[Dict], embedded_annotations: List[Dict]):
+        """Replace an edited source's embedded notes in the duplicate links
+        
+        Records merged into a note the edit removed stay dropped until the next
+        full build.
+        """
+        stale = {id(annotation) for annotation in previous}
+        with self.duplicate_lock:
+            for copies in self.merged_annotations.values():
+                copies[:] = [copy for copy in copies if id(copy) not in stale]
+        self._link_source_duplicates(embedded_annotations)
+        self._drop_merged_records()
+    
+    def _resolve_overlapping_matches(self, matches: List[Tuple]) -> List[Tuple]:
+        """Keep one match per group of overlapping source spans, in source order
+        
+        Attributed matches (those that captured the signature year) win over
+        unattributed ones; otherwise the earlier, then longer, match is kept.
+        """
+        resolved = []
+        group_end = -1
+        for match in sorted(matches, key=lambda m: (m[0], -m[1])):
+            start, end, attributed = match[0], match[1], match[2]
+            if resolved and start < group_end:
+                if attributed and not resolved[-1][2]:
+                    resolved[-1] = match
+                group_end = max(group_end, end)
+            else:
+                resolved.append(match)
+                group_end = end
+        return resolved
+    
     def _clean_annotation_text(self, text: str) -> str:
         """Clean annotation text by removing formatting artifacts"""
         # Remove extra whitespace
@@ -402,19 +686,104 @@ class EnhancedContentProcessor:
         print("📂 Loading and categorizing annotations...")
         
         annotations_file = self.data_dir / "annotations.json"
-        if not annotations_file.exists():
+        if self.source is None and not annotations_file.exists():
             raise FileNotFoundError(f"Annotations file not found: {annotations_file}")
         
-        with open(annotations_file, 'r', encoding='utf-8') as f:
-            raw_annotations = json.load(f)
-        
-        # Process and categorize annotations
-        for ann in raw_annotations:
-            processed_ann = self.process_single_annotation(ann)
-            if processed_ann:
-                self.annotations.append(processed_ann)
+        if not self.use_cache:
+            # Records are processed and grouped as they are parsed, never held raw all at once
+            for ann in self._iter_raw_annotations(annotations_file):
+                processed_ann = self.process_single_annotation(ann)
+                if processed_ann:
+                    self.annotations.append(processed_ann)
+                    self._index_annotation(self.annotations_by_chapter, processed_ann)
+            self._index_keywords()
+            
+            print(f"   📝 Processed {len(self.annotations)} annotations")
+            return
         
-        print(f"   📝 Processed {len(self.annotations)} annotations")
+        cache = AnnotationCache(self.cache_dir / "annotations.sqlite", ANNOTATION_PROCESSOR_VERSION)
+        try:
+            if self.source is not None:
+                source_hash = self.source.annotations_hash
+            else:
+                source_hash = hash_file(annotations_file)
+            cached = cache.load(source_hash)
+            if cached:
+                # Warm build: the file is unchanged, skip parsing and processing entirely
+                self.annotations, indexes = cached
+                self.annotations_by_chapter = {
+                    chapter: [self.annotations[i] for i in positions]
+                    for chapter, positions in indexes['byChapter']
+                }
+                self._index_keywords()
+                print(f"   📝 Loaded {len(self.annotations)} annotations from cache")
+                return
+            
+            # Record-level diff: only reprocess records that are not already cached,
+            # looking them up one batch of streamed records at a time
+            keyed_records = []
+            record_count = 0
+            reused = 0
+            raw_annotations = self._iter_raw_annotations(annotations_file)
+            while True:
+                batch = list(islice(raw_annotations, ANNOTATION_BATCH_SIZE))
+                if not batch:
+                    break
+                record_keys = [cache.record_key(ann, record_count + i) for i, ann in enumerate(batch)]
+                record_count += len(batch)
+                known = cache.lookup(record_keys)
+                for ann, key in zip(batch, record_keys):
+                    if key in known:
+                        processed_ann = json.loads(known[key])
+                        reused += 1
+                    else:
+                        processed_ann = self.process_single_annotation(ann)
+                    if processed_ann:
+                        self.annotations.append(processed_ann)
+                        self._index_annotation(self.annotations_by_chapter, processed_ann)
+                        keyed_records.append((key, processed_ann))
+            
+            self._index_keywords()
+            positions = {id(ann): i for i, ann in enumerate(self.annotations)}
+            cache.store(source_hash, keyed_records, {
+                # Stored as pairs since chapter names may be null
+                'byChapter': [[chapter, [positions[id(ann)] for ann in anns]]
+                              for chapter, anns in self.annotations_by_chapter.items()]
+            })
+            print(f"   📝 Processed {record_count - reused} annotations, "
+                  f"reused {reused} from cache ({len(self.annotations)} total)")
+        finally:
+            cache.close()
+    
+    def _index_keywords(self):
+        """Build the keyword matrix of the loaded annotations and apply its reveal signals
+        
+        Reveal levels that depend on keywords are only settled here, so every
+        annotation text is scanned once, together with the scoring keywords.
+        """
+        self.keyword_matrix = KeywordMatrix(a['text'] for a in self.annotations)
+        for annotation, reveal_signal in zip(self.annotations, self.keyword_matrix.scores()['revealSignal']):
+            if reveal_signal:
+                annotation['revealLevel'] = self._determine_reveal_level(
+                    annotation['character'], annotation.get('year'), reveal_signal).value
+    
+    def _iter_raw_annotations(self, annotations_file: Path) -> Iterator[Dict]:
+        """Raw annotation records, streamed one at a time"""
+        if self.source is not None:
+            return self.source.iter_annotations()
+        return iter_json_array(annotations_file)
+    
+    def _index_annotation(self, by_chapter: Dict[str, List[Dict]], annotation: Dict):
+        """Add one regular (non-embedded) annotation to a by-chapter index"""
+        if not annotation.get('isEmbedded'):
+            by_chapter.setdefault(annotation.get('chapter'), []).append(annotation)
+    
+    def _index_annotations_by_chapter(self, annotations: List[Dict]) -> Dict[str, List[Dict]]:
+        """Group regular (non-embedded) annotations by chapter name"""
+        by_chapter = {}
+        for annotation in annotations:
+            self._index_annotation(by_chapter, annotation)
+        return by_chapter
     
     def process_single_annotation(self, annotation: Dict) -> Dict:
         """Process a single annotation with enhanced metadata"""
@@ -422,8 +791,8 @@ class EnhancedContentProcessor:
         text = annotation.get('text', '')
         year = annotation.get('year')
         
-        # Determine annotation type and reveal level
-        reveal_level = self._determine_reveal_level(character, year, text)
+        # Determine annotation type and reveal level; keyword signals are applied by _index_keywords()
+        reveal_level = self._determine_reveal_level(character, year)
         annotation_type = self._determine_annotation_type(text, year)
         
         # Check for embedded redacted content
@@ -447,11 +816,18 @@ class EnhancedContentProcessor:
         """Process all chapter files with enhanced features"""
         print("📖 Processing all chapters with enhanced features...")
         
+        if self.source is not None:
+            for chapter in self.source.chapters:
+                self.chapters.append(self.process_chapter_content_enhanced(
+                    chapter.name, chapter.filename, chapter.number, chapter.content, chapter.document))
+            print(f"   📚 Processed {len(self.chapters)} chapters into {sum(len(ch['pages']) for ch in self.chapters)} pages")
+            return
+        
         if not self.chapters_dir.exists():
             raise FileNotFoundError(f"Chapters directory not found: {self.chapters_dir}")
         
         chapter_files = list(self.chapters_dir.glob("*.md"))
-        chapter_files.sort(key=self._extract_chapter_number)
+        chapter_files.sort(key=lambda file_path: chapter_number(file_path.name))
         
         for file_path in chapter_files:
             chapter_data = self.process_chapter_file_enhanced(file_path)
@@ -464,88 +840,180 @@ class EnhancedContentProcessor:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        chapter_name = file_path.stem
-        chapter_number = self._extract_chapter_number(file_path)
+        return self.process_chapter_content_enhanced(file_path.stem, file_path.name,
+                                                     chapter_number(file_path.name), content)
+    
+    def process_chapter_content_enhanced(self, chapter_name: str, filename: str, chapter_number: int,
+                                         content: str, document: Optional[Document] = None) -> Dict[str, Any]:
+        """Process one chapter's text into enhanced pages"""
+        if document is None:
+            document = parse_markdown(content)
         
         # Extract embedded annotations from content
         embedded_annotations = self._extract_embedded_annotations(content, chapter_name)
+        source = self._source_text(self.chapters_dir / filename, content)
+        attach_annotation_sources(embedded_annotations, source)
         
         # Process redacted content within the main text
         content_with_redactions = self._process_text_redactions(content)
         
         # Split content into pages (optimized for readability)
-        pages = self._create_optimized_pages(content_with_redactions, chapter_name, embedded_annotations)
+        layout = paginate(parse_markdown(content_with_redactions).blocks, CHAPTER_PAGE_WORDS,
+                          self.page_break_at_headings)
+        self.page_layouts[source.file_id] = layout
+        pages = self._create_optimized_pages(layout, chapter_name, embedded_annotations)
+        attach_source_maps(pages, source, content_with_redactions)
         
         return {
             'chapterNumber': chapter_number,
             'chapterName': chapter_name,
-            'filename': file_path.name,
+            'filename': filename,
             'fullContent': content,
             'pages': pages,
-            'wordCount': len(content.split()),
+            'wordCount': document.word_count,
             'embeddedAnnotations': embedded_annotations,
             'hasRedactedContent': len([p for p in pages if p.get('redactedSections', [])]) > 0
         }
     
-    def _create_optimized_pages(self, content: str, chapter_name: str, embedded_annotations: List[Dict]) -> List[Dict]:
-        """Create pages optimized for reading experience"""
-        pages = []
-        
-        # Split content into paragraphs
-        paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
-        
-        # Determine optimal page breaks (aim for 150-250 words per page)
-        current_page_content = []
-        current_word_count = 0
-        page_number = len([p for ch in self.chapters for p in ch.get('pages', [])]) + 1
-        
-        for paragraph in paragraphs:
-            paragraph_words = len(paragraph.split())
-            
-            # Check if adding this paragraph would exceed optimal page length
-            if current_word_count + paragraph_words > 250 and current_page_content:
-                # Create page with current content
-                page_content = '\n\n'.join(current_page_content)
-                page_annotations = self._assign_annotations_to_page(page_number, chapter_name, embedded_annotations)
-                
-                pages.append({
-                    'pageNumber': page_number,
-                    'chapterName': chapter_name,
-                    'content': page_content,
-                    'wordCount': current_word_count,
-                    'annotations': page_annotations,
-                    'annotationCount': len(page_annotations),
-                    'redactedSections': self._find_redacted_sections(page_content),
-                    'revealLevels': self._calculate_page_reveal_levels(page_annotations),
-                    'hasEmbeddedContent': len([a for a in page_annotations if a.get('isEmbedded')]) > 0
-                })
-                
-                # Start new page
-                current_page_content = [paragraph]
-                current_word_count = paragraph_words
-                page_number += 1
-            else:
-                current_page_content.append(paragraph)
-                current_word_count += paragraph_words
+    def update_chapter_content(self, chapter_name: str, content: str) -> Repagination:
+        """Re-paginate an edited chapter of a built book, rebuilding only the pages the edit reaches
+        
+        Later pages of the chapter and of the chapters after it keep their
+        content and are only renumbered. Run the output stages again to emit
+        the update.
+        """
+        index = next((i for i, ch in enumerate(self.chapters) if ch['chapterName'] == chapter_name), None)
+        if index is None:
+            raise KeyError(f"Chapter not processed: {chapter_name}")
+        chapter = self.chapters[index]
+        
+        first_page = sum(len(ch['pages']) for ch in self.chapters[:index]) + 1
+        result, embedded_annotations = self._repaginate_source(
+            self.chapters_dir / chapter['filename'], content, chapter_name, chapter, first_page,
+            lambda page_blocks, page_number, notes: self._create_chapter_page(page_blocks, page_number,
+                                                                              chapter_name, notes),
+            CHAPTER_PAGE_WORDS)
+        chapter.update({
+            'fullContent': content,
+            'wordCount': parse_markdown(content).word_count,
+            'embeddedAnnotations': embedded_annotations,
+            'hasRedactedContent': any(p.get('redactedSections') for p in chapter['pages'])
+        })
         
-        # Create final page if there's remaining content
-        if current_page_content:
-            page_content = '\n\n'.join(current_page_content)
-            page_annotations = self._assign_annotations_to_page(page_number, chapter_name, embedded_annotations)
-            
-            pages.append({
-                'pageNumber': page_number,
-                'chapterName': chapter_name,
-                'content': page_content,
-                'wordCount': current_word_count,
-                'annotations': page_annotations,
-                'annotationCount': len(page_annotations),
-                'redactedSections': self._find_redacted_sections(page_content),
-                'revealLevels': self._calculate_page_reveal_levels(page_annotations),
-                'hasEmbeddedContent': len([a for a in page_annotations if a.get('isEmbedded')]) > 0
-            })
+        # Chapter page numbers run through the whole book
+        for later in self.chapters[index + 1:]:
+            self._shift_pages(later['pages'], result.shift)
+        return result
+    
+    def update_back_matter_content(self, content: str) -> Repagination:
+        """Re-paginate the edited back matter of a built book, rebuilding only the pages the edit reaches"""
+        if not self.back_matter:
+            raise KeyError("Back matter not processed")
+        
+        result, embedded_annotations = self._repaginate_source(
+            self.back_matter_file, content, "back_matter", self.back_matter, 1, self._create_back_matter_page,
+            BACK_MATTER_PAGE_WORDS, SECTION_START, renumber_annotations=False)
+        document = parse_markdown(content)
+        self.back_matter.update({
+            'content': content,
+            'sections': self._parse_back_matter_sections(document),
+            'wordCount': document.word_count,
+            'embeddedAnnotations': embedded_annotations,
+            'characterCount': len(set(ann['character'] for ann in embedded_annotations))
+        })
+        return result
+    
+    def _repaginate_source(self, file_path: Path, content: str, name: str, container: Dict, first_page: int,
+                           create_page: Callable[[List[Block], int, List[Dict]], Dict], max_words: int,
+                           start_pattern: Optional[re.Pattern] = None,
+                           renumber_annotations: bool = True) -> Tuple[Repagination, List[Dict]]:
+        """Splice the pages of an edited source into container['pages']
+        
+        Returns the repagination and the source's embedded annotations. When
+        the edit leaves the embedded notes as they were, only the pages in the
+        repaginated window are built again; otherwise every page is, since
+        notes are placed by chapter rather than by position.
+        """
+        previous = container['embeddedAnnotations']
+        old_source = self.source_texts[self._source_file_id(file_path)]
+        
+        embedded_annotations = self._extract_embedded_annotations(content, name, link_duplicates=False)
+        source = self._source_text(file_path, content)
+        attach_annotation_sources(embedded_annotations, source)
+        content_with_redactions = self._process_text_redactions(content)
+        result = repaginate(self.page_layouts[source.file_id], parse_markdown(content_with_redactions).blocks,
+                            max_words, self.page_break_at_headings, start_pattern)
+        
+        if self._same_embedded_annotations(previous, embedded_annotations):
+            # Positioned copies share these span objects, so kept pages move with them
+            for annotation, moved in zip(previous, embedded_annotations):
+                annotation['sourceSpan'][:] = moved['sourceSpan']
+                annotation['source'].update(moved['source'])
+            embedded_annotations = previous
+        else:
+            self._relink_source_duplicates(previous, embedded_annotations)
+            result = Repagination(result.pages, 0, len(result.pages), len(container['pages']))
+        
+        pages = container['pages']
+        rebuilt = [create_page(result.pages[i], first_page + i, embedded_annotations)
+                   for i in range(result.start, result.stop)]
+        attach_source_maps(rebuilt, source, content_with_redactions,
+                           sum(len(page_blocks) for page_blocks in result.pages[:result.start]))
+        self._layout_pages(rebuilt)
+        
+        byte_shift = source.byte_offset(len(source.text)) - old_source.byte_offset(len(old_source.text))
+        self._shift_pages(pages[result.old_stop:], result.shift, byte_shift, renumber_annotations)
+        self._forget_pages(pages[result.start:result.old_stop])
+        pages[result.start:result.old_stop] = rebuilt
+        self.page_layouts[source.file_id] = result.pages
+        return result, embedded_annotations
+    
+    @staticmethod
+    def _same_embedded_annotations(previous: List[Dict], embedded_annotations: List[Dict]) -> bool:
+        """Whether two extractions found the same notes, wherever they now are in the source"""
+        located = ('sourceSpan', 'source', 'provenance')
+        return len(previous) == len(embedded_annotations) and all(
+            {k: v for k, v in a.items() if k not in located} == {k: v for k, v in b.items() if k not in located}
+            for a, b in zip(previous, embedded_annotations))
+    
+    def _shift_pages(self, pages: List[Dict], shift: int, byte_shift: int = 0, renumber_annotations: bool = True):
+        """Move unchanged pages by shift page numbers and byte_shift source bytes"""
+        for page in pages:
+            page['pageNumber'] += shift
+            if renumber_annotations:
+                for annotation in page['annotations']:
+                    annotation['pageNumber'] += shift
+            if byte_shift:
+                spans = [page.get('source')] + [section.get('source') for section in page.get('redactedSections', [])]
+                for span in spans:
+                    if span:
+                        span['start'] += byte_shift
+                        span['end'] += byte_shift
+    
+    def _create_optimized_pages(self, layout: List[List[Block]], chapter_name: str,
+                                embedded_annotations: List[Dict]) -> List[Dict]:
+        """Create pages optimized for reading experience (aim for 150-250 words per page)"""
+        first_page = len([p for ch in self.chapters for p in ch.get('pages', [])]) + 1
+        return [self._create_chapter_page(page_blocks, page_number, chapter_name, embedded_annotations)
+                for page_number, page_blocks in enumerate(layout, first_page)]
+    
+    def _create_chapter_page(self, page_blocks: List[Block], page_number: int, chapter_name: str,
+                             embedded_annotations: List[Dict]) -> Dict:
+        """One chapter page with its share of the chapter's annotations"""
+        page_content = join_blocks(page_blocks)
+        page_annotations = self._assign_annotations_to_page(page_number, chapter_name, embedded_annotations)
         
-        return pages
+        return {
+            'pageNumber': page_number,
+            'chapterName': chapter_name,
+            'content': page_content,
+            'wordCount': sum(block.words for block in page_blocks),
+            'annotations': page_annotations,
+            'annotationCount': len(page_annotations),
+            'redactedSections': self._find_redacted_sections(page_content),
+            'revealLevels': self._calculate_page_reveal_levels(page_annotations),
+            'hasEmbeddedContent': len([a for a in page_annotations if a.get('isEmbedded')]) > 0
+        }
     
     def _assign_annotations_to_page(self, page_number: int, chapter_name: str, embedded_annotations: List[Dict]) -> List[Dict]:
         """Assign annotations to specific pages with enhanced positioning"""
@@ -562,8 +1030,7 @@ class EnhancedContentProcessor:
                 page_annotations.append(positioned_annotation)
         
         # Add regular annotations from the JSON file
-        chapter_annotations = [a for a in self.annotations 
-                             if a.get('chapter') == chapter_name and not a.get('isEmbedded')]
+        chapter_annotations = self.annotations_by_chapter.get(chapter_name, [])
         
         # Distribute regular annotations
         remaining_slots = 8 - len(page_annotations)
@@ -575,68 +1042,62 @@ class EnhancedContentProcessor:
         
         return page_annotations
     
-    def _create_positioned_annotation(self, annotation: Dict, page_number: int, index: int) -> Dict:
+    def _create_positioned_annotation(self, annotation: Dict, page_number: int, index: int,
+                                      related_pool: Optional[List[Dict]] = None) -> Dict:
         """Create annotation with enhanced positioning and metadata"""
-        # Use annotation ID as seed for consistent positioning
-        random.seed(hash(annotation['id']))
+        # Use a stable digest of the annotation ID as seed so positions are reproducible across builds
+        rng = random.Random(zlib.crc32(annotation['id'].encode('utf-8')))
         
         character = annotation['character']
         year = annotation.get('year')
         annotation_type = annotation.get('type', 'marginalia')
         
         # Determine position based on character, year, and index
-        position = self._generate_enhanced_position(character, year, annotation_type, index)
+        position = self._generate_enhanced_position(character, year, annotation_type, index, rng)
         
-        return {
+        positioned = {
             **annotation,
             'pageNumber': page_number,
             'position': position,
             'style': self._get_character_style(character),
             'isDraggable': annotation_type == 'postIt' or (year and year >= 2000),
-            'revealLevel': annotation.get('revealLevel', RevealLevel.ACADEMIC.value),
-            'characterArc': self._get_character_arc_stage(character, year),
-            'relatedAnnotations': self._find_related_annotations(annotation)
+            'revealLevel': annotation.get('revealLevel', RevealLevel.ACADEMIC.value)
         }
+        # characterArc and relatedAnnotations are filled in by materialize_fields() when a target emits this page
+        with self.pending_lock:
+            self.pending_fields[id(positioned)] = (positioned, annotation, related_pool)
+        return positioned
     
-    def _generate_enhanced_position(self, character: str, year: Optional[int], annotation_type: str, index: int) -> Dict:
+    def _generate_enhanced_position(self, character: str, year: Optional[int], annotation_type: str, index: int,
+                                    rng: random.Random) -> Dict:
         """Generate enhanced positioning with character-specific preferences"""
         
-        # Character positioning preferences
-        character_zones = {
-            'MB': [AnnotationZone.RIGHT_MARGIN, AnnotationZone.TOP_MARGIN],  # Margaret prefers right side
-            'JR': [AnnotationZone.LEFT_MARGIN, AnnotationZone.BOTTOM_MARGIN],  # James prefers left side
-            'EW': [AnnotationZone.RIGHT_MARGIN, AnnotationZone.CONTENT],  # Eliza uses precise positioning
-            'SW': [AnnotationZone.LEFT_MARGIN, AnnotationZone.CONTENT],  # Simon uses available space
-            'Detective Sharma': [AnnotationZone.TOP_MARGIN, AnnotationZone.BOTTOM_MARGIN],  # Official notes
-            'Dr. Chambers': [AnnotationZone.BOTTOM_MARGIN, AnnotationZone.RIGHT_MARGIN]  # Government style
-        }
-        
         # Determine zone
-        preferred_zones = character_zones.get(character, list(AnnotationZone))
+        preferred_zones = self.character_zones.get(character, list(AnnotationZone))
         if year and year >= 2000:
             # Post-2000 annotations can go anywhere
-            zone = random.choice(list(AnnotationZone))
+            zone = rng.choice(list(AnnotationZone))
         else:
             # Pre-2000 limited to margins
             margin_zones = [z for z in preferred_zones if 'margin' in z.value.lower()]
-            zone = random.choice(margin_zones) if margin_zones else random.choice(preferred_zones)
+            zone = rng.choice(margin_zones) if margin_zones else rng.choice(preferred_zones)
         
         # Generate position within zone
         if zone == AnnotationZone.LEFT_MARGIN:
             x = 0.01 + (index % 3) * 0.02  # Stagger multiple annotations
-            y = 0.1 + random.random() * 0.7
+            y = 0.1 + rng.random() * 0.7
         elif zone == AnnotationZone.RIGHT_MARGIN:
             x = 0.85 + (index % 3) * 0.02
-            y = 0.1 + random.random() * 0.7
+            y = 0.1 + rng.random() * 0.7
         elif zone == AnnotationZone.TOP_MARGIN:
-            x = 0.15 + random.random() * 0.6
+            x = 0.15 + rng.random() * 0.6
             y = 0.01 + (index % 3) * 0.02
         elif zone == AnnotationZone.BOTTOM_MARGIN:
-            x = 0.15 + random.random() * 0.6
+            x = 0.15 + rng.random() * 0.6
             y = 0.85 + (index % 3) * 0.02
         else:  # CONTENT
-            x = 0.2 + random.random() * 0.5
-            y = 0.15 + random.random() * 0.6
+            x = 0.2 + rng.random() * 0.5
+            y = 0.15 + rng.random() * 0.6
         
         # Character-specific rotation
         rotation_preferences = {
@@ -647,7 +1108,7 @@ class EnhancedContentProcessor:
         }
         
         rotation_range = rotation_preferences.get(character, (-0.1, 0.1))
-        rotation = random.uniform(*rotation_range)
+        rotation = rng.uniform(*rotation_range)
         
         return {
             'zone': zone.value,
@@ -656,25 +1117,89 @@ class EnhancedContentProcessor:
             'rotation': rotation
         }
     
+    def layout_annotations(self):
+        """Pack every page's annotations into non-overlapping positions"""
+        print("📐 Laying out annotations...")
+        
+        pages = [page for chapter in self.chapters for page in chapter['pages']]
+        pages += self.back_matter.get('pages', [])
+        
+        placed, overflowed, layers, full_pages = self._layout_pages(pages)
+        
+        print(f"   📐 Placed {placed} annotations without overlap on their page")
+        if overflowed:
+            print(f"   ⚠️  {overflowed} more did not fit and went to {layers} overflow layers on {full_pages} full pages")
+    
+    def _layout_pages(self, pages: List[Dict]) -> Tuple[int, int, int, int]:
+        """Lay out each page's annotations
+        
+        Returns how many were placed on the page itself, how many went to overflow
+        layers, how many layers that took and on how many pages.
+        """
+        character_zones = {
+            character: [zone.value for zone in zones]
+            for character, zones in self.character_zones.items()
+        }
+        
+        placed = 0
+        overflowed = 0
+        layers = 0
+        full_pages = 0
+        for page in pages:
+            overflow, page_layers = layout_page_annotations(page['annotations'], character_zones)
+            placed += len(page['annotations']) - overflow
+            overflowed += overflow
+            layers += page_layers
+            full_pages += bool(overflow)
+        return placed, overflowed, layers, full_pages
+    
     def create_character_timelines(self):
         """Create comprehensive character timelines and story arcs"""
         print("👥 Creating character timelines and story arcs...")
         
-        for character in ['MB', 'JR', 'EW', 'SW', 'Detective Sharma', 'Dr. Chambers']:
-            character_annotations = [a for a in self.annotations if a['character'] == character]
-            character_annotations.sort(key=lambda x: x.get('year', 1967))
-            
-            timeline = {
-                'character': character,
-                'fullName': self._get_character_full_name(character),
-                'role': self._get_character_role(character),
-                'timeline': character_annotations,
-                'storyArc': self._generate_story_arc(character, character_annotations),
-                'mysteryInvolvement': self._analyze_mystery_involvement(character, character_annotations),
-                'disappearanceClues': self._find_disappearance_clues(character, character_annotations)
-            }
-            
-            self.character_timeline[character] = timeline
+        self.character_aggregates = {
+            character: CharacterAccumulator(character,
+                                            self._get_character_full_name(character),
+                                            self._get_character_role(character))
+            for character in ['MB', 'JR', 'EW', 'SW', 'Detective Sharma', 'Dr. Chambers']
+        }
+        
+        # Keyword features for every annotation at once, then one pass folding
+        # each annotation into its character's totals
+        if self.keyword_matrix is None or self.keyword_matrix.rows != len(self.annotations):
+            self.keyword_matrix = KeywordMatrix(a['text'] for a in self.annotations)
+        for annotation, features in zip(self.annotations, self.keyword_matrix.features()):
+            aggregate = self.character_aggregates.get(annotation['character'])
+            if aggregate:
+                aggregate.add(annotation, features)
+        
+        for character, aggregate in self.character_aggregates.items():
+            self.character_timeline[character] = aggregate.timeline()
+    
+    def update_character_annotation(self, annotation: Dict, previous: Optional[Dict] = None):
+        """Refresh timelines after one annotation was added or edited, without rescanning the rest
+        
+        The annotation must already be in self.annotations; its keyword matrix
+        row is rescanned, or appended when it is the newest annotation.
+        """
+        row = next(i for i in range(len(self.annotations) - 1, -1, -1)
+                   if self.annotations[i]['id'] == annotation['id'])
+        if self.keyword_matrix is None or row > self.keyword_matrix.rows:
+            self.keyword_matrix = KeywordMatrix(a['text'] for a in self.annotations)
+        else:
+            self.keyword_matrix.update(row, annotation['text'])
+        features = self.keyword_matrix.features([row])[0]
+        
+        if previous and previous['character'] != annotation['character']:
+            aggregate = self.character_aggregates.get(previous['character'])
+            if aggregate and previous['id'] in aggregate.entries:
+                aggregate.remove(previous['id'])
+                self.character_timeline[previous['character']] = aggregate.timeline()
+        
+        aggregate = self.character_aggregates.get(annotation['character'])
+        if aggregate:
+            aggregate.add(annotation, features)
+            self.character_timeline[annotation['character']] = aggregate.timeline()
     
     def generate_progressive_revelation(self):
         """Generate progressive revelation system"""
@@ -717,13 +1242,8 @@ class EnhancedContentProcessor:
             'characterProgression': self._generate_character_progression_system()
         }
     
-    def save_enhanced_data(self):
-        """Save all enhanced data structures"""
-        print("💾 Saving enhanced data structures...")
-        
-        # Create output directories
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-        
+    def get_enhanced_book_data(self) -> Dict:
+        """Assemble the complete enhanced book structure from the processed state"""
         # Calculate totals including front and back matter
         total_pages = sum(len(chapter['pages']) for chapter in self.chapters)
         if self.front_matter and 'pages' in self.front_matter:
@@ -731,8 +1251,7 @@ class EnhancedContentProcessor:
         if self.back_matter and 'pages' in self.back_matter:
             total_pages += len(self.back_matter['pages'])
         
-        # Save complete enhanced book data
-        enhanced_book_data = {
+        return {
             'title': 'Blackthorn Manor: An Architectural Study',
             'subtitle': 'Enhanced Interactive Edition',
             'author': 'Professor Harold Finch',
@@ -759,31 +1278,44 @@ class EnhancedContentProcessor:
                 ]
             }
         }
+    
+    def save_enhanced_data(self, model: Optional[BookModel] = None):
+        """Save all enhanced data structures"""
+        print("💾 Saving enhanced data structures...")
+        
+        # Create output directories
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        enhanced_book_data = model.enhanced_book if model else self.get_enhanced_book_data()
+        enhanced_characters = model.characters if model else self._generate_enhanced_character_data()
+        self.materialize_fields(self._all_pages())
         
         # Save main book file
         with open(self.output_dir / "enhanced_complete_book.json", 'w', encoding='utf-8') as f:
             json.dump(enhanced_book_data, f, indent=2, ensure_ascii=False)
         
         # Save character data
-        enhanced_characters = self._generate_enhanced_character_data()
         with open(self.output_dir / "enhanced_characters.json", 'w', encoding='utf-8') as f:
             json.dump(enhanced_characters, f, indent=2, ensure_ascii=False)
         
         # Save front matter separately for easy access
-        if self.front_matter:
+        if enhanced_book_data['frontMatter']:
             with open(self.output_dir / "front_matter.json", 'w', encoding='utf-8') as f:
-                json.dump(self.front_matter, f, indent=2, ensure_ascii=False)
+                json.dump(enhanced_book_data['frontMatter'], f, indent=2, ensure_ascii=False)
         
         # Save back matter separately for easy access
-        if self.back_matter:
+        if enhanced_book_data['backMatter']:
             with open(self.output_dir / "back_matter.json", 'w', encoding='utf-8') as f:
-                json.dump(self.back_matter, f, indent=2, ensure_ascii=False)
+                json.dump(enhanced_book_data['backMatter'], f, indent=2, ensure_ascii=False)
         
         print(f"   💾 Saved enhanced data to {self.output_dir}")
     
     # Helper methods for enhanced processing
-    def _determine_reveal_level(self, character: str, year: Optional[int], text: str) -> RevealLevel:
-        """Determine at what level this content should be revealed"""
+    def _determine_reveal_level(self, character: str, year: Optional[int], reveal_signal: bool = False) -> RevealLevel:
+        """Determine at what level this content should be revealed
+        
+        reveal_signal is the text's revealSignal keyword feature.
+        """
         if not year or year < 1970:
             return RevealLevel.ACADEMIC
         elif character == 'MB':
@@ -792,7 +1324,7 @@ class EnhancedContentProcessor:
             return RevealLevel.INVESTIGATION
         elif character in ['SW', 'Detective Sharma', 'Dr. Chambers']:
             return RevealLevel.MODERN_MYSTERY
-        elif 'supernatural' in text.lower() or 'entity' in text.lower():
+        elif reveal_signal:
             return RevealLevel.COMPLETE_TRUTH
         else:
             return RevealLevel.ACADEMIC
@@ -930,18 +1462,63 @@ class EnhancedContentProcessor:
         else:
             return stages.get('current', 'current')
     
-    def _find_related_annotations(self, annotation: Dict) -> List[str]:
+    def _find_related_annotations(self, annotation: Dict, pool: List[Dict]) -> List[str]:
         """Find IDs of related annotations"""
         # Simple keyword matching for now
-        keywords = annotation['text'].lower().split()
+        keywords = self._keyword_set(annotation)
         related = []
-        for other in self.annotations:
+        for other in pool:
             if other['id'] != annotation['id']:
-                other_keywords = other['text'].lower().split()
-                if len(set(keywords) & set(other_keywords)) > 2:
+                if len(keywords & self._keyword_set(other)) > 2:
                     related.append(other['id'])
         return related[:3]  # Max 3 related
     
+    def _keyword_set(self, annotation: Dict) -> set:
+        """Lower-cased words of an annotation, split once per text"""
+        text = annotation['text']
+        if text not in self._keyword_sets:
+            self._keyword_sets[text] = set(text.lower().split())
+        return self._keyword_sets[text]
+    
+    def _derive_field(self, field: str, annotation: Dict, related_pool: Optional[List[Dict]]):
+        if field == 'characterArc':
+            return self._get_character_arc_stage(annotation['character'], annotation.get('year'))
+        if field == 'relatedAnnotations':
+            return self._find_related_annotations(
+                annotation, self.annotations if related_pool is None else related_pool)
+        raise ValueError(f"Unknown derived field: {field}")
+    
+    def materialize_fields(self, pages: List[Dict]):
+        """Compute the derived fields for the annotations on these pages
+        
+        An annotation is only written to while it is pending, and every sink
+        materializes its pages before serializing them, so sinks running
+        concurrently never see an annotation change under them.
+        """
+        with self.pending_lock:
+            for page in pages:
+                for positioned in page.get('annotations', []):
+                    pending = self.pending_fields.pop(id(positioned), None)
+                    if not pending:
+                        continue
+                    _, annotation, related_pool = pending
+                    for field in DERIVED_ANNOTATION_FIELDS:
+                        positioned[field] = self._derive_field(field, annotation, related_pool)
+    
+    def _forget_pages(self, pages: List[Dict]):
+        """Drop pending derived fields of annotations on pages that were replaced"""
+        with self.pending_lock:
+            for page in pages:
+                for positioned in page.get('annotations', []):
+                    self.pending_fields.pop(id(positioned), None)
+    
+    def _all_pages(self) -> List[Dict]:
+        """Every front matter, chapter and back matter page"""
+        pages = list(self.front_matter.get('pages', []) if self.front_matter else [])
+        pages += [page for chapter in self.chapters for page in chapter['pages']]
+        pages += self.back_matter.get('pages', []) if self.back_matter else []
+        return pages
+    
     def _get_character_full_name(self, character: str) -> str:
         """Get full character name"""
         names = {
@@ -966,92 +1543,6 @@ class EnhancedContentProcessor:
         }
         return roles.get(character, 'Unknown')
     
-    def _generate_story_arc(self, character: str, annotations: List[Dict]) -> Dict:
-        """Generate character story arc"""
-        years_with_data = [a.get('year') for a in annotations if a.get('year')]
-        
-        if years_with_data:
-            time_span = f"{min(years_with_data)}-{max(years_with_data)}"
-        else:
-            time_span = "Unknown"
-        
-        return {
-            'character': character,
-            'totalAnnotations': len(annotations),
-            'timeSpan': time_span,
-            'keyThemes': self._extract_character_themes(annotations),
-            'mysterySeverity': self._calculate_mystery_severity(annotations)
-        }
-    
-    def _analyze_mystery_involvement(self, character: str, annotations: List[Dict]) -> Dict:
-        """Analyze character's involvement in the mystery"""
-        years_with_data = [a.get('year') for a in annotations if a.get('year')]
-        last_activity = max(years_with_data) if years_with_data else 1967
-        
-        return {
-            'involvementLevel': 'high' if len(annotations) > 5 else 'medium' if len(annotations) > 2 else 'low',
-            'disappearanceRisk': character in ['JR', 'SW'] and any('disappear' in a['text'].lower() for a in annotations),
-            'knowledgeLevel': self._assess_knowledge_level(annotations),
-            'lastActivity': last_activity
-        }
-    
-    def _find_disappearance_clues(self, character: str, annotations: List[Dict]) -> List[str]:
-        """Find clues about character disappearances"""
-        disappearance_keywords = ['disappear', 'missing', 'vanish', 'gone', 'last entry', 'final']
-        clues = []
-        for annotation in annotations:
-            text_lower = annotation['text'].lower()
-            if any(keyword in text_lower for keyword in disappearance_keywords):
-                clues.append(annotation['text'][:100] + '...' if len(annotation['text']) > 100 else annotation['text'])
-        return clues
-    
-    def _extract_character_themes(self, annotations: List[Dict]) -> List[str]:
-        """Extract key themes from character's annotations"""
-        all_text = ' '.join(a['text'].lower() for a in annotations)
-        theme_keywords = {
-            'supernatural': ['entity', 'manifestation', 'supernatural', 'otherworld', 'dimension'],
-            'architecture': ['building', 'structure', 'foundation', 'room', 'chamber'],
-            'investigation': ['research', 'study', 'investigate', 'analyze', 'evidence'],
-            'danger': ['danger', 'warning', 'threat', 'disappear', 'missing'],
-            'family_secrets': ['family', 'secret', 'tradition', 'ritual', 'guardian']
-        }
-        
-        present_themes = []
-        for theme, keywords in theme_keywords.items():
-            if any(keyword in all_text for keyword in keywords):
-                present_themes.append(theme)
-        return present_themes
-    
-    def _calculate_mystery_severity(self, annotations: List[Dict]) -> str:
-        """Calculate how severe the mystery becomes through this character"""
-        severity_keywords = ['dangerous', 'entity', 'disappear', 'warning', 'threat', 'supernatural']
-        severity_score = sum(1 for annotation in annotations 
-                            for keyword in severity_keywords 
-                            if keyword in annotation['text'].lower())
-        
-        if severity_score >= 5:
-            return 'extreme'
-        elif severity_score >= 3:
-            return 'high'
-        elif severity_score >= 1:
-            return 'medium'
-        else:
-            return 'low'
-    
-    def _assess_knowledge_level(self, annotations: List[Dict]) -> str:
-        """Assess character's knowledge level about the mystery"""
-        knowledge_keywords = ['know', 'understand', 'explain', 'theory', 'cause', 'reason']
-        knowledge_score = sum(1 for annotation in annotations 
-                             for keyword in knowledge_keywords 
-                             if keyword in annotation['text'].lower())
-        
-        if knowledge_score >= 3:
-            return 'high'
-        elif knowledge_score >= 1:
-            return 'medium'
-        else:
-            return 'low'
-    
     def _generate_unlock_conditions_system(self) -> Dict:
         """Generate the complete unlock conditions system"""
         return {
@@ -1117,13 +1608,8 @@ class EnhancedContentProcessor:
         
         print(f"   🔒 Found {redacted_count} redacted sections")
     
-    def create_web_app_data(self):
+    def get_web_app_data(self) -> Dict:
         """Create optimized data for web app"""
-        print("🌐 Creating web app data...")
-        
-        # Create web output directory
-        self.web_output_dir.mkdir(parents=True, exist_ok=True)
-        
         # Create simplified data for web app performance
         web_book_data = {
             'title': 'Blackthorn Manor Archive',
@@ -1140,7 +1626,7 @@ class EnhancedContentProcessor:
         if self.front_matter:
             web_book_data['frontMatter'] = {
                 'title': self.front_matter.get('title', ''),
-                'pages': self.front_matter.get('pages', [])[:3]  # First 3 pages for web demo
+                'pages': [dict(page) for page in self.front_matter.get('pages', [])[:3]]  # First 3 pages for web demo
             }
         
         # Add back matter for web (selected pages with annotations)
@@ -1148,7 +1634,7 @@ class EnhancedContentProcessor:
             back_pages = self.back_matter.get('pages', [])
             # Select pages with high annotation density
             annotated_pages = [page for page in back_pages if page.get('annotationCount', 0) > 0]
-            selected_pages = annotated_pages[:5]  # First 5 pages with annotations
+            selected_pages = [dict(page) for page in annotated_pages[:5]]  # First 5 pages with annotations
             
             web_book_data['backMatter'] = {
                 'title': self.back_matter.get('title', ''),
@@ -1174,11 +1660,71 @@ class EnhancedContentProcessor:
             
             web_book_data['chapters'].append(web_chapter)
         
+        # Only the pages selected above are serialized, so only they get derived fields
+        web_pages = web_book_data['frontMatter'].get('pages', []) + web_book_data['backMatter'].get('pages', [])
+        web_pages += [page for chapter in web_book_data['chapters'] for page in chapter['pages']]
+        self.materialize_fields(web_pages)
+        
+        # Web pages are copies, so swapping their content for html fragments leaves the Flutter files as they are
+        fragment_cache = FragmentCache(self.cache_dir / "enhanced_page_fragments.json" if self.use_cache else None)
+        render_pages(web_pages, fragment_cache)
+        fragment_cache.save()
+        
+        # Per-page bitsets so readers' visibility is evaluated without scanning annotations
+        attach_reveal_index(web_pages)
+        
+        return web_book_data
+    
+    def create_web_app_data(self, model: Optional[BookModel] = None):
+        """Write the web app data file"""
+        print("🌐 Creating web app data...")
+        
+        # Create web output directory
+        self.web_output_dir.mkdir(parents=True, exist_ok=True)
+        
+        web_book_data = model.web_book_data if model else self.get_web_app_data()
+        
         # Save web data
         with open(self.web_output_dir / "web_book_data.json", 'w', encoding='utf-8') as f:
             json.dump(web_book_data, f, indent=2, ensure_ascii=False)
         
+        compact_sizes = write_compact(web_book_data, self.web_output_dir / "web_book_data.compact.json")
+        
         print(f"   🌐 Saved web app data to {self.web_output_dir}")
+        print(f"   📦 Compact schema: {format_sizes(*compact_sizes)}")
+    
+    def create_reveal_level_variants(self, model: Optional[BookModel] = None):
+        """Write one web data variant per reveal level, sharing identical pages between levels"""
+        print("🔓 Creating per-reveal-level web variants...")
+        
+        web_book_data = model.web_book_data if model else self.get_web_app_data()
+        levels, page_files, removed = write_reveal_level_variants(web_book_data, self.web_output_dir)
+        
+        print(f"   🔓 Saved {levels} level variants sharing {page_files} page files ({removed} stale removed) "
+              f"to {self.web_output_dir / 'levels'}")
+    
+    def create_source_index(self):
+        """Write the sorted byte-range index from source files to pages, redactions and embedded annotations"""
+        print("🗺️  Creating source index...")
+        
+        # Page references are reading-order indexes, as in the SQLite export next to it
+        index = build_source_index(self._all_pages(), self.source_texts.values())
+        self.web_output_dir.mkdir(parents=True, exist_ok=True)
+        index_file = self.web_output_dir / "source_index.json"
+        write_source_index(index, index_file)
+        
+        entries = sum(len(entry['entries']) for entry in index['files'])
+        print(f"   🗺️  Indexed {entries} source ranges in {len(index['files'])} files to {index_file}")
+    
+    def create_content_addressed_assets(self, model: Optional[BookModel] = None):
+        """Write hashed page, chapter and character assets with a manifest and precache list"""
+        print("📦 Creating content-addressed web assets...")
+        
+        web_book_data = model.web_book_data if model else self.get_web_app_data()
+        result = write_content_addressed_assets(web_book_data, self.web_output_dir)
+        
+        print(f"   📦 {result['assets']} assets ({result['written']} new, {result['removed']} removed), "
+              f"manifest at {self.web_output_dir / 'manifest.json'}")
     
     def _generate_enhanced_character_data(self) -> Dict:
         """Generate enhanced character data with full information"""
@@ -1303,24 +1849,6 @@ class EnhancedContentProcessor:
             return character_field[0] if character_field else "Unknown"
         return character_field or "Unknown"
     
-    def _extract_chapter_number(self, file_path: Path) -> int:
-        match = re.search(r'CHAPTER_([IVX]+)', file_path.name)
-        if match:
-            return self._roman_to_int(match.group(1))
-        return 999
-    
-    def _roman_to_int(self, roman: str) -> int:
-        roman_numerals = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
-        total = 0
-        for i in range(len(roman)):
-            current = roman_numerals.get(roman[i], 0)
-            next_val = roman_numerals.get(roman[i + 1], 0) if i + 1 < len(roman) else 0
-            if current < next_val:
-                total -= current
-            else:
-                total += current
-        return total
-    
     def generate_comprehensive_statistics(self):
         """Generate comprehensive statistics for the enhanced book"""
         print("\n📊 ENHANCED CONTENT STATISTICS")
@@ -1363,9 +1891,18 @@ class EnhancedContentProcessor:
         
         # Reveal level statistics
         print("\n🔓 REVELATION LEVELS:")
+        level_counts = Counter(a.get('revealLevel') for a in self.annotations)
         for level in RevealLevel:
-            count = len([a for a in self.annotations if a.get('revealLevel') == level.value])
-            print(f"   Level {level.value} ({level.name}): {count} items")
+            print(f"   Level {level.value} ({level.name}): {level_counts[level.value]} items")
+        
+        # Keyword signals summed per chapter from the feature matrix
+        if self.keyword_matrix and self.keyword_matrix.rows:
+            print("\n🔎 MYSTERY SIGNALS BY CHAPTER:")
+            by_chapter = self.keyword_matrix.grouped([a.get('chapter') or 'Unassigned' for a in self.annotations])
+            for chapter, totals in by_chapter.items():
+                if totals['severity'] or totals['isClue']:
+                    print(f"   {chapter}: severity {totals['severity']}, "
+                          f"{totals['isClue']} disappearance clues, {totals['revealSignal']} supernatural references")
         
         # Enhanced features
         print("\n✨ ENHANCED FEATURES:")
@@ -1376,11 +1913,52 @@ class EnhancedContentProcessor:
         print(f"   📄 Front matter integration: {'✓' if self.front_matter else '✗'}")
         print(f"   📚 Back matter annotations: {'✓' if self.back_matter else '✗'}")
 
+class _InlineExecutor(Executor):
+    """Executor running every call in the calling thread"""
+    
+    def map(self, fn, *iterables, timeout=None, chunksize=1):
+        return map(fn, *iterables)
+
+_section_processor = None
+
+def _worker_processor() -> EnhancedContentProcessor:
+    global _section_processor
+    if _section_processor is None:
+        _section_processor = EnhancedContentProcessor(use_cache=False)
+    return _section_processor
+
+def _scan_back_matter_section(text: str, break_at_headings: bool) -> Tuple[Dict[str, List[Tuple]], str, List[str],
+                                                                             List[List[Dict]]]:
+    """Embedded note matches, text with redactions, page texts and their redacted sections of one section"""
+    processor = _worker_processor()
+    text_with_redactions = processor._process_text_redactions(text)
+    layout = paginate(parse_markdown(text_with_redactions).blocks, BACK_MATTER_PAGE_WORDS, break_at_headings,
+                      SECTION_START)
+    page_texts = [join_blocks(page_blocks) for page_blocks in layout]
+    return (processor._embedded_note_matches(text), text_with_redactions, page_texts,
+            [processor._find_redacted_sections(page_text) for page_text in page_texts])
+
+def _match_back_matter_notes(page_texts: List[str], note_texts: List[str]) -> List[List[int]]:
+    """Indexes of the notes that belong to each page"""
+    processor = _worker_processor()
+    return [[i for i, text in enumerate(note_texts) if processor._annotation_belongs_to_page({'text': text}, page_text)]
+            for page_text in page_texts]
+
+def build(book_dir: Path = Path("."), use_cache: bool = False) -> BookModel:
+    """Build the enhanced book from a book directory in memory
+    
+    Nothing is written under book_dir unless use_cache keeps the build caches in .cache.
+    """
+    return EnhancedContentProcessor(book_dir, use_cache=use_cache).build()
+
 def main():
-    """Enhanced main entry point"""
+    """Enhanced main entry point
+    
+    Usage: python tools/enhanced_content_processor.py [flutter|web ...]
+    """
     try:
-        processor = EnhancedContentProcessor()
-        processor.run()
+        processor = EnhancedContentProcessor(back_matter_workers=None)
+        processor.run(targets=sys.argv[1:] or None)
     except Exception as e:
         print(f"❌ Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -9,16 +9,27 @@ import re
 import os
 from pathlib import Path
 import uuid
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterable, Iterator, Optional
 import math
 
+from book_source import BookSource
+from compact_schema import write_compact, format_sizes
+from json_stream import iter_json_array
+from markdown_blocks import Document, parse_markdown, join_blocks
+from page_renderer import FragmentCache, render_pages
+from reveal_index import attach_reveal_index
+from source_discovery import discover_chapters
+
 class FixedWebDataProcessor:
-    def __init__(self):
-        self.base_path = Path(__file__).parent.parent
-        self.annotations = []
+    def __init__(self, source: Optional[BookSource] = None):
+        self.source = source
+        self.base_path = source.base_dir if source is not None else Path(__file__).parent.parent
         self.chapters = []
         self.front_matter_content = ""
         self.back_matter_content = ""
+        # Parsed blocks shared through the BookSource, when one is attached
+        self.front_matter_document = None
+        self.back_matter_document = None
         self.character_map = {
             'MB': {
                 'fullName': 'Margaret Blackthorn',
@@ -58,16 +69,15 @@ class FixedWebDataProcessor:
             }
         }
         
-    def load_annotations(self):
-        """Load the original annotations.json file"""
-        annotations_file = self.base_path / 'annotations.json'
+    def load_annotations(self) -> Iterator[Dict]:
+        """Stream the original annotations.json records one at a time"""
         try:
-            with open(annotations_file, 'r', encoding='utf-8') as f:
-                self.annotations = json.load(f)
-            print(f"✅ Loaded {len(self.annotations)} annotations from annotations.json")
+            if self.source is not None:
+                yield from self.source.iter_annotations()
+            else:
+                yield from iter_json_array(self.base_path / 'annotations.json')
         except Exception as e:
             print(f"❌ Error loading annotations: {e}")
-            self.annotations = []
     
     def identify_character(self, text: str) -> str:
         """Identify character from annotation text"""
@@ -133,21 +143,20 @@ class FixedWebDataProcessor:
     
     def load_chapter_files(self):
         """Load all chapter markdown files"""
-        chapter_files = []
-        
-        # Check root directory
-        for i in range(1, 12):
-            chapter_file = self.base_path / f'CHAPTER_{self.roman_numeral(i)}_*.md'
-            matches = list(self.base_path.glob(f'CHAPTER_{self.roman_numeral(i)}_*.md'))
-            if matches:
-                chapter_files.extend(matches)
-        
-        # Check content/chapters directory  
-        content_chapters = self.base_path / 'content' / 'chapters'
-        if content_chapters.exists():
-            chapter_files.extend(content_chapters.glob('CHAPTER_*.md'))
+        if self.source is not None:
+            for chapter in self.source.chapters:
+                self.chapters.append({
+                    'name': chapter.name,
+                    'content': chapter.content,
+                    'document': chapter.document,
+                    'file': str(chapter.path)
+                })
+            print(f"✅ Loaded {len(self.chapters)} chapters from shared source")
+            return
         
-        chapter_files = sorted(set(chapter_files))
+        # The same chapter can exist both in content/chapters and the repository root
+        chapter_files = discover_chapters([self.base_path / 'content' / 'chapters', self.base_path],
+                                          self.base_path / '.cache' / 'chapter_sources.json')
         
         for chapter_file in chapter_files:
             try:
@@ -181,6 +190,11 @@ class FixedWebDataProcessor:
     
     def load_front_matter(self):
         """Load front matter content"""
+        if self.source is not None:
+            self.front_matter_content = self.source.front_matter or ""
+            self.front_matter_document = self.source.front_matter_document
+            return
+        
         front_file = self.base_path / 'front_matter.md'
         try:
             with open(front_file, 'r', encoding='utf-8') as f:
@@ -192,6 +206,11 @@ class FixedWebDataProcessor:
     
     def load_back_matter(self):
         """Load back matter content"""
+        if self.source is not None:
+            self.back_matter_content = self.source.back_matter or ""
+            self.back_matter_document = self.source.back_matter_document
+            return
+        
         back_file = self.base_path / 'back_matter.md'
         try:
             with open(back_file, 'r', encoding='utf-8') as f:
@@ -201,28 +220,31 @@ class FixedWebDataProcessor:
             print(f"❌ Error loading back matter: {e}")
             self.back_matter_content = ""
     
-    def split_into_pages(self, content: str, target_pages: int) -> List[str]:
+    def split_into_pages(self, content: str, target_pages: int, document: Optional[Document] = None) -> List[str]:
         """Split content into specified number of pages"""
         if not content.strip():
             return [content]
             
-        # Split by paragraphs
-        paragraphs = content.split('\n\n')
-        if len(paragraphs) <= target_pages:
-            return paragraphs
+        # Split by blocks
+        blocks = (document or parse_markdown(content)).blocks
+        if len(blocks) <= target_pages:
+            return [block.text for block in blocks]
         
-        # Calculate paragraphs per page
-        paras_per_page = max(1, len(paragraphs) // target_pages)
+        # Calculate blocks per page
+        blocks_per_page = max(1, len(blocks) // target_pages)
         pages = []
         
-        for i in range(0, len(paragraphs), paras_per_page):
-            page_paras = paragraphs[i:i + paras_per_page]
-            pages.append('\n\n'.join(page_paras))
+        for i in range(0, len(blocks), blocks_per_page):
+            pages.append(join_blocks(blocks[i:i + blocks_per_page]))
         
         return pages[:target_pages]  # Ensure we don't exceed target
     
-    def assign_annotations_to_pages(self, all_pages: List[Dict], annotations: List[Dict]) -> List[Dict]:
-        """Distribute annotations across pages"""
+    def assign_annotations_to_pages(self, all_pages: List[Dict], annotations: Iterable[Dict]) -> List[Dict]:
+        """Distribute annotations across pages
+        
+        annotations is consumed once; each record is classified as it arrives and
+        only its classified form is kept, grouped by where it is shown.
+        """
         
         # Create annotation index by chapter
         chapter_annotations = {}
@@ -230,22 +252,31 @@ class FixedWebDataProcessor:
         back_annotations = []
         
         for ann in annotations:
+            classified = self.classify_annotation(ann)
             chapter = ann.get('chapter', '')
             if not chapter or chapter == 'null':
                 if any(keyword in ann.get('text', '').lower() for keyword in ['finch', 'dedication', 'miss margaret']):
-                    front_annotations.append(ann)
+                    front_annotations.append(classified)
                 else:
-                    back_annotations.append(ann)
+                    back_annotations.append(classified)
             else:
                 if chapter not in chapter_annotations:
                     chapter_annotations[chapter] = []
-                chapter_annotations[chapter].append(ann)
+                chapter_annotations[chapter].append(classified)
         
         print(f"📊 Annotation distribution:")
         print(f"   Front matter: {len(front_annotations)}")
         print(f"   Chapters: {sum(len(anns) for anns in chapter_annotations.values())}")
         print(f"   Back matter: {len(back_annotations)}")
         
+        # Group pages by section and chapter once, recording each page's offset within its group
+        page_offsets = {}
+        group_sizes = {}
+        for page in all_pages:
+            group = self._page_group(page)
+            page_offsets[id(page)] = group_sizes.get(group, 0)
+            group_sizes[group] = group_sizes.get(group, 0) + 1
+        
         # Assign annotations to pages
         for page in all_pages:
             page_annotations = []
@@ -259,47 +290,28 @@ class FixedWebDataProcessor:
                     page_annotations = front_annotations[start_idx:end_idx]
             
             elif page['section'] == 'chapters':
-                # Match annotations by chapter name
-                chapter_name = page.get('chapterName', '')
-                if chapter_name in chapter_annotations:
-                    chapter_anns = chapter_annotations[chapter_name]
-                    # Distribute evenly across chapter pages
-                    chapter_pages = [p for p in all_pages if p.get('chapterName') == chapter_name]
-                    if chapter_pages:
-                        anns_per_page = max(1, len(chapter_anns) // len(chapter_pages))
-                        page_index = chapter_pages.index(page)
-                        start_idx = page_index * anns_per_page
-                        end_idx = start_idx + anns_per_page
-                        page_annotations = chapter_anns[start_idx:end_idx]
+                # Match annotations by chapter name and distribute evenly across chapter pages
+                chapter_anns = chapter_annotations.get(page.get('chapterName', ''))
+                if chapter_anns:
+                    anns_per_page = max(1, len(chapter_anns) // group_sizes[self._page_group(page)])
+                    start_idx = page_offsets[id(page)] * anns_per_page
+                    end_idx = start_idx + anns_per_page
+                    page_annotations = chapter_anns[start_idx:end_idx]
             
             elif page['section'] == 'back':
                 # Distribute back annotations across back pages
                 if back_annotations:
-                    back_pages = [p for p in all_pages if p['section'] == 'back']
-                    if back_pages:
-                        anns_per_page = max(1, len(back_annotations) // len(back_pages))
-                        page_index = back_pages.index(page)
-                        start_idx = page_index * anns_per_page
-                        end_idx = start_idx + anns_per_page
-                        page_annotations = back_annotations[start_idx:end_idx]
+                    anns_per_page = max(1, len(back_annotations) // group_sizes[self._page_group(page)])
+                    start_idx = page_offsets[id(page)] * anns_per_page
+                    end_idx = start_idx + anns_per_page
+                    page_annotations = back_annotations[start_idx:end_idx]
             
             # Process annotations for this page
             processed_annotations = []
             for ann in page_annotations:
-                character = self.identify_character(ann.get('text', ''))
-                cleaned_text = self.clean_annotation_text(ann.get('text', ''))
-                
-                processed_ann = {
-                    'id': ann.get('id', str(uuid.uuid4())),
-                    'character': character,
-                    'text': cleaned_text,
-                    'type': self.determine_annotation_type(ann),
-                    'year': ann.get('year'),
-                    'revealLevel': self.get_reveal_level(character, ann.get('year')),
-                    'characterStyle': self.character_map.get(character, {}).get('style', 'unknown'),
-                    'position': self.generate_position(),
-                    'isDraggable': self.determine_annotation_type(ann) == 'postIt'
-                }
+                processed_ann = dict(ann)
+                processed_ann['position'] = self.generate_position()
+                processed_ann['isDraggable'] = processed_ann['type'] == 'postIt'
                 processed_annotations.append(processed_ann)
             
             page['annotations'] = processed_annotations
@@ -307,6 +319,25 @@ class FixedWebDataProcessor:
         
         return all_pages
     
+    def _page_group(self, page: Dict) -> tuple:
+        """Key that groups chapter pages by chapter and all other pages by section"""
+        if page['section'] == 'chapters':
+            return page['section'], page.get('chapterName', '')
+        return page['section'], None
+    
+    def classify_annotation(self, ann: Dict) -> Dict:
+        """Derive the page-independent fields of a processed annotation"""
+        character = self.identify_character(ann.get('text', ''))
+        return {
+            'id': ann.get('id', str(uuid.uuid4())),
+            'character': character,
+            'text': self.clean_annotation_text(ann.get('text', '')),
+            'type': self.determine_annotation_type(ann),
+            'year': ann.get('year'),
+            'revealLevel': self.get_reveal_level(character, ann.get('year')),
+            'characterStyle': self.character_map.get(character, {}).get('style', 'unknown')
+        }
+    
     def get_reveal_level(self, character: str, year: Optional[int]) -> int:
         """Determine revelation level for annotation"""
         if character == 'Unknown' or not year:
@@ -380,14 +411,13 @@ class FixedWebDataProcessor:
         """Main processing function"""
         print("🏰 Starting Blackthorn Manor Data Processing...")
         
-        # Load all source data
-        self.load_annotations()
+        # Load all source data; annotations are streamed into the page assignment below
         self.load_chapter_files()
         self.load_front_matter()
         self.load_back_matter()
         
         # Process front matter (26 pages)
-        front_pages_content = self.split_into_pages(self.front_matter_content, 26)
+        front_pages_content = self.split_into_pages(self.front_matter_content, 26, self.front_matter_document)
         front_pages = []
         
         for i, content in enumerate(front_pages_content):
@@ -412,7 +442,7 @@ class FixedWebDataProcessor:
         pages_per_chapter = max(1, target_chapter_pages // len(self.chapters))
         
         for chapter in self.chapters:
-            chapter_content_pages = self.split_into_pages(chapter['content'], pages_per_chapter)
+            chapter_content_pages = self.split_into_pages(chapter['content'], pages_per_chapter, chapter.get('document'))
             
             for i, content in enumerate(chapter_content_pages):
                 processed_content, redacted_sections = self.process_redacted_content(content)
@@ -433,7 +463,7 @@ class FixedWebDataProcessor:
         
         # Process back matter (remaining pages up to 247)
         remaining_pages = 247 - len(front_pages) - len(chapter_pages)
-        back_pages_content = self.split_into_pages(self.back_matter_content, remaining_pages)
+        back_pages_content = self.split_into_pages(self.back_matter_content, remaining_pages, self.back_matter_document)
         back_pages = []
         
         for i, content in enumerate(back_pages_content):
@@ -453,11 +483,70 @@ class FixedWebDataProcessor:
             })
             current_page += 1
         
-        # Combine all pages
+        # Assign annotations to pages
+        self.assign_annotations_to_pages(front_pages + chapter_pages + back_pages, self.load_annotations())
+        
+        return self.save_web_book_data(front_pages, chapter_pages, back_pages)
+    
+    def process_model(self, model: Any) -> Dict:
+        """Write web_book_data.json from an already built enhanced BookModel
+        
+        Used by the pipeline instead of process(): the model is paginated and its
+        annotations placed, so its pages are only copied into this format.
+        """
+        print("🏰 Writing Blackthorn Manor web data from the book model...")
+        
+        sections = [('front', 'front_matter', None, model.front_matter.get('pages', []))]
+        sections += [('chapters', 'chapter', chapter['chapterName'], chapter['pages']) for chapter in model.chapters]
+        sections.append(('back', 'back_matter', None, model.back_matter.get('pages', [])))
+        
+        pages = {'front': [], 'chapters': [], 'back': []}
+        current_page = 1
+        for section, page_type, chapter_name, model_pages in sections:
+            for model_page in model_pages:
+                annotations = [{
+                    'id': annotation['id'],
+                    'character': annotation['character'],
+                    'text': annotation['text'],
+                    'type': annotation['type'],
+                    'year': annotation.get('year'),
+                    'revealLevel': annotation.get('revealLevel', 1),
+                    'characterStyle': annotation.get('characterStyle', 'unknown'),
+                    'position': annotation.get('position'),
+                    'isDraggable': annotation['type'] == 'postIt'
+                } for annotation in model_page['annotations']]
+                page = {
+                    'pageNumber': current_page,
+                    'actualPageNumber': current_page,
+                    'type': page_type,
+                    'section': section,
+                    'content': model_page['content'],
+                    'wordCount': model_page['wordCount'],
+                    'annotations': annotations,
+                    'annotationCount': len(annotations),
+                    'redactedSections': model_page.get('redactedSections', []),
+                    'revealLevels': model_page.get('revealLevels', [1])
+                }
+                if chapter_name is not None:
+                    page['chapterName'] = chapter_name
+                if section == 'back':
+                    page['hasEmbeddedContent'] = model_page.get('hasEmbeddedContent', False)
+                pages[section].append(page)
+                current_page += 1
+        
+        return self.save_web_book_data(pages['front'], pages['chapters'], pages['back'])
+    
+    def save_web_book_data(self, front_pages: List[Dict], chapter_pages: List[Dict], back_pages: List[Dict]) -> Dict:
+        """Render the pages, write web_book_data.json and its compact form, and return the data"""
         all_pages = front_pages + chapter_pages + back_pages
         
-        # Assign annotations to pages
-        all_pages = self.assign_annotations_to_pages(all_pages, self.annotations)
+        # Pre-render each page once so the web app only inserts HTML
+        fragment_cache = FragmentCache(self.base_path / '.cache' / 'page_fragments.json')
+        rendered = render_pages(all_pages, fragment_cache)
+        fragment_cache.save()
+        
+        # Per-page bitsets of the annotations each reveal level shows
+        attach_reveal_index(all_pages)
         
         # Create the final data structure
         web_book_data = {
@@ -516,13 +605,18 @@ class FixedWebDataProcessor:
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(web_book_data, f, indent=2, ensure_ascii=False)
         
+        compact_file = output_file.with_name('web_book_data.compact.json')
+        compact_sizes = write_compact(web_book_data, compact_file)
+        
         print(f"\n✅ SUCCESS! Generated complete web book data:")
         print(f"   📄 Total pages: {len(all_pages)}")
         print(f"   📖 Front matter: {len(front_pages)} pages")
         print(f"   📚 Chapters: {len(chapter_pages)} pages")
         print(f"   📋 Back matter: {len(back_pages)} pages")
         print(f"   📝 Total annotations: {sum(page['annotationCount'] for page in all_pages)}")
+        print(f"   🖼️  HTML fragments: {rendered} rendered, {len(all_pages) - rendered} reused from cache")
         print(f"   💾 Saved to: {output_file}")
+        print(f"   📦 Compact schema: {format_sizes(*compact_sizes)}, saved to: {compact_file}")
         
         return web_book_data
     
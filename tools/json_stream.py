@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON array reader for Blackthorn Manor annotation exports
+Yields the elements of a top-level JSON array one at a time while reading the
+file in chunks. Only the current element's text is buffered, never the whole
+file, so records can be processed before the file has been fully read.
+"""
+
+import codecs
+import json
+import re
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Union
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = ' \t\n\r'
+
+# Characters that could still extend a number cut off at the end of the buffer
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+
+def _decode_error(message: str, buffer: str, position: int) -> json.JSONDecodeError:
+    return json.JSONDecodeError(message, buffer, position)
+
+def iter_json_array(source: Union[Path, str, BinaryIO], chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yield each element of the JSON array in a file or binary stream
+
+    Raises json.JSONDecodeError when the input is not a single JSON array.
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as f:
+            yield from iter_json_array(f, chunk_size)
+        return
+
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill() -> bool:
+        """Append the next chunk to the buffer; False once the input is exhausted"""
+        nonlocal buffer, position, eof
+        if eof:
+            return False
+        chunk = source.read(chunk_size)
+        eof = not chunk
+        # Drop what has been consumed so the buffer only holds the current element
+        buffer = buffer[position:] + utf8.decode(chunk, final=eof)
+        position = 0
+        return bool(chunk)
+
+    def skip_whitespace() -> bool:
+        """Advance to the next significant character; False at end of input"""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return True
+            if not fill():
+                return False
+
+    if not skip_whitespace() or buffer[position] != '[':
+        raise _decode_error("Expecting '[' at the start of the array", buffer, position)
+    position += 1
+
+    expecting_value = None  # None before the first element, then True after a comma
+    while True:
+        if not skip_whitespace():
+            raise _decode_error("Unterminated array", buffer, position)
+
+        if buffer[position] == ']' and expecting_value is not True:
+            position += 1
+            if skip_whitespace():
+                raise _decode_error("Extra data after the array", buffer, position)
+            return
+
+        if expecting_value is False:
+            if buffer[position] != ',':
+                raise _decode_error("Expecting ',' delimiter", buffer, position)
+            position += 1
+            expecting_value = True
+            continue
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Most likely the element continues in the next chunk
+                if not fill():
+                    raise
+                continue
+            if (end == len(buffer) or (isinstance(value, (int, float)) and _NUMBER_TAIL.fullmatch(buffer, end))) \
+                    and fill():
+                # A number may continue in the next chunk
+                continue
+            break
+
+        position = end
+        expecting_value = False
+        yield value
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Keyword feature matrix for Blackthorn Manor annotation scoring
+Lower-cases every annotation once and records which scoring keywords it
+contains as an annotations × vocabulary matrix. Severity, knowledge, themes
+and clue flags are then reductions over columns, optionally grouped by
+character or chapter. Uses NumPy when it is installed, plain lists otherwise.
+"""
+
+from typing import Dict, List, Any, Hashable, Iterable, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from character_aggregation import (
+    THEME_KEYWORDS, SEVERITY_KEYWORDS, KNOWLEDGE_KEYWORDS, DISAPPEARANCE_KEYWORDS
+)
+
+REVEAL_KEYWORDS = ['supernatural', 'entity']
+
+VOCABULARY = list(dict.fromkeys(
+    [keyword for keywords in THEME_KEYWORDS.values() for keyword in keywords]
+    + SEVERITY_KEYWORDS + KNOWLEDGE_KEYWORDS + DISAPPEARANCE_KEYWORDS + REVEAL_KEYWORDS
+))
+
+class KeywordMatrix:
+    """Presence of each vocabulary keyword in each annotation text"""
+
+    def __init__(self, texts: Iterable[str], vocabulary: List[str] = VOCABULARY):
+        lowered = [text.lower() for text in texts]
+        self.rows = len(lowered)
+        self.vocabulary = vocabulary
+        self.columns = {keyword: i for i, keyword in enumerate(vocabulary)}
+        # Substring tests stay plain `in`: NumPy's np.char.find is slower than CPython here,
+        # so only the reductions below are vectorized
+        columns = [[keyword in text for text in lowered] for keyword in vocabulary]
+        if np is not None:
+            self.matrix = np.array(columns, dtype=bool).reshape(len(vocabulary), self.rows).T
+        else:
+            # Column-major without NumPy, so reductions over a few keywords touch only their columns
+            self.matrix = columns
+        self._scores = None
+
+    def update(self, row: int, text: str):
+        """Rescan one annotation's text, appending a row when row equals the row count"""
+        lowered = text.lower()
+        hits = [keyword in lowered for keyword in self.vocabulary]
+        if row == self.rows:
+            self.rows += 1
+            if np is not None:
+                self.matrix = np.vstack([self.matrix, np.array([hits], dtype=bool)])
+            else:
+                for column, hit in zip(self.matrix, hits):
+                    column.append(hit)
+        elif np is not None:
+            self.matrix[row] = hits
+        else:
+            for column, hit in zip(self.matrix, hits):
+                column[row] = hit
+        self._scores = None
+
+    def take(self, rows: List[int]) -> 'KeywordMatrix':
+        """A matrix of the given rows only, without rescanning their texts"""
+        taken = KeywordMatrix([], self.vocabulary)
+        taken.rows = len(rows)
+        if np is not None:
+            taken.matrix = self.matrix[np.asarray(rows, dtype=np.intp)].reshape(len(rows), len(self.vocabulary))
+        else:
+            taken.matrix = [[column[i] for i in rows] for column in self.matrix]
+        return taken
+
+    def count(self, keywords: List[str]) -> List[int]:
+        """Number of the given keywords present in each annotation"""
+        indices = [self.columns[keyword] for keyword in keywords]
+        if np is not None:
+            return self.matrix[:, indices].sum(axis=1).tolist()
+        if not indices:
+            return [0] * self.rows
+        return [sum(hits) for hits in zip(*(self.matrix[i] for i in indices))]
+
+    def any(self, keywords: List[str]) -> List[bool]:
+        """Whether each annotation contains at least one of the given keywords"""
+        indices = [self.columns[keyword] for keyword in keywords]
+        if np is not None:
+            return self.matrix[:, indices].any(axis=1).tolist()
+        if not indices:
+            return [False] * self.rows
+        return [any(hits) for hits in zip(*(self.matrix[i] for i in indices))]
+
+    def scores(self) -> Dict[str, List]:
+        """Every per-annotation score as one column list each"""
+        if self._scores is not None:
+            return self._scores
+        scores = {f'theme:{theme}': self.any(keywords) for theme, keywords in THEME_KEYWORDS.items()}
+        scores.update({
+            'severity': self.count(SEVERITY_KEYWORDS),
+            'knowledge': self.count(KNOWLEDGE_KEYWORDS),
+            'mentionsDisappearance': self.any(['disappear']),
+            'isClue': self.any(DISAPPEARANCE_KEYWORDS),
+            'revealSignal': self.any(REVEAL_KEYWORDS)
+        })
+        self._scores = scores
+        return scores
+
+    def features(self, rows: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Per-annotation features in the format of character_aggregation.annotation_features
+
+        revealSignal is added for the reveal level rules. Covers every row unless rows are given.
+        """
+        scores = self.scores()
+        themes = [(theme, scores[f'theme:{theme}']) for theme in THEME_KEYWORDS]
+        return [
+            {
+                'themes': [theme for theme, present in themes if present[i]],
+                'severity': scores['severity'][i],
+                'knowledge': scores['knowledge'][i],
+                'mentionsDisappearance': scores['mentionsDisappearance'][i],
+                'isClue': scores['isClue'][i],
+                'revealSignal': scores['revealSignal'][i]
+            }
+            for i in (range(self.rows) if rows is None else rows)
+        ]
+
+    def grouped(self, keys: List[Hashable]) -> Dict[Hashable, Dict[str, int]]:
+        """Sum every score over the annotations sharing a key, such as a character or chapter"""
+        group_index = {key: i for i, key in enumerate(dict.fromkeys(keys))}
+        scores = self.scores()
+        if np is not None and self.rows:
+            codes = np.fromiter((group_index[key] for key in keys), dtype=np.intp, count=self.rows)
+            sums = {name: np.bincount(codes, weights=np.asarray(values, dtype=float), minlength=len(group_index))
+                    for name, values in scores.items()}
+            return {key: {name: int(column[g]) for name, column in sums.items()}
+                    for key, g in group_index.items()}
+
+        totals = {key: {name: 0 for name in scores} for key in group_index}
+        for name, values in scores.items():
+            for key, value in zip(keys, values):
+                totals[key][name] += value
+        return totals
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Per-reveal-level web variants for Blackthorn Manor
+Writes one level_{n}.json per reveal level of a web book data file. Pages are
+filtered to what a reader at that level may see and stored once under a hash
+of their filtered content, so pages that do not change between levels share a
+file. Page files no longer referenced by any level are removed.
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, Tuple
+
+from reveal_index import REVEAL_LEVELS, build_page_index
+
+ANCHOR_MARKUP = re.compile(r'<span class="annotation-anchor" data-annotation-id="[^"]*" data-reveal-level="(\d+)"></span>')
+REVEALED_REDACTION_MARKUP = re.compile(r'(<span class="redacted" data-reveal-level="(\d+)") data-reveal="[^"]*"')
+
+def filter_page_for_level(page: Dict, level: int) -> Dict:
+    """Reduce a page to the annotations and reveal data visible at a reveal level
+
+    Fields that do not depend on the level, like revealLevels, are left as they
+    are, so a page without hidden content is identical at every level.
+    """
+    filtered = dict(page)
+
+    if 'annotations' in page:
+        filtered['annotations'] = [a for a in page['annotations'] if a.get('revealLevel', 1) <= level]
+        if 'annotationCount' in page:
+            filtered['annotationCount'] = len(filtered['annotations'])
+        if 'revealIndex' in page:
+            filtered['revealIndex'] = build_page_index(filtered['annotations'])
+
+    if 'redactedSections' in page:
+        # Keep the spans so the client can draw them, but only ship revealed text once unlocked
+        filtered['redactedSections'] = [
+            section if section.get('revealLevel', REVEAL_LEVELS[-1]) <= level
+            else {k: v for k, v in section.items() if k != 'revealedText'}
+            for section in page['redactedSections']
+        ]
+
+    if level < REVEAL_LEVELS[-1] and 'content' in page:
+        filtered['content'] = re.sub(r' data-reveal="[^"]*"', '', page['content'])
+
+    if 'html' in page:
+        # Drop revealed redaction text and anchors of annotations not visible yet
+        fragment = ANCHOR_MARKUP.sub(lambda m: m.group(0) if int(m.group(1)) <= level else '', page['html'])
+        filtered['html'] = REVEALED_REDACTION_MARKUP.sub(lambda m: m.group(0) if int(m.group(2)) <= level
+                                                         else m.group(1), fragment)
+
+    return filtered
+
+def write_reveal_level_variants(web_book_data: Dict, output_dir: Path) -> Tuple[int, int, int]:
+    """Write levels/level_{n}.json and shared page files
+
+    Returns the number of levels, of page files and of stale page files removed.
+    """
+    levels_dir = Path(output_dir) / "levels"
+    pages_dir = levels_dir / "pages"
+    pages_dir.mkdir(parents=True, exist_ok=True)
+
+    written_pages = set()
+
+    def store_page(page: Dict, level: int) -> str:
+        # Pages whose filtered view does not change between levels hash to the same file
+        payload = json.dumps(filter_page_for_level(page, level), ensure_ascii=False, sort_keys=True)
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+        if digest not in written_pages:
+            # Same name means same content, so a file left by an earlier build is already correct
+            target = pages_dir / f"{digest}.json"
+            if not target.exists():
+                with open(target, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+            written_pages.add(digest)
+        return digest
+
+    levels = sorted(int(key) for key in web_book_data['revealLevels'])
+    for level in levels:
+        variant = {
+            'title': web_book_data['title'],
+            'subtitle': web_book_data['subtitle'],
+            'author': web_book_data['author'],
+            'revealLevel': level,
+            'pagePath': 'pages/{id}.json',
+            'frontMatter': {},
+            'backMatter': {},
+            'chapters': [],
+            'characters': {
+                character: {
+                    **timeline,
+                    'timeline': [a for a in timeline['timeline'] if a.get('revealLevel', 1) <= level]
+                }
+                for character, timeline in web_book_data['characters'].items()
+            },
+            'revealLevels': web_book_data['revealLevels']
+        }
+
+        if web_book_data['frontMatter']:
+            variant['frontMatter'] = {
+                **web_book_data['frontMatter'],
+                'pages': [store_page(page, level) for page in web_book_data['frontMatter']['pages']]
+            }
+        if web_book_data['backMatter']:
+            variant['backMatter'] = {
+                **web_book_data['backMatter'],
+                'pages': [store_page(page, level) for page in web_book_data['backMatter']['pages']]
+            }
+        for chapter in web_book_data['chapters']:
+            variant['chapters'].append({
+                **chapter,
+                'pages': [store_page(page, level) for page in chapter['pages']]
+            })
+
+        with open(levels_dir / f"level_{level}.json", 'w', encoding='utf-8') as f:
+            json.dump(variant, f, indent=2, ensure_ascii=False)
+
+    removed = 0
+    for path in pages_dir.glob('*.json'):
+        if path.stem not in written_pages:
+            path.unlink()
+            removed += 1
+
+    return len(levels), len(written_pages), removed
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Lightweight markdown block parser for Blackthorn Manor sources
+Parses a source text once into typed blocks (headings, paragraphs, lists,
+quotes, tables, rules) split at blank lines, with their source offsets and
+word counts. Parsed documents are cached by content hash, so pagination, word
+counts, section detection and rendering all share one parse per text.
+"""
+
+import bisect
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from itertools import accumulate
+from typing import Iterator, List, Optional
+
+# Book-style section headings used by the back matter instead of '#' markup
+SECTION_HEADING = re.compile(r'(CHAPTER [IVX]+|APPENDIX [A-Z]):')
+
+# Back matter sections begin at these headings
+SECTION_START = re.compile(r'CHAPTER|APPENDIX')
+
+_MARKDOWN_HEADING = re.compile(r'(#{1,6})\s+')
+_RULE = re.compile(r'\s*([-*_])(\s*\1){2,}\s*')
+BULLET = re.compile(r'^\s*[-*+]\s+')
+NUMBERED = re.compile(r'^\s*\d+[.)]\s+')
+_TABLE_DIVIDER = re.compile(r'\|?[\s:|-]+\|?')
+
+CACHE_SIZE = 512
+
+class Block:
+    """One blank-line-separated block of a source text"""
+    __slots__ = ('kind', 'text', 'start', 'end', 'level', 'words')
+
+    def __init__(self, kind: str, text: str, start: int, end: int, level: int = 0):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.end = end
+        self.level = level
+        self.words = len(text.split())
+
+    @property
+    def is_heading(self) -> bool:
+        return self.kind == 'heading'
+
+    def __repr__(self) -> str:
+        return f"Block({self.kind!r}, {self.start}-{self.end}, {self.words} words)"
+
+def classify_block(text: str):
+    """Block kind and heading level of one stripped block"""
+    lines = text.split('\n')
+
+    heading = _MARKDOWN_HEADING.match(lines[0])
+    if heading:
+        return 'heading', len(heading.group(1))
+    if len(lines) == 1 and SECTION_HEADING.match(text):
+        return 'heading', 2
+    if _RULE.fullmatch(text):
+        return 'rule', 0
+    if all(BULLET.match(line) for line in lines):
+        return 'list', 0
+    if all(NUMBERED.match(line) for line in lines):
+        return 'ordered_list', 0
+    if all(line.startswith('>') for line in lines):
+        return 'quote', 0
+    if len(lines) > 1 and all(line.strip().startswith('|') for line in lines):
+        return 'table', 0
+    return 'paragraph', 0
+
+class Document:
+    """Block AST of one source text; treat as read-only, it is shared through the cache"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.blocks = []
+        position = 0
+        for chunk in text.split('\n\n'):
+            stripped = chunk.strip()
+            if stripped:
+                start = position + chunk.index(stripped)
+                kind, level = classify_block(stripped)
+                self.blocks.append(Block(kind, stripped, start, start + len(stripped), level))
+            position += len(chunk) + 2
+
+    @property
+    def word_count(self) -> int:
+        return sum(block.words for block in self.blocks)
+
+    @property
+    def headings(self) -> List[Block]:
+        return [block for block in self.blocks if block.is_heading]
+
+    def sections(self, start_pattern=SECTION_START) -> List[List[Block]]:
+        """Blocks grouped into sections, each starting at a block matching start_pattern"""
+        sections = []
+        for block in self.blocks:
+            if not sections or start_pattern.match(block.text):
+                sections.append([])
+            sections[-1].append(block)
+        return sections
+
+def _page_end(blocks: List[Block], start: int, max_words: int, break_at_headings: bool,
+              start_pattern: Optional[re.Pattern]) -> int:
+    """Index after the last block of the page that starts at blocks[start]"""
+    words = blocks[start].words
+    end = start + 1
+    while end < len(blocks):
+        block = blocks[end]
+        if (words + block.words > max_words or (break_at_headings and block.is_heading)
+                or (start_pattern is not None and start_pattern.match(block.text))):
+            break
+        words += block.words
+        end += 1
+    return end
+
+def paginate(blocks: List[Block], max_words: int, break_at_headings: bool = False,
+             start_pattern: Optional[re.Pattern] = None) -> List[List[Block]]:
+    """Greedily fill pages with whole blocks up to max_words each
+
+    A block that would overflow a non-empty page starts the next one. With
+    break_at_headings every heading also starts a new page, and so does every
+    block matching start_pattern, as Document.sections() splits them.
+    """
+    pages = []
+    start = 0
+    while start < len(blocks):
+        end = _page_end(blocks, start, max_words, break_at_headings, start_pattern)
+        pages.append(blocks[start:end])
+        start = end
+    return pages
+
+class Repagination:
+    """A new page layout and the window of it that differs from the previous one
+
+    pages[start:stop] replace the previous layout's pages[start:old_stop]. The
+    pages before start are unchanged, and the pages from stop on hold the same
+    blocks as the previous pages from old_stop on, shifted by shift pages.
+    """
+    __slots__ = ('pages', 'start', 'stop', 'old_stop')
+
+    def __init__(self, pages: List[List[Block]], start: int, stop: int, old_stop: int):
+        self.pages = pages
+        self.start = start
+        self.stop = stop
+        self.old_stop = old_stop
+
+    @property
+    def shift(self) -> int:
+        return self.stop - self.old_stop
+
+    def __repr__(self) -> str:
+        return f"Repagination(pages {self.start}-{self.stop} replace {self.start}-{self.old_stop} of {len(self.pages)})"
+
+def repaginate(previous: List[List[Block]], blocks: List[Block], max_words: int, break_at_headings: bool = False,
+               start_pattern: Optional[re.Pattern] = None) -> Repagination:
+    """paginate() blocks again, reusing a previous layout of an earlier version of them
+
+    Pagination is greedy from left to right and every page starts empty, so
+    the pages before the first changed block are kept and packing stops at
+    the first page boundary that falls in the unchanged tail at a position
+    where the previous layout also had one. Only the blocks between are
+    packed again; the result always equals paginate(blocks, ...).
+    """
+    old_blocks = [block for page in previous for block in page]
+    limit = min(len(old_blocks), len(blocks))
+    prefix = 0
+    while prefix < limit and old_blocks[prefix].text == blocks[prefix].text:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_blocks[-1 - suffix].text == blocks[-1 - suffix].text:
+        suffix += 1
+
+    # Previous page index by first block, with the end of the text as a boundary too
+    old_starts = list(accumulate([0] + [len(page) for page in previous]))
+    old_page_at = {position: page for page, position in enumerate(old_starts)}
+
+    # The page before a changed block could have taken it, so packing restarts at that page
+    first = bisect.bisect_right(old_starts, max(prefix - 1, 0)) - 1 if previous else 0
+    if prefix == len(old_blocks) == len(blocks):
+        first = len(previous)
+    pages = [blocks[old_starts[page]:old_starts[page + 1]] for page in range(first)]
+
+    tail_start = len(blocks) - suffix
+    shift = len(blocks) - len(old_blocks)
+    start = old_starts[first] if previous else 0
+    while True:
+        old_stop = old_page_at.get(start - shift) if start >= tail_start else None
+        if old_stop is not None:
+            break
+        if start >= len(blocks):
+            old_stop = len(previous)
+            break
+        end = _page_end(blocks, start, max_words, break_at_headings, start_pattern)
+        pages.append(blocks[start:end])
+        start = end
+
+    stop = len(pages)
+    for page in range(old_stop, len(previous)):
+        pages.append(blocks[old_starts[page] + shift:old_starts[page + 1] + shift])
+    return Repagination(pages, first, stop, old_stop)
+
+def join_blocks(blocks: List[Block]) -> str:
+    """Page text for a run of blocks"""
+    return '\n\n'.join(block.text for block in blocks)
+
+def iter_section_headings(blocks: List[Block], pattern: re.Pattern) -> Iterator[re.Match]:
+    """Matches of a heading pattern within each block"""
+    for block in blocks:
+        yield from pattern.finditer(block.text)
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def parse_markdown(text: str) -> Document:
+    """Block AST of text, parsed once per distinct content"""
+    key = hashlib.sha256(text.encode('utf-8')).digest()
+    with _cache_lock:
+        document = _cache.get(key)
+        if document is not None:
+            _cache.move_to_end(key)
+            return document
+
+    document = Document(text)
+    with _cache_lock:
+        _cache[key] = document
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return document
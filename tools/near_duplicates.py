@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection for Blackthorn Manor annotations
+The same handwritten note can reach the build twice: as a record in
+annotations.json and as an inked marker extracted from the chapter or back
+matter text. Texts are reduced to word shingles and MinHash signatures, and
+locality-sensitive hashing over signature bands finds candidate pairs in
+roughly linear time. Candidates are confirmed by exact shingle Jaccard
+similarity.
+"""
+
+import random
+import re
+import zlib
+from typing import Dict, List, Hashable, Iterable, Optional, Tuple
+
+SHINGLE_SIZE = 3
+NUM_PERMUTATIONS = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+# Shingle Jaccard similarity at which two texts count as the same note
+DUPLICATE_THRESHOLD = 0.7
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1866)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(NUM_PERMUTATIONS)]
+
+def shingles(text: str) -> frozenset:
+    """Lower-cased word n-grams of a text; texts shorter than one shingle use their words"""
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return frozenset(words)
+    return frozenset(' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+
+def minhash(shingle_set: frozenset) -> Tuple[int, ...]:
+    """MinHash signature of a shingle set"""
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingle_set]
+    if not hashes:
+        return ()
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class NearDuplicateIndex:
+    """LSH index over keyed texts, queried for each text's closest near-duplicate"""
+
+    def __init__(self, records: Iterable[Tuple[Hashable, str]], threshold: float = DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.shingles = {}
+        self.buckets = {}
+        for key, text in records:
+            self.add(key, text)
+
+    @staticmethod
+    def _bands(signature: Tuple[int, ...]) -> List[Tuple]:
+        return [(band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]) for band in range(BANDS)]
+
+    def add(self, key: Hashable, text: str):
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return
+        self.shingles[key] = shingle_set
+        for band in self._bands(minhash(shingle_set)):
+            self.buckets.setdefault(band, []).append(key)
+
+    def query(self, text: str) -> Optional[Tuple[Hashable, float]]:
+        """Key and similarity of the closest indexed text at or above the threshold, if any"""
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return None
+        candidates = {}
+        for band in self._bands(minhash(shingle_set)):
+            for key in self.buckets.get(band, []):
+                candidates.setdefault(key, None)
+
+        best = None
+        for key in candidates:
+            similarity = jaccard(shingle_set, self.shingles[key])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+def find_duplicates(primary: Iterable[Tuple[Hashable, str]], secondary: Iterable[Tuple[Hashable, str]],
+                    threshold: float = DUPLICATE_THRESHOLD) -> Dict[Hashable, Tuple[Hashable, float]]:
+    """Map each secondary key to its closest primary near-duplicate"""
+    index = NearDuplicateIndex(primary, threshold)
+    matches = {}
+    for key, text in secondary:
+        match = index.query(text)
+        if match:
+            matches[key] = match
+    return matches
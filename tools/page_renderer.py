@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Build-time page rendering for Blackthorn Manor
+Turns each page's markdown into a sanitized HTML fragment with redaction spans
+and annotation anchors already in place, so web clients only insert markup.
+Fragments are cached on disk by a hash of everything that goes into them.
+"""
+
+import hashlib
+import html
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from markdown_blocks import BULLET, NUMBERED, classify_block, parse_markdown
+
+# Bump whenever render_page_html() output changes so cached fragments are discarded
+RENDERER_VERSION = 3
+
+# Redaction markup injected by EnhancedContentProcessor._process_text_redactions
+INJECTED_REDACTION = re.compile(r'<span class="redacted" data-reveal="([^"]*)">(.*?)</span>', re.DOTALL)
+
+# Private-use characters delimit placeholders, since markdown never treats them as syntax
+_PLACEHOLDER = re.compile('\ue000(\\d+)\ue001')
+
+_INLINE_RULES = [
+    (re.compile(r'`([^`]+)`'), r'<code>\1</code>'),
+    (re.compile(r'\*\*(.+?)\*\*'), r'<strong>\1</strong>'),
+    (re.compile(r'(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])'), r'<em>\1</em>')
+]
+
+def _redaction_html(hidden: str, revealed: Optional[str], level: Any) -> str:
+    attributes = f' data-reveal-level="{html.escape(str(level))}"'
+    if revealed:
+        attributes += f' data-reveal="{html.escape(revealed)}"'
+    return f'<span class="redacted"{attributes}>{html.escape(hidden)}</span>'
+
+def _anchor_html(annotation: Dict) -> str:
+    return (f'<span class="annotation-anchor" data-annotation-id="{html.escape(str(annotation.get("id", "")))}" '
+            f'data-reveal-level="{html.escape(str(annotation.get("revealLevel", 1)))}"></span>')
+
+def _inline(text: str) -> str:
+    """Escape text and apply inline emphasis; placeholders pass through untouched"""
+    text = html.escape(text, quote=False)
+    for pattern, replacement in _INLINE_RULES:
+        text = pattern.sub(replacement, text)
+    return text.replace('\n', '<br>')
+
+def _render_block(text: str, kind: str, level: int) -> str:
+    lines = text.split('\n')
+
+    if kind == 'heading':
+        title = re.sub(r'^#{1,6}\s+', '', lines[0]).strip()
+        markup = f'<h{level}>{_inline(title)}</h{level}>'
+        if len(lines) > 1:
+            # Heading followed by text without a blank line in between
+            rest = '\n'.join(lines[1:])
+            markup += _render_block(rest, *classify_block(rest))
+        return markup
+
+    if kind == 'rule':
+        return '<hr>'
+
+    if kind in ('list', 'ordered_list'):
+        tag, marker = ('ul', BULLET) if kind == 'list' else ('ol', NUMBERED)
+        items = ''.join('<li>' + _inline(marker.sub('', line, count=1)) + '</li>' for line in lines)
+        return f'<{tag}>{items}</{tag}>'
+
+    if kind == 'quote':
+        inner = '\n'.join(re.sub(r'^>\s?', '', line) for line in lines)
+        return f'<blockquote><p>{_inline(inner)}</p></blockquote>'
+
+    if kind == 'table':
+        rows = [line.strip().strip('|').split('|') for line in lines
+                if not re.fullmatch(r'\|?[\s:|-]+\|?', line.strip())]
+        header, body = rows[0], rows[1:]
+        head = ''.join(f'<th>{_inline(cell.strip())}</th>' for cell in header)
+        rows_html = ''.join('<tr>' + ''.join(f'<td>{_inline(cell.strip())}</td>' for cell in row) + '</tr>'
+                            for row in body)
+        return f'<table><thead><tr>{head}</tr></thead><tbody>{rows_html}</tbody></table>'
+
+    return f'<p>{_inline(text)}</p>'
+
+def render_page_html(content: str, redactions: Optional[List[Dict]] = None,
+                     annotations: Optional[List[Dict]] = None) -> str:
+    """Render one page of markdown as a sanitized HTML fragment
+
+    redactions are spans of content in the redactedSections format (start, end,
+    revealedText, revealLevel). Each annotation gets an empty anchor element, at
+    the start of its sourceBlock for embedded notes written on the page,
+    otherwise in a trailing annotation-anchors container.
+    """
+    placeholders = []
+
+    def hold(markup: str) -> str:
+        placeholders.append(markup)
+        return f'\ue000{len(placeholders) - 1}\ue001'
+
+    # Offset-based spans first, from the end so earlier offsets stay valid;
+    # a span overlapping one already placed is skipped
+    limit = len(content)
+    for section in sorted(redactions or [], key=lambda s: (s['start'], s['end']), reverse=True):
+        start, end = section['start'], section['end']
+        if 0 <= start < end <= limit:
+            markup = _redaction_html(content[start:end], section.get('revealedText'), section.get('revealLevel', 5))
+            content = content[:start] + hold(markup) + content[end:]
+            limit = start
+
+    content = INJECTED_REDACTION.sub(lambda m: hold(_redaction_html(m.group(2), m.group(1), 5)), content)
+
+    # Placeholders are not markdown syntax, so block kinds match those of the source text
+    document = parse_markdown(content)
+    rendered = [_render_block(block.text, block.kind, block.level) for block in document.blocks]
+
+    # Anchor each embedded note at the block its source span starts in
+    anchors_by_block = {}
+    unplaced = []
+    for annotation in annotations or []:
+        index = annotation.get('sourceBlock')
+        if index is None or not 0 <= index < len(rendered):
+            unplaced.append(_anchor_html(annotation))
+        else:
+            anchors_by_block.setdefault(index, []).append(_anchor_html(annotation))
+
+    parts = []
+    for i, block_html in enumerate(rendered):
+        anchors = ''.join(anchors_by_block.get(i, []))
+        if anchors:
+            # Put anchors just inside the block element so they flow with its text
+            block_html = re.sub(r'^(<[a-z0-9]+>)', lambda m: m.group(1) + anchors, block_html, count=1)
+        parts.append(block_html)
+    if unplaced:
+        parts.append(f'<div class="annotation-anchors">{"".join(unplaced)}</div>')
+
+    return _PLACEHOLDER.sub(lambda m: placeholders[int(m.group(1))], '\n'.join(parts))
+
+class FragmentCache:
+    """Rendered page fragments on disk, keyed by a hash of the render inputs
+
+    Without a cache file fragments are only reused within one build.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None):
+        self.cache_file = Path(cache_file) if cache_file is not None else None
+        self.fragments = {}
+        self.used = set()
+        self.hits = 0
+        self.misses = 0
+        if self.cache_file is not None and self.cache_file.exists():
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    stored = json.load(f)
+                if stored.get('version') == RENDERER_VERSION:
+                    self.fragments = stored.get('fragments', {})
+            except (OSError, ValueError):
+                self.fragments = {}
+
+    @staticmethod
+    def key(content: str, redactions: List[Dict], annotations: List[Dict]) -> str:
+        inputs = [
+            content,
+            [[s['start'], s['end'], s.get('revealedText'), s.get('revealLevel')] for s in redactions],
+            [[a.get('id'), a.get('revealLevel'), a.get('sourceBlock')] for a in annotations]
+        ]
+        return hashlib.sha256(json.dumps(inputs, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def render(self, page: Dict[str, Any]) -> str:
+        """HTML fragment for a page, rendered only if its inputs changed since the last build"""
+        content = page.get('content', '')
+        redactions = page.get('redactedSections') or []
+        annotations = page.get('annotations') or []
+        key = self.key(content, redactions, annotations)
+        self.used.add(key)
+        if key in self.fragments:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.fragments[key] = render_page_html(content, redactions, annotations)
+        return self.fragments[key]
+
+    def save(self):
+        """Write the fragments used by this build, dropping stale ones"""
+        if self.cache_file is None:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        fragments = {key: self.fragments[key] for key in sorted(self.used)}
+        with open(self.cache_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': RENDERER_VERSION, 'fragments': fragments}, f, ensure_ascii=False)
+
+def render_pages(pages: List[Dict], cache: FragmentCache) -> int:
+    """Replace the markdown content of every page with its html fragment
+
+    The web app only inserts the fragment, so shipping both would roughly
+    double the text of every page. Returns how many had to be rendered.
+    """
+    misses = cache.misses
+    for page in pages:
+        page['html'] = cache.render(page)
+        page.pop('content', None)
+    return cache.misses - misses
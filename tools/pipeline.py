@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Unified Blackthorn Manor build pipeline
+Parses the book sources once into a shared BookSource, builds the enhanced
+book model from it once, and serializes every output target (Flutter
+chapters, enhanced book, web book data) from that model. The web target owns
+web_book_data.json, and the per-reveal-level variants and content-addressed
+assets are derived from that same data.
+"""
+
+import sys
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from book_source import parse_sources
+from asset_emitter import write_content_addressed_assets
+from enhanced_content_processor import BookModel, EnhancedContentProcessor
+from fix_web_data import FixedWebDataProcessor
+from level_variants import write_reveal_level_variants
+from process_content import ContentProcessor
+
+TARGETS = ['flutter', 'enhanced', 'web']
+
+def emit_flutter(processor: EnhancedContentProcessor, model: BookModel) -> Any:
+    """Per-chapter JSON, complete_book.json and characters.json for the Flutter app"""
+    flutter = ContentProcessor(processor.base_dir)
+    flutter.load_model(model)
+    flutter.save_processed_data()
+    return flutter.chapters
+
+def emit_enhanced(processor: EnhancedContentProcessor, model: BookModel) -> Any:
+    """Enhanced book files and the source index"""
+    processor.save_enhanced_data(model)
+    processor.create_source_index()
+    return model
+
+def emit_web(processor: EnhancedContentProcessor, model: BookModel) -> Any:
+    """web_book_data.json, its per-reveal-level variants and content-addressed assets for the web app"""
+    web_book_data = FixedWebDataProcessor(source=processor.source).process_model(model)
+    output_dir = processor.base_dir / "web_app/data"
+    
+    levels, page_files, removed = write_reveal_level_variants(web_book_data, output_dir)
+    print(f"   🔓 Saved {levels} level variants sharing {page_files} page files ({removed} stale removed) "
+          f"to {output_dir / 'levels'}")
+    
+    result = write_content_addressed_assets(web_book_data, output_dir)
+    print(f"   📦 {result['assets']} assets ({result['written']} new, {result['removed']} removed), "
+          f"manifest at {output_dir / 'manifest.json'}")
+    return web_book_data
+
+EMITTERS = {
+    'flutter': emit_flutter,
+    'enhanced': emit_enhanced,
+    'web': emit_web
+}
+
+def run_pipeline(book_dir: Path = Path("."), targets: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Parse the sources and build the book model once, then run each requested emitter over it"""
+    targets = targets or TARGETS
+    unknown = [t for t in targets if t not in EMITTERS]
+    if unknown:
+        raise ValueError(f"Unknown targets: {', '.join(unknown)} (expected {', '.join(TARGETS)})")
+    
+    print("🏰 Parsing Blackthorn Manor sources...")
+    source = parse_sources(book_dir)
+    print(f"   📚 {len(source.chapters)} chapters")
+    
+    print("\n🏗️  Building the book model...")
+    processor = EnhancedContentProcessor(source=source)
+    model = processor.build()
+    
+    results = {}
+    for target in targets:
+        print(f"\n🎯 Emitting {target} target...")
+        results[target] = EMITTERS[target](processor, model)
+    return results
+
+def main():
+    """Pipeline entry point: pipeline.py [target ...]"""
+    try:
+        run_pipeline(Path("."), sys.argv[1:] or None)
+    except Exception as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,16 @@ Converts raw chapter files and annotations into structured data for the Flutter
 
 import json
 import os
-import re
 import sys
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterable, Iterator, Optional
 import random
 from enum import Enum
 
+from book_source import BookSource, chapter_number
+from json_stream import iter_json_array
+from markdown_blocks import Document, parse_markdown, join_blocks
+
 class AnnotationType(Enum):
     MARGINALIA = "marginalia"
     POST_IT = "postIt"
@@ -27,48 +30,105 @@ class AnnotationZone(Enum):
     CONTENT = "content"
 
 class ContentProcessor:
-    def __init__(self):
-        self.chapters_dir = Path("content/chapters")
-        self.data_dir = Path("content/data")
-        self.output_dir = Path("flutter_app/assets/data")
-        self.annotations = []
+    def __init__(self, base_dir: Optional[Path] = None, source: Optional[BookSource] = None):
+        if source is not None:
+            base_dir = source.base_dir
+        self.base_dir = Path(base_dir) if base_dir is not None else Path(".")
+        self.source = source
+        self.chapters_dir = self.base_dir / "content/chapters"
+        self.data_dir = self.base_dir / "content/data"
+        self.output_dir = self.base_dir / "flutter_app/assets/data"
         self.chapters = []
+        # Counted while annotations stream past, so no list of all records is kept
+        self.annotation_count = 0
+        self.character_stats = {}
+        self.year_stats = {}
     
     def run(self):
         """Main processing pipeline"""
         print("🏰 Processing Blackthorn Manor Content...")
         
-        self.load_annotations()
         self.process_chapters()
-        self.match_annotations_to_content()
+        self.match_annotations_to_content(self.load_annotations())
         self.save_processed_data()
         self.generate_statistics()
         
         print("✅ Content processing completed successfully!")
     
-    def load_annotations(self):
-        """Load annotations from JSON file"""
+    def load_annotations(self) -> Iterator[Dict[str, Any]]:
+        """Annotation records, streamed one at a time"""
         print("📂 Loading annotations...")
         
+        if self.source is not None:
+            return self.source.iter_annotations()
+        
         annotations_file = self.data_dir / "annotations.json"
         if not annotations_file.exists():
             raise FileNotFoundError(f"Annotations file not found: {annotations_file}")
         
-        with open(annotations_file, 'r', encoding='utf-8') as f:
-            self.annotations = json.load(f)
+        # Streamed so the raw file text is never held alongside the parsed records
+        return iter_json_array(annotations_file)
+    
+    def load_model(self, model: Any):
+        """Take the chapters and annotations of an already built enhanced BookModel
+        
+        Used by the pipeline instead of load_annotations(), process_chapters() and
+        match_annotations_to_content(): the model is paginated and its annotations
+        placed, so only the fields of this format are copied out of it.
+        """
+        print("📖 Reading chapters from the enhanced book model...")
+        
+        self.chapters = []
+        for chapter in model.chapters:
+            pages = []
+            for page in chapter['pages']:
+                annotations = [{
+                    'id': annotation['id'],
+                    'character': annotation['character'],
+                    'text': annotation['text'],
+                    'type': annotation['type'],
+                    'year': annotation.get('year'),
+                    'position': annotation.get('position'),
+                    'chapterName': chapter['chapterName'],
+                    'pageNumber': page['pageNumber']
+                } for annotation in page['annotations']]
+                for annotation in annotations:
+                    self._count_annotation(annotation)
+                pages.append({
+                    'pageNumber': page['pageNumber'],
+                    'chapterName': chapter['chapterName'],
+                    'content': page['content'],
+                    'wordCount': page['wordCount'],
+                    'annotations': annotations
+                })
+            self.chapters.append({
+                'chapterNumber': chapter['chapterNumber'],
+                'chapterName': chapter['chapterName'],
+                'filename': chapter['filename'],
+                'fullContent': chapter['fullContent'],
+                'pages': pages,
+                'wordCount': chapter['wordCount']
+            })
         
-        print(f"   📝 Loaded {len(self.annotations)} annotations")
+        print(f"   📚 {len(self.chapters)} chapters with {self.annotation_count} annotations")
     
     def process_chapters(self):
         """Process all chapter files"""
         print("📖 Processing chapters...")
         
+        if self.source is not None:
+            for chapter in self.source.chapters:
+                self.chapters.append(self.process_chapter_content(
+                    chapter.name, chapter.filename, chapter.number, chapter.content, chapter.document))
+            print(f"   📚 Processed {len(self.chapters)} chapters")
+            return
+        
         if not self.chapters_dir.exists():
             raise FileNotFoundError(f"Chapters directory not found: {self.chapters_dir}")
         
         # Get all markdown files and sort by chapter number
         chapter_files = list(self.chapters_dir.glob("*.md"))
-        chapter_files.sort(key=self._extract_chapter_number)
+        chapter_files.sort(key=lambda file_path: chapter_number(file_path.name))
         
         for file_path in chapter_files:
             chapter_data = self.process_chapter_file(file_path)
@@ -76,96 +136,92 @@ class ContentProcessor:
         
         print(f"   📚 Processed {len(self.chapters)} chapters")
     
-    def _extract_chapter_number(self, file_path: Path) -> int:
-        """Extract chapter number from filename"""
-        match = re.search(r'CHAPTER_([IVX]+)', file_path.name)
-        if match:
-            return self._roman_to_int(match.group(1))
-        return 999  # Put unmatched files at the end
-    
-    def _roman_to_int(self, roman: str) -> int:
-        """Convert Roman numerals to integers"""
-        roman_numerals = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
-        
-        total = 0
-        for i in range(len(roman)):
-            current = roman_numerals.get(roman[i], 0)
-            next_val = roman_numerals.get(roman[i + 1], 0) if i + 1 < len(roman) else 0
-            
-            if current < next_val:
-                total -= current
-            else:
-                total += current
-        
-        return total
-    
     def process_chapter_file(self, file_path: Path) -> Dict[str, Any]:
         """Process a single chapter file"""
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        chapter_name = file_path.stem
-        
-        # Split content into paragraphs
-        paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
+        return self.process_chapter_content(file_path.stem, file_path.name,
+                                            chapter_number(file_path.name), content)
+    
+    def process_chapter_content(self, chapter_name: str, filename: str, chapter_number: int, content: str,
+                                document: Optional[Document] = None) -> Dict[str, Any]:
+        """Split one chapter's text into pages"""
+        if document is None:
+            document = parse_markdown(content)
         
-        # Create pages from paragraphs (2-3 paragraphs per page)
+        # Create pages from blocks (2-3 blocks per page)
         pages = []
-        for i in range(0, len(paragraphs), 3):
-            page_content = '\n\n'.join(paragraphs[i:i+3])
+        for i in range(0, len(document.blocks), 3):
+            page_blocks = document.blocks[i:i+3]
             pages.append({
                 'pageNumber': len(pages) + 1,
                 'chapterName': chapter_name,
-                'content': page_content,
-                'wordCount': len(page_content.split()),
+                'content': join_blocks(page_blocks),
+                'wordCount': sum(block.words for block in page_blocks),
                 'annotations': []  # Will be populated later
             })
         
         return {
-            'chapterNumber': self._extract_chapter_number(file_path),
+            'chapterNumber': chapter_number,
             'chapterName': chapter_name,
-            'filename': file_path.name,
+            'filename': filename,
             'fullContent': content,
             'pages': pages,
-            'wordCount': len(content.split())
+            'wordCount': document.word_count
         }
     
-    def match_annotations_to_content(self):
-        """Match annotations to specific pages"""
+    def match_annotations_to_content(self, annotations: Iterable[Dict[str, Any]]):
+        """Match annotations to specific pages as they are streamed"""
         print("🔗 Matching annotations to content...")
         
-        # Group annotations by chapter
-        annotations_by_chapter = {}
-        for annotation in self.annotations:
-            chapter_name = annotation.get('chapter')
-            if chapter_name:
-                if chapter_name not in annotations_by_chapter:
-                    annotations_by_chapter[chapter_name] = []
-                annotations_by_chapter[chapter_name].append(annotation)
+        chapters = {chapter['chapterName']: chapter for chapter in self.chapters}
+        chapter_counts = {}
+        matched = 0
         
-        # Distribute annotations across pages within each chapter
-        for chapter in self.chapters:
-            chapter_annotations = annotations_by_chapter.get(chapter['chapterName'], [])
+        # Distribute each chapter's annotations across its pages in turn
+        for annotation in annotations:
+            self._count_annotation(annotation)
+            chapter_name = annotation.get('chapter')
+            if not chapter_name:
+                continue
+            matched += 1
+            chapter = chapters.get(chapter_name)
+            if chapter is None:
+                continue
             
-            for i, annotation in enumerate(chapter_annotations):
-                page_index = i % len(chapter['pages'])
-                
-                # Convert annotation to our format
-                processed_annotation = {
-                    'id': annotation['id'],
-                    'character': self._parse_character(annotation['character']),
-                    'text': annotation['text'],
-                    'type': self._parse_annotation_type(annotation.get('type', 'marginalia')),
-                    'year': annotation.get('year'),
-                    'position': self._generate_position(annotation, page_index),
-                    'chapterName': chapter['chapterName'],
-                    'pageNumber': page_index + 1
-                }
-                
-                chapter['pages'][page_index]['annotations'].append(processed_annotation)
+            i = chapter_counts.get(chapter_name, 0)
+            chapter_counts[chapter_name] = i + 1
+            page_index = i % len(chapter['pages'])
+            
+            # Convert annotation to our format
+            processed_annotation = {
+                'id': annotation['id'],
+                'character': self._parse_character(annotation['character']),
+                'text': annotation['text'],
+                'type': self._parse_annotation_type(annotation.get('type', 'marginalia')),
+                'year': annotation.get('year'),
+                'position': self._generate_position(annotation, page_index),
+                'chapterName': chapter['chapterName'],
+                'pageNumber': page_index + 1
+            }
+            
+            chapter['pages'][page_index]['annotations'].append(processed_annotation)
+        
+        print(f"   📝 Loaded {self.annotation_count} annotations")
+        print(f"   🔗 Matched {matched} annotations to content")
+    
+    def _count_annotation(self, annotation: Dict[str, Any]):
+        """Add one annotation to the totals reported by generate_statistics()"""
+        self.annotation_count += 1
+        
+        character = self._parse_character(annotation['character'])
+        self.character_stats[character] = self.character_stats.get(character, 0) + 1
         
-        total_annotations = sum(len(ann) for ann in annotations_by_chapter.values())
-        print(f"   🔗 Matched {total_annotations} annotations to content")
+        year = annotation.get('year')
+        if year:
+            decade = f"{(year // 10) * 10}s"
+            self.year_stats[decade] = self.year_stats.get(decade, 0) + 1
     
     def _parse_character(self, character) -> str:
         """Parse character field (can be string or list)"""
@@ -248,7 +304,7 @@ class ContentProcessor:
             'author': 'Professor Harold Finch',
             'totalChapters': len(self.chapters),
             'totalPages': sum(len(chapter['pages']) for chapter in self.chapters),
-            'totalAnnotations': len(self.annotations),
+            'totalAnnotations': self.annotation_count,
             'chapters': self.chapters
         }
         
@@ -375,21 +431,7 @@ class ContentProcessor:
         
         total_pages = sum(len(chapter['pages']) for chapter in self.chapters)
         total_words = sum(chapter['wordCount'] for chapter in self.chapters)
-        total_annotations = len(self.annotations)
-        
-        # Character statistics
-        character_stats = {}
-        for annotation in self.annotations:
-            character = self._parse_character(annotation['character'])
-            character_stats[character] = character_stats.get(character, 0) + 1
-        
-        # Year statistics
-        year_stats = {}
-        for annotation in self.annotations:
-            year = annotation.get('year')
-            if year:
-                decade = f"{(year // 10) * 10}s"
-                year_stats[decade] = year_stats.get(decade, 0) + 1
+        total_annotations = self.annotation_count
         
         print("\n📊 CONTENT STATISTICS")
         print(f"   📚 Total Chapters: {len(self.chapters)}")
@@ -400,11 +442,11 @@ class ContentProcessor:
         print(f"   📎 Average Annotations per Page: {total_annotations / total_pages:.1f}" if total_pages > 0 else "   📎 Average Annotations per Page: 0")
         
         print("\n👥 CHARACTER BREAKDOWN:")
-        for character, count in sorted(character_stats.items(), key=lambda x: x[1], reverse=True):
+        for character, count in sorted(self.character_stats.items(), key=lambda x: x[1], reverse=True):
             print(f"   {character}: {count} annotations")
         
         print("\n📅 TEMPORAL DISTRIBUTION:")
-        for decade, count in sorted(year_stats.items()):
+        for decade, count in sorted(self.year_stats.items()):
             print(f"   {decade}: {count} annotations")
 
 def main():
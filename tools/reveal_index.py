@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Bitset reveal index for Blackthorn Manor pages
+Each page gets a list of annotation slots plus one bitmask per reveal level
+(annotations revealed at or below it) and one per unlock condition
+(annotations gated by it). Masks are hex strings in the JSON so JavaScript
+clients can read them with BigInt. RevealIndex answers "what can this reader
+see" with a few bitwise operations per page, whatever the page's size.
+"""
+
+from typing import Dict, List, Any, Iterable, Optional, Sequence
+
+REVEAL_LEVELS = [1, 2, 3, 4, 5]
+
+# Every condition EnhancedContentProcessor._generate_unlock_conditions can emit, in bit order
+UNLOCK_CONDITIONS = [
+    'family_secrets_unlocked',
+    'research_phase_unlocked',
+    'modern_mystery_unlocked',
+    'current_investigation_active'
+]
+
+def _hex(mask: int) -> str:
+    return format(mask, 'x')
+
+def build_page_index(annotations: List[Dict]) -> Dict[str, Any]:
+    """Reveal index for one page's annotations, slot i being annotations[i]"""
+    level_masks = {level: 0 for level in REVEAL_LEVELS}
+    condition_masks = {condition: 0 for condition in UNLOCK_CONDITIONS}
+
+    for slot, annotation in enumerate(annotations):
+        bit = 1 << slot
+        reveal_level = annotation.get('revealLevel', 1)
+        for level in REVEAL_LEVELS:
+            if reveal_level <= level:
+                level_masks[level] |= bit
+        for condition in annotation.get('unlockConditions', []):
+            if condition in condition_masks:
+                condition_masks[condition] |= bit
+
+    return {
+        'slots': [annotation.get('id') for annotation in annotations],
+        'levels': {str(level): _hex(mask) for level, mask in level_masks.items()},
+        'conditions': {condition: _hex(mask) for condition, mask in condition_masks.items() if mask}
+    }
+
+def attach_reveal_index(pages: Iterable[Dict]):
+    """Add a revealIndex to every page, built from its annotations"""
+    for page in pages:
+        page['revealIndex'] = build_page_index(page.get('annotations', []))
+
+class ReaderProgress:
+    """A reader's reveal level and unlocked conditions, packed for bitwise evaluation
+
+    With unlocked=None conditions are not enforced and only the level gates
+    annotations, matching the per-level web variants.
+    """
+
+    def __init__(self, level: int, unlocked: Optional[Iterable[str]] = None):
+        self.level = level
+        if unlocked is None:
+            self.locked = 0
+        else:
+            unlocked = set(unlocked)
+            self.locked = sum(1 << bit for bit, condition in enumerate(UNLOCK_CONDITIONS)
+                              if condition not in unlocked)
+
+class _PageMasks:
+    __slots__ = ('slots', 'levels', 'conditions')
+
+    def __init__(self, index: Dict[str, Any]):
+        self.slots = index['slots']
+        self.levels = [0] * (max(REVEAL_LEVELS) + 1)
+        for level, mask in index['levels'].items():
+            self.levels[int(level)] = int(mask, 16)
+        # Gated annotations per condition, in UNLOCK_CONDITIONS bit order
+        self.conditions = [(1 << bit, int(index['conditions'][condition], 16))
+                           for bit, condition in enumerate(UNLOCK_CONDITIONS)
+                           if condition in index['conditions']]
+
+    def visible(self, progress: ReaderProgress) -> int:
+        level = min(max(progress.level, 0), len(self.levels) - 1)
+        mask = self.levels[level]
+        for bit, gated in self.conditions:
+            if progress.locked & bit:
+                mask &= ~gated
+        return mask
+
+class RevealIndex:
+    """Visibility evaluator over a sequence of pages, addressed by position"""
+
+    def __init__(self, pages: Sequence[Dict]):
+        self.pages = [
+            _PageMasks(page.get('revealIndex') or build_page_index(page.get('annotations', [])))
+            for page in pages
+        ]
+
+    @classmethod
+    def from_book(cls, book_data: Dict) -> 'RevealIndex':
+        """Index the pages of web book data in reading order: front matter, chapters, back matter"""
+        pages = list(book_data.get('frontMatter', {}).get('pages', []))
+        for chapter in book_data.get('chapters', []):
+            pages.extend(chapter.get('pages', []))
+        pages.extend(book_data.get('backMatter', {}).get('pages', []))
+        return cls(pages)
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def visible_mask(self, position: int, progress: ReaderProgress) -> int:
+        """Bitmask of the page's slots the reader can see"""
+        return self.pages[position].visible(progress)
+
+    def visible_ids(self, position: int, progress: ReaderProgress) -> List[str]:
+        """IDs of the annotations on one page the reader can see"""
+        page = self.pages[position]
+        mask = page.visible(progress)
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(page.slots[low.bit_length() - 1])
+            mask ^= low
+        return ids
+
+    def visible_range(self, start: int, stop: int, progress: ReaderProgress) -> Dict[int, List[str]]:
+        """Visible annotation IDs for each page position in [start, stop)"""
+        return {position: self.visible_ids(position, progress)
+                for position in range(max(start, 0), min(stop, len(self.pages)))}
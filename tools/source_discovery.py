@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Chapter source discovery for Blackthorn Manor
+Chapter files exist both in the repository root and in content/chapters.
+Candidates are indexed by content hash and by canonical chapter (number and
+title), so each chapter is loaded from one file: byte-identical copies
+collapse into the copy in the preferred directory, and differing copies of
+the same chapter are reported. Distinct chapters sharing a number, like the
+chapter XI addendum, are kept. File hashes are cached by size and mtime
+between runs.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Optional
+
+from book_source import chapter_number, hash_file
+
+DISCOVERY_VERSION = 1
+
+CHAPTER_GLOB = 'CHAPTER_*.md'
+
+class ChapterCandidate:
+    """One chapter file found in a search directory"""
+
+    def __init__(self, path: Path, sha256: str):
+        self.path = path
+        self.sha256 = sha256
+        self.number = chapter_number(path.name)
+        self.key = (self.number, path.stem.upper())
+
+    def __repr__(self) -> str:
+        return f"ChapterCandidate({self.path}, {self.sha256[:10]})"
+
+def _load_index(cache_file: Optional[Path]) -> Dict[str, Dict[str, Any]]:
+    if cache_file is None or not cache_file.exists():
+        return {}
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return index.get('files', {}) if index.get('version') == DISCOVERY_VERSION else {}
+
+def _save_index(cache_file: Path, files: Dict[str, Dict[str, Any]]):
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump({'version': DISCOVERY_VERSION, 'files': files}, f, indent=2, sort_keys=True)
+
+def index_candidates(paths: Iterable[Path], cache_file: Optional[Path] = None) -> List[ChapterCandidate]:
+    """Hash candidate files, reusing cached hashes of files whose size and mtime are unchanged"""
+    cached = _load_index(cache_file)
+    files = {}
+    candidates = []
+    for path in paths:
+        stat = path.stat()
+        key = str(path.resolve())
+        entry = cached.get(key)
+        if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns:
+            entry = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': hash_file(path)}
+        files[key] = entry
+        candidates.append(ChapterCandidate(path, entry['sha256']))
+
+    if cache_file is not None and files != cached:
+        _save_index(cache_file, files)
+    return candidates
+
+def discover_chapters(search_dirs: List[Path], cache_file: Optional[Path] = None) -> List[Path]:
+    """One file per chapter from the search directories, ordered by chapter number
+
+    Earlier directories are preferred when a chapter has several copies.
+    """
+    paths = []
+    for directory in search_dirs:
+        if directory.exists():
+            paths += sorted(p for p in directory.glob(CHAPTER_GLOB) if chapter_number(p.name) != 999)
+
+    chosen = {}
+    by_hash = {}
+    for candidate in index_candidates(paths, cache_file):
+        if candidate.sha256 in by_hash:
+            # Same bytes as a file already kept, under whatever name
+            continue
+        by_hash[candidate.sha256] = candidate
+
+        kept = chosen.get(candidate.key)
+        if kept is None:
+            chosen[candidate.key] = candidate
+        else:
+            print(f"⚠️  Conflicting copies of {candidate.path.stem}: using {kept.path}, ignoring {candidate.path}")
+
+    skipped = len(paths) - len(chosen)
+    if skipped:
+        print(f"🔍 Found {len(paths)} chapter files, skipped {skipped} duplicate copies")
+    return [candidate.path for candidate in sorted(chosen.values(), key=lambda c: (c.number, c.path.name))]
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Source maps from Blackthorn Manor pages back to their source files
+Pages, redaction spans and embedded annotations get a 'source' entry naming
+the file they came from (its path relative to the book directory) and their
+UTF-8 byte range in it. Embedded annotations listed on the page they were
+written on also get the index of their block on it as 'sourceBlock'.
+SourceIndex keeps the byte ranges per file as sorted intervals, so the pages
+touched by an edit are found with a binary search.
+"""
+
+import bisect
+import hashlib
+import json
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+from markdown_blocks import parse_markdown
+from page_renderer import INJECTED_REDACTION
+
+SOURCE_INDEX_VERSION = 1
+
+# Interval kinds in the source index
+PAGE, ANNOTATION, REDACTION = 'p', 'a', 'r'
+
+class SourceText:
+    """One source file's text, converting character offsets to UTF-8 byte offsets"""
+
+    def __init__(self, file_id: str, text: str):
+        self.file_id = file_id
+        self.text = text
+        self._bytes = None if text.isascii() else [0] + list(accumulate(len(c.encode('utf-8')) for c in text))
+
+    def byte_offset(self, offset: int) -> int:
+        return offset if self._bytes is None else self._bytes[offset]
+
+    def span(self, start: int, end: int) -> Dict[str, Any]:
+        return {'file': self.file_id, 'start': self.byte_offset(start), 'end': self.byte_offset(end)}
+
+    @property
+    def sha256(self) -> str:
+        return hashlib.sha256(self.text.encode('utf-8')).hexdigest()
+
+def _injected_offset_map(text: str) -> Tuple[List[int], List[int]]:
+    """Positions in text after injected redaction markup and the markup length removed before each"""
+    positions, removed = [0], [0]
+    total = 0
+    for match in INJECTED_REDACTION.finditer(text):
+        opening = match.start(2) - match.start()
+        total += opening
+        positions.append(match.start(2))
+        removed.append(total)
+        total += match.end() - match.end(2)
+        positions.append(match.end())
+        removed.append(total)
+    return positions, removed
+
+def _original_offset(offset: int, offset_map: Tuple[List[int], List[int]]) -> int:
+    positions, removed = offset_map
+    return offset - removed[bisect.bisect_right(positions, offset) - 1]
+
+def attach_source_maps(pages: List[Dict], source: SourceText, page_text: Optional[str] = None,
+                       first_block: int = 0):
+    """Give pages and their redaction spans source byte ranges, and embedded annotations their block
+
+    pages must be paginated, in order from block first_block, from the blocks
+    of page_text: the source text after redaction markup was injected, if
+    any. Injection never adds or removes blank lines, so its blocks match the
+    source blocks one to one.
+    """
+    source_blocks = parse_markdown(source.text).blocks
+    page_blocks = parse_markdown(page_text if page_text is not None else source.text).blocks
+    if len(source_blocks) != len(page_blocks):
+        raise ValueError(f"{source.file_id}: page text does not match the source's block structure")
+
+    index = first_block
+    for page in pages:
+        count = page['content'].count('\n\n') + 1
+        blocks = range(index, index + count)
+        page['source'] = source.span(source_blocks[index].start, source_blocks[index + count - 1].end)
+
+        # Page offset where each of its blocks starts
+        block_starts = list(accumulate([0] + [len(page_blocks[i].text) + 2 for i in blocks][:-1]))
+        for section in page.get('redactedSections', []):
+            start, end = section['start'], section['end']
+            b = bisect.bisect_right(block_starts, start) - 1
+            offset_map = _injected_offset_map(page_blocks[index + b].text)
+            base = source_blocks[index + b].start
+            section['source'] = source.span(base + _original_offset(start - block_starts[b], offset_map),
+                                            base + _original_offset(end - block_starts[b], offset_map))
+
+        # Embedded notes written on this page are anchored at the block holding them
+        source_starts = [source_blocks[i].start for i in blocks]
+        for annotation in page.get('annotations', []):
+            if annotation.get('source', {}).get('file') != source.file_id or 'sourceSpan' not in annotation:
+                annotation.pop('sourceBlock', None)
+                continue
+            start = annotation['sourceSpan'][0]
+            if source_starts[0] <= start < source_blocks[index + count - 1].end:
+                annotation['sourceBlock'] = bisect.bisect_right(source_starts, start) - 1
+            else:
+                annotation.pop('sourceBlock', None)
+        index += count
+
+def attach_annotation_sources(annotations: Iterable[Dict], source: SourceText):
+    """Give embedded annotations the byte range of their sourceSpan"""
+    for annotation in annotations:
+        if 'sourceSpan' in annotation:
+            annotation['source'] = source.span(*annotation['sourceSpan'])
+
+def build_source_index(pages: Iterable[Dict], sources: Iterable[SourceText]) -> Dict[str, Any]:
+    """Sorted per-file intervals of every page, redaction and embedded annotation
+
+    pages are in reading order; page references are positions in it, as in
+    the SQLite export. Entries are [start, end, kind, reference].
+    """
+    files = {source.file_id: {'path': source.file_id, 'sha256': source.sha256, 'entries': []}
+             for source in sorted(sources, key=lambda source: source.file_id)}
+
+    for page_index, page in enumerate(pages):
+        if 'source' in page and page['source']['file'] in files:
+            span = page['source']
+            files[span['file']]['entries'].append([span['start'], span['end'], PAGE, page_index])
+        for i, section in enumerate(page.get('redactedSections', [])):
+            if 'source' in section and section['source']['file'] in files:
+                span = section['source']
+                files[span['file']]['entries'].append([span['start'], span['end'], REDACTION, [page_index, i]])
+        for annotation in page.get('annotations', []):
+            if 'source' in annotation and annotation['source']['file'] in files:
+                span = annotation['source']
+                files[span['file']]['entries'].append([span['start'], span['end'], ANNOTATION,
+                                                       [page_index, annotation['id']]])
+
+    for entry in files.values():
+        entry['entries'].sort(key=lambda e: (e[0], e[1], e[2]))
+    return {'version': SOURCE_INDEX_VERSION, 'files': list(files.values())}
+
+def write_source_index(index: Dict[str, Any], output_file: Path):
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+
+class SourceIndex:
+    """Lookups over a source index: what was built from a byte range of a file"""
+
+    def __init__(self, index: Dict[str, Any]):
+        if index.get('version') != SOURCE_INDEX_VERSION:
+            raise ValueError(f"Unsupported source index version {index.get('version')}")
+        self.files = {}
+        for entry in index['files']:
+            entries = entry['entries']
+            # Running maximum of interval ends, so overlapping intervals can still be bisected
+            self.files[entry['path']] = (entries, [e[0] for e in entries],
+                                         list(accumulate((e[1] for e in entries), max)), entry['sha256'])
+
+    @classmethod
+    def load(cls, path: Path) -> 'SourceIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def sha256(self, file_id: str) -> Optional[str]:
+        return self.files[file_id][3] if file_id in self.files else None
+
+    def overlapping(self, file_id: str, start: int, end: int, kind: Optional[str] = None) -> List[List]:
+        """Entries whose byte range intersects [start, end); an empty range matches entries containing start"""
+        if file_id not in self.files:
+            return []
+        entries, starts, max_ends, _ = self.files[file_id]
+        end = max(end, start + 1)
+        first = bisect.bisect_right(max_ends, start)
+        last = bisect.bisect_left(starts, end)
+        return [e for e in entries[first:last] if e[1] > start and (kind is None or e[2] == kind)]
+
+    def pages_for_edit(self, file_id: str, start: int, end: int) -> List[int]:
+        """Reading-order indexes of the pages built from a byte range"""
+        return [entry[3] for entry in self.overlapping(file_id, start, end, PAGE)]
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Indexed SQLite export of the Blackthorn Manor book
+Writes pages, annotations, redactions and characters into a single SQLite file
+with indexes matching the server's annotation access patterns. A note shown on
+many pages is stored once in annotations, and each page it appears on gets a
+row in annotation_placements holding only the page-specific fields.
+"""
+
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from enhanced_content_processor import BookModel, build
+
+# Annotation fields that differ between the pages a note is placed on
+PLACEMENT_FIELDS = ('pageNumber', 'position', 'sourceBlock')
+
+SCHEMA = """
+CREATE TABLE pages (
+    page_index INTEGER PRIMARY KEY,
+    section TEXT NOT NULL,
+    chapter_name TEXT,
+    page_number INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    word_count INTEGER NOT NULL,
+    reveal_levels TEXT NOT NULL
+);
+CREATE INDEX pages_chapter ON pages (chapter_name, page_number);
+
+CREATE TABLE annotations (
+    id INTEGER PRIMARY KEY,
+    annotation_id TEXT NOT NULL,
+    character_initials TEXT,
+    revelation_level INTEGER NOT NULL,
+    annotation_type TEXT,
+    year INTEGER,
+    is_embedded INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX annotations_character_year ON annotations (character_initials, year);
+CREATE INDEX annotations_type ON annotations (annotation_type);
+CREATE INDEX annotations_annotation_id ON annotations (annotation_id);
+
+CREATE TABLE annotation_placements (
+    id INTEGER PRIMARY KEY,
+    annotation INTEGER NOT NULL REFERENCES annotations (id),
+    page_index INTEGER NOT NULL REFERENCES pages (page_index),
+    revelation_level INTEGER NOT NULL,
+    placement TEXT NOT NULL
+);
+CREATE INDEX placements_page_level ON annotation_placements (page_index, revelation_level);
+CREATE INDEX placements_annotation ON annotation_placements (annotation, page_index);
+
+CREATE TABLE redactions (
+    id INTEGER PRIMARY KEY,
+    page_index INTEGER NOT NULL REFERENCES pages (page_index),
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    hidden_text TEXT NOT NULL,
+    revealed_text TEXT,
+    revelation_level INTEGER NOT NULL
+);
+CREATE INDEX redactions_page_level ON redactions (page_index, revelation_level);
+
+CREATE TABLE characters (
+    character_initials TEXT PRIMARY KEY,
+    full_name TEXT,
+    role TEXT,
+    annotation_count INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+def iter_book_pages(enhanced_book: Dict) -> Iterator[Tuple[str, Optional[str], Dict]]:
+    """Yield (section, chapter name, page) for every page in reading order"""
+    for page in enhanced_book.get('frontMatter', {}).get('pages', []):
+        yield 'front', None, page
+    for chapter in enhanced_book.get('chapters', []):
+        for page in chapter['pages']:
+            yield 'chapter', chapter['chapterName'], page
+    for page in enhanced_book.get('backMatter', {}).get('pages', []):
+        yield 'back', None, page
+
+def export_sqlite(model: BookModel, output_file: Path) -> Path:
+    """Write the built book into a fresh SQLite file and return its path"""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    if output_file.exists():
+        output_file.unlink()
+
+    pages = []
+    annotations = []
+    placements = []
+    redactions = []
+    # Note ids are only unique per source, so notes are told apart by all of their page-independent data
+    note_rows = {}
+
+    for page_index, (section, chapter_name, page) in enumerate(iter_book_pages(model.enhanced_book)):
+        pages.append((
+            page_index,
+            section,
+            chapter_name,
+            page['pageNumber'],
+            page['content'],
+            page.get('wordCount', 0),
+            json.dumps(page.get('revealLevels', [1]))
+        ))
+        for annotation in page.get('annotations', []):
+            note = {key: value for key, value in annotation.items() if key not in PLACEMENT_FIELDS}
+            data = json.dumps(note, ensure_ascii=False)
+            row = note_rows.get((annotation['id'], data))
+            if row is None:
+                row = note_rows[(annotation['id'], data)] = len(annotations) + 1
+                annotations.append((
+                    row,
+                    annotation['id'],
+                    annotation.get('character'),
+                    annotation.get('revealLevel', 1),
+                    annotation.get('type'),
+                    annotation.get('year'),
+                    1 if annotation.get('isEmbedded') else 0,
+                    annotation.get('text', ''),
+                    data
+                ))
+            placement = {key: annotation[key] for key in PLACEMENT_FIELDS if key in annotation}
+            placements.append((row, page_index, annotation.get('revealLevel', 1),
+                               json.dumps(placement, ensure_ascii=False)))
+        for redaction in page.get('redactedSections', []):
+            redactions.append((
+                page_index,
+                redaction['start'],
+                redaction['end'],
+                redaction['hiddenText'],
+                redaction.get('revealedText'),
+                redaction.get('revealLevel', 5)
+            ))
+
+    characters = []
+    for initials, timeline in model.character_timelines.items():
+        characters.append((
+            initials,
+            timeline.get('fullName'),
+            timeline.get('role'),
+            len(timeline.get('timeline', [])),
+            json.dumps(timeline, ensure_ascii=False)
+        ))
+
+    connection = sqlite3.connect(str(output_file))
+    try:
+        with connection:
+            connection.executescript(SCHEMA)
+            connection.executemany(
+                "INSERT INTO pages (page_index, section, chapter_name, page_number, content, word_count, reveal_levels) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", pages)
+            connection.executemany(
+                "INSERT INTO annotations (id, annotation_id, character_initials, revelation_level, "
+                "annotation_type, year, is_embedded, text, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", annotations)
+            connection.executemany(
+                "INSERT INTO annotation_placements (annotation, page_index, revelation_level, placement) "
+                "VALUES (?, ?, ?, ?)", placements)
+            connection.executemany(
+                "INSERT INTO redactions (page_index, start, end, hidden_text, revealed_text, revelation_level) "
+                "VALUES (?, ?, ?, ?, ?, ?)", redactions)
+            connection.executemany(
+                "INSERT INTO characters (character_initials, full_name, role, annotation_count, data) "
+                "VALUES (?, ?, ?, ?, ?)", characters)
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+
+    return output_file
+
+def annotations_for_page(connection: sqlite3.Connection, page_index: int, max_level: int = 5) -> List[Dict]:
+    """Annotations on one page visible at or below a reveal level"""
+    rows = connection.execute(
+        "SELECT a.data, p.placement FROM annotation_placements p JOIN annotations a ON a.id = p.annotation "
+        "WHERE p.page_index = ? AND p.revelation_level <= ? ORDER BY p.id", (page_index, max_level))
+    return [{**json.loads(data), **json.loads(placement)} for data, placement in rows]
+
+def redactions_for_page(connection: sqlite3.Connection, page_index: int) -> List[Dict[str, Any]]:
+    """Redacted spans on one page"""
+    rows = connection.execute(
+        "SELECT start, end, hidden_text, revealed_text, revelation_level FROM redactions "
+        "WHERE page_index = ? ORDER BY start", (page_index,))
+    return [
+        {'start': start, 'end': end, 'hiddenText': hidden, 'revealedText': revealed, 'revealLevel': level}
+        for start, end, hidden, revealed, level in rows
+    ]
+
+def main():
+    """Build the book and export it to SQLite"""
+    book_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(".")
+    output_file = Path(sys.argv[2]) if len(sys.argv) > 2 else book_dir / "web_app/data/book.sqlite"
+    try:
+        model = build(book_dir)
+        export_sqlite(model, output_file)
+        print(f"🗄️  Exported book to {output_file}")
+    except Exception as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
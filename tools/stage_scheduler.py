@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Dependency-aware stage scheduler for the Blackthorn Manor processors
+Stages declare the data they read and produce, and the critical path is
+reported afterwards. The processor stages are pure Python and hold the GIL,
+so by default they run one at a time in dependency order; CPU-heavy work
+inside a stage (like the back matter sections) uses its own process pool.
+With max_workers above 1 independent stages overlap on a thread pool, which
+only helps stages that wait on I/O. Their printed output is buffered per stage
+and written in the order the stages started, never interleaved.
+"""
+
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Iterable, Optional, TextIO, Tuple
+
+class Stage:
+    """A named unit of work with declared inputs and outputs"""
+
+    def __init__(self, name: str, func: Callable[[], object],
+                 inputs: Iterable[str] = (), outputs: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+class _StageOutput(io.TextIOBase):
+    """sys.stdout stand-in sending each stage thread's writes to that stage's buffer"""
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer if buffer is not None else self.stream).write(text)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
+
+class StageScheduler:
+    """Runs stages as soon as the stages producing their inputs have finished"""
+
+    def __init__(self, stages: List[Stage], max_workers: Optional[int] = 1):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        self.dependencies = self._resolve_dependencies(stages)
+        self.durations = {}
+
+    def _resolve_dependencies(self, stages: List[Stage]) -> Dict[str, List[str]]:
+        producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"'{output}' is produced by both {producers[output]} and {stage.name}")
+                producers[output] = stage.name
+
+        dependencies = {}
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in producers]
+            if missing:
+                raise ValueError(f"Stage {stage.name} needs {', '.join(missing)} which no stage produces")
+            dependencies[stage.name] = sorted({producers[name] for name in stage.inputs})
+
+        # Reject cycles before anything runs
+        state = {}
+        def visit(name: str):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'active':
+                raise ValueError(f"Stage dependency cycle through {name}")
+            state[name] = 'active'
+            for dependency in dependencies[name]:
+                visit(dependency)
+            state[name] = 'done'
+        for name in dependencies:
+            visit(name)
+
+        return dependencies
+
+    def _timed(self, stage: Stage) -> float:
+        start = time.perf_counter()
+        stage.func()
+        return time.perf_counter() - start
+
+    def _captured(self, output: _StageOutput, stage: Stage) -> Tuple[float, str]:
+        output.local.buffer = io.StringIO()
+        try:
+            return self._timed(stage), output.local.buffer.getvalue()
+        finally:
+            output.local.buffer = None
+
+    def run(self) -> Dict[str, float]:
+        """Run every stage and return the wall time each one took"""
+        if self.max_workers == 1:
+            return self._run_serial()
+        return self._run_threaded()
+
+    def _run_serial(self) -> Dict[str, float]:
+        pending = dict(self.dependencies)
+        while pending:
+            # First declared stage whose inputs are ready; cycles were rejected up front
+            name = next(name for name, deps in pending.items() if all(d in self.durations for d in deps))
+            del pending[name]
+            self.durations[name] = self._timed(self.stages[name])
+        return self.durations
+
+    def _run_threaded(self) -> Dict[str, float]:
+        pending = dict(self.dependencies)
+        finished = set()
+        running = {}
+        started = []  # stage names in start order, whose output is written in that order
+        outputs = {}
+
+        stream = sys.stdout
+        output = _StageOutput(stream)
+        sys.stdout = output
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while pending or running:
+                    ready = [name for name, deps in pending.items() if all(d in finished for d in deps)]
+                    for name in ready:
+                        del pending[name]
+                        started.append(name)
+                        running[executor.submit(self._captured, output, self.stages[name])] = name
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        # Re-raises the stage's exception; remaining stages are not started
+                        self.durations[name], outputs[name] = future.result()
+                        finished.add(name)
+
+                    while started and started[0] in outputs:
+                        stream.write(outputs.pop(started.pop(0)))
+                    stream.flush()
+        finally:
+            sys.stdout = stream
+
+        return self.durations
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """Longest chain of dependent stages by measured duration"""
+        longest = {}
+
+        def chain(name: str) -> Tuple[float, List[str]]:
+            if name not in longest:
+                best = (0.0, [])
+                for dependency in self.dependencies[name]:
+                    candidate = chain(dependency)
+                    if candidate[0] > best[0]:
+                        best = candidate
+                longest[name] = (best[0] + self.durations.get(name, 0.0), best[1] + [name])
+            return longest[name]
+
+        total, path = max((chain(name) for name in self.dependencies), key=lambda item: item[0])
+        return path, total
+
+    def report(self):
+        """Print the critical path next to the summed stage time"""
+        path, critical = self.critical_path()
+        total = sum(self.durations.values())
+        print(f"\n⏱️  Critical path: {' → '.join(path)} ({critical:.2f}s of {total:.2f}s total stage time)")